@@ -1,15 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import traceback
 
 from app.config import get_settings
 from app.api.v1.api import api_router
+from app.core import metrics
+from app.core.deps import (
+    get_admission_controller,
+    get_analysis_service,
+    get_artifact_service,
+    get_base_provider,
+    get_context_service,
+    get_loop_monitor,
+    get_memory_service,
+    get_response_cache,
+    get_single_flight,
+    get_state_backend,
+)
 from app.core.exceptions import APIException
 
 settings = get_settings()
 
 
+def register_stats_sources() -> None:
+    """Export the services' get_stats() on /metrics, cumulative fields as counters"""
+
+    def optional(get_service):
+        def get_stats():
+            service = get_service()
+            return service.get_stats() if service is not None else {}
+
+        return get_stats
+
+    def provider_stats():
+        provider = get_base_provider()
+        return provider.get_stats() if hasattr(provider, "get_stats") else {}
+
+    register = metrics.registry.register_stats
+    register(
+        "memory",
+        lambda: get_memory_service().get_stats(),
+        counters=("evictions_lru", "evictions_idle", "evictions_memory", "invalidations"),
+    )
+    register(
+        "artifacts",
+        lambda: get_artifact_service().get_stats(),
+        counters=(
+            "evictions",
+            "invalidations",
+            "failed_writes",
+            "dedup_hits",
+            "failed_body_writes",
+            "variant_cache_hits",
+            "variant_cache_misses",
+        ),
+    )
+    register(
+        "context", lambda: get_context_service().get_stats(), counters=("summaries_written",)
+    )
+    register(
+        "analysis",
+        optional(get_analysis_service),
+        counters=("hits", "completed", "failed", "dropped"),
+    )
+    register("admission", optional(get_admission_controller), counters=("admitted", "rejected"))
+    register(
+        "single_flight",
+        optional(get_single_flight),
+        counters=("flights_started", "subscribers_joined"),
+    )
+    register("state", optional(get_state_backend), counters=("published",))
+    register("loop_monitor", optional(get_loop_monitor), counters=("stalls", "slow_callbacks"))
+    register(
+        "upstream",
+        provider_stats,
+        counters=(
+            "retries",
+            "hedges",
+            "hedge_wins",
+            "ttft_timeouts",
+            "circuit_opened",
+            "circuit_rejected",
+        ),
+    )
+    if settings.response_cache_enabled:
+        register(
+            "response_cache",
+            lambda: get_response_cache().get_stats(),
+            counters=("hits", "misses", "stores", "evictions"),
+        )
+
+
+def log_http_error(request, exc: HTTPException) -> None:
+    """Print a traceback for server errors and one line for client errors.
+
+    Formatting and writing a traceback holds the event loop for a while;
+    under load, 4xx responses such as 429 would each pay for one.
+    """
+    if exc.status_code >= 500:
+        traceback.print_exc()
+    else:
+        print(f"{request.method} {request.url.path}: {exc.status_code} {exc.detail}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop long-lived services"""
+    loop_monitor = get_loop_monitor()
+    if loop_monitor is not None:
+        loop_monitor.start()
+    memory_service = get_memory_service()
+    sweeper = asyncio.create_task(
+        memory_service.run_idle_sweeper(settings.session_sweep_interval_seconds)
+    )
+    analysis_service = get_analysis_service()
+    if analysis_service is not None:
+        await analysis_service.start()
+
+    yield
+
+    sweeper.cancel()
+    if analysis_service is not None:
+        analysis_service.close()
+    await get_context_service().close()
+    # Commit any write-behind batches still queued
+    await asyncio.to_thread(memory_service.close)
+    await asyncio.to_thread(get_artifact_service().close)
+    state = get_state_backend()
+    if state is not None:
+        state.close()
+    if loop_monitor is not None:
+        loop_monitor.stop()
+
+
 def create_app():
     app = FastAPI(
         title=settings.app_name,
@@ -17,6 +144,7 @@ def create_app():
         description="AI Coding Agent API - A Claude-style coding assistant",
         docs_url="/docs" if settings.debug else None,
         redoc_url="/redoc" if settings.debug else None,
+        lifespan=lifespan,
     )
 
     # Add CORS middleware
@@ -49,10 +177,19 @@ def create_app():
             "api_key_configured": bool(settings.google_api_key),
         }
 
+    if settings.metrics_enabled:
+        register_stats_sources()
+
+        @app.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics():
+            """Prometheus metrics for this process"""
+            return Response(metrics.registry.render(), media_type=metrics.METRICS_CONTENT_TYPE)
+
     @app.exception_handler(APIException)
     async def api_exception_handler(request, exc: APIException):
         """Handle custom API exceptions"""
-        traceback.print_exc()
+        log_http_error(request, exc)
+        metrics.record_error("api", exc)
         return JSONResponse(
             status_code=exc.status_code,
             content={
@@ -60,12 +197,13 @@ def create_app():
                 "message": exc.detail,
                 "status_code": exc.status_code,
             },
+            headers=exc.headers,
         )
 
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request, exc: HTTPException):
         """Handle HTTP exceptions"""
-        traceback.print_exc()
+        log_http_error(request, exc)
         return JSONResponse(
             status_code=exc.status_code,
             content={
@@ -73,12 +211,14 @@ def create_app():
                 "message": exc.detail,
                 "status_code": exc.status_code,
             },
+            headers=exc.headers,
         )
 
     @app.exception_handler(Exception)
     async def general_exception_handler(request, exc: Exception):
         """Handle general exceptions"""
         traceback.print_exc()
+        metrics.record_error("unhandled", exc)
         if settings.debug:
             # In debug mode, return detailed error info
             return JSONResponse(
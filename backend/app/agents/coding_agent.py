@@ -1,12 +1,31 @@
+import time
 import traceback
 import uuid
-from datetime import datetime, timezone
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from app.schemas import ChatMessage, CodeArtifact, MessageRole
+from app.core import metrics
+from app.core.exceptions import ArtifactException
+from app.schemas import ArtifactMetadata, CodeArtifact, MessageRole
+from app.services.analysis_service import AnalysisService
 from app.services.artifact_service import ArtifactService
-from app.services.gemini_service import GeminiService
+from app.services.context_service import ContextService
+from app.services.llm_provider import LLMProvider
 from app.services.memory_service import MemoryService
+from app.services.single_flight import StreamSingleFlight
+from app.utils.archive_stream import iter_archive
+from app.utils.fence_scanner import FenceEvent
+from app.utils.history_buffer import MessageRecord
+from app.utils.spans import SpanRecorder
 
 
 class CodingAgent:
@@ -14,47 +33,113 @@ class CodingAgent:
 
     def __init__(
         self,
-        gemini_service: GeminiService,
+        gemini_service: LLMProvider,
         memory_service: MemoryService,
         artifact_service: ArtifactService,
+        context_service: ContextService,
+        single_flight: Optional[StreamSingleFlight] = None,
+        analysis_service: Optional[AnalysisService] = None,
     ):
         self.gemini_service = gemini_service
         self.memory_service = memory_service
         self.artifact_service = artifact_service
+        self.context_service = context_service
+        self.single_flight = single_flight
+        self.analysis_service = analysis_service
 
     async def stream_response(
-        self, message: str, session_id: str
+        self,
+        message: str,
+        session_id: str,
+        admission: Optional[Dict[str, Any]] = None,
+        spans: Optional[SpanRecorder] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Process a message with streaming response"""
+        """Process a message with streaming response.
+
+        Time spent in each phase is recorded in spans: history, ttft (waiting
+        for the first chunk), upstream (waiting for later chunks), send (the
+        consumer handling each chunk), artifacts (fence scanning, artifact
+        creation and their events) and persist.
+        """
+        # Generate message ID for streaming
+        message_id = str(uuid.uuid4())
+        if spans is None:
+            spans = SpanRecorder()
+        clock = time.perf_counter
+        started = spans.mark()
+        first_chunk_at = last_chunk_at = 0.0
+        upstream = send = extracting = 0.0
+        # Every chunk gap is counted, in runs of consecutive gaps that fall
+        # into the same histogram bucket (lower < gap <= upper): per chunk a
+        # subtraction, a comparison and an addition. A run ends only next to
+        # a gap of at least the smallest bucket bound (1 ms), so looking up
+        # the next bucket costs nothing measurable.
+        gap_histogram = metrics.STREAM_CHUNK_GAP
+        gap_bucket = gap_run = 0
+        gap_lower = gap_upper = gap_run_started = 0.0
+        metrics.STREAMS_IN_FLIGHT.inc()
+
         try:
-            # Ensure session exists
+            if admission is not None:
+                # Report how long the request queued before generation started
+                yield {
+                    "chunk": "",
+                    "message_id": message_id,
+                    "session_id": session_id,
+                    "is_complete": False,
+                    "has_artifacts": False,
+                    "artifacts": [],
+                    "event": "admission",
+                    "admission": admission,
+                }
+
+            # Ensure session exists (loading a stored one off the event loop)
+            await self.memory_service.load(session_id)
             self.memory_service.create_session(session_id)
 
-            # Create user message
-            user_message = ChatMessage(
-                id=str(uuid.uuid4()),
-                role=MessageRole.USER,
-                content=message,
-                timestamp=datetime.now(timezone.utc),
+            # Select history within the token budget before recording the
+            # new message, which is sent separately as the prompt
+            conversation_history = self.context_service.build_history(
+                session_id, message
             )
 
+            # Create user message
+            user_message = MessageRecord.create(MessageRole.USER, message)
+
             # Add user message to memory
             self.memory_service.add_message(session_id, user_message)
+            resumed = spans.lap("history")
 
-            # Get conversation history
-            conversation_history = self.memory_service.get_conversation_history(
-                session_id, limit=10
-            )
+            content_parts: List[str] = []
+
+            # Scan for code fences as the response streams in
+            scanner = self.artifact_service.code_parser.create_fence_scanner()
+            artifact_ids: Dict[int, str] = {}
+            artifacts: List[CodeArtifact] = []
 
-            # Generate message ID for streaming
-            message_id = str(uuid.uuid4())
-            accumulated_content = ""
+            # Stream response from Gemini. Per-chunk phases are summed in
+            # locals: three clock reads per chunk, about 0.2us
+            async for chunk in self._generate(message, conversation_history, session_id):
+                received = clock()
+                content_parts.append(chunk)
 
-            # Stream response from Gemini
-            async for chunk in self.gemini_service.generate_streaming_response(
-                prompt=message, conversation_history=conversation_history
-            ):
-                accumulated_content += chunk
+                if first_chunk_at:
+                    upstream += received - resumed
+                    gap = received - last_chunk_at
+                    if gap_lower < gap <= gap_upper:
+                        gap_run += 1
+                    else:
+                        if gap_run:
+                            gap_histogram.observe_run(
+                                gap_bucket, gap_run, last_chunk_at - gap_run_started
+                            )
+                        gap_bucket, gap_lower, gap_upper = gap_histogram.bucket(gap)
+                        gap_run, gap_run_started = 1, last_chunk_at
+                else:
+                    first_chunk_at = received
+                    spans.add("ttft", received - resumed)
+                    metrics.STREAM_TTFT.observe(received - started)
+                last_chunk_at = received
 
                 yield {
                     "chunk": chunk,
@@ -64,32 +149,56 @@ class CodingAgent:
                     "has_artifacts": False,
                     "artifacts": [],
                 }
+                sent = clock()
+                send += sent - received
 
-            # Create final AI message
-            ai_message = ChatMessage(
-                id=message_id,
-                role=MessageRole.ASSISTANT,
-                content=accumulated_content,
-                timestamp=datetime.now(timezone.utc),
-            )
+                for event in scanner.feed(chunk):
+                    yield await self._artifact_event(
+                        event, session_id, message_id, artifact_ids, artifacts
+                    )
+                resumed = clock()
+                extracting += resumed - sent
 
-            # Extract artifacts from complete response
-            artifacts = self.artifact_service.extract_artifacts_from_response(
-                response=accumulated_content,
-                session_id=session_id,
-                message_id=message_id,
-            )
+            streamed_at = clock()
+            if first_chunk_at:
+                upstream += streamed_at - resumed
+            else:
+                spans.add("ttft", streamed_at - resumed)
+            spans.add("upstream", upstream)
+            spans.add("send", send)
+            spans.mark()
+
+            for event in scanner.finish():
+                yield await self._artifact_event(
+                    event, session_id, message_id, artifact_ids, artifacts
+                )
+            spans.add("artifacts", extracting)
+            spans.lap("artifacts")
 
-            # Update message metadata if artifacts found
+            # Create final AI message, with metadata if artifacts found
+            metadata = None
             if artifacts:
-                ai_message.metadata = {
+                metadata = {
                     "has_artifacts": True,
                     "artifacts": [artifact.id for artifact in artifacts],
                 }
+            ai_message = MessageRecord.create(
+                MessageRole.ASSISTANT,
+                "".join(content_parts),
+                message_id=message_id,
+                metadata=metadata,
+            )
+            self._record_stream_metrics(started, first_chunk_at, streamed_at, ai_message)
 
-            # Add AI message to memory
+            # Add AI message to memory; the session may have been evicted
+            # while the response streamed
+            await self.memory_service.load(session_id)
             self.memory_service.add_message(session_id, ai_message)
 
+            # Fold turns that left the window into the summary, off the request path
+            self.context_service.schedule_summary(session_id, user_message.tokens)
+            spans.lap("persist")
+
             # Send final completion chunk
             yield {
                 "chunk": "",
@@ -104,6 +213,7 @@ class CodingAgent:
 
         except Exception as e:
             traceback.print_exc()
+            metrics.record_error("agent", e)
             yield {
                 "chunk": f"Error: {str(e)}",
                 "message_id": str(uuid.uuid4()),
@@ -114,10 +224,194 @@ class CodingAgent:
                 "error": True,
             }
 
-    def get_session_artifacts(self, session_id: str) -> List[CodeArtifact]:
+        finally:
+            # Also runs when the client disconnects and the stream is closed
+            metrics.STREAMS_IN_FLIGHT.dec()
+            if gap_run:
+                gap_histogram.observe_run(gap_bucket, gap_run, last_chunk_at - gap_run_started)
+
+    @staticmethod
+    def _record_stream_metrics(
+        started: float, first_chunk_at: float, streamed_at: float, response: MessageRecord
+    ) -> None:
+        """Observe duration and token throughput of a completed stream"""
+        metrics.STREAM_DURATION.observe(time.perf_counter() - started)
+        metrics.STREAM_TOKENS.inc(response.tokens)
+        if first_chunk_at and streamed_at > first_chunk_at:
+            metrics.STREAM_TOKENS_PER_SECOND.observe(
+                response.tokens / (streamed_at - first_chunk_at)
+            )
+
+    def _generate(
+        self,
+        message: str,
+        conversation_history: List[MessageRecord],
+        session_id: str,
+    ) -> AsyncIterator[str]:
+        """Stream from the provider, sharing identical concurrent generations"""
+
+        def start() -> AsyncIterator[str]:
+            return self.gemini_service.generate_streaming_response(
+                prompt=message,
+                conversation_history=conversation_history,
+                session_id=session_id,
+            )
+
+        if self.single_flight is None:
+            return start()
+        key = self.single_flight.key(message, conversation_history)
+        return self.single_flight.stream(key, start)
+
+    async def _artifact_event(
+        self,
+        event: FenceEvent,
+        session_id: str,
+        message_id: str,
+        artifact_ids: Dict[int, str],
+        artifacts: List[CodeArtifact],
+    ) -> Dict[str, Any]:
+        """Turn a fence scanner event into an artifact lifecycle chunk"""
+        if event.kind == "started":
+            artifact_ids[event.index] = str(uuid.uuid4())
+
+        artifact_id = artifact_ids[event.index]
+        payload: Dict[str, Any] = {"id": artifact_id, "index": event.index}
+
+        if event.kind == "started":
+            payload["language"] = event.language
+        elif event.kind == "delta":
+            payload["delta"] = event.text
+        else:
+            artifact = self.artifact_service.add_artifact_from_code_block(
+                {"language": event.language, "code": event.text},
+                session_id,
+                message_id,
+                artifact_id=artifact_id,
+            )
+            if artifact:
+                artifacts.append(artifact)
+                # With shared state, another worker may serve the next
+                # request for this id: announce it once it is written
+                await self.artifact_service.committed(artifact.id)
+                if self.analysis_service is not None:
+                    # Submitted to the process pool; never awaited here
+                    self.analysis_service.schedule(
+                        self.artifact_service.get_artifact_etag(artifact.id),
+                        artifact.content,
+                        artifact.language,
+                    )
+                payload.update(
+                    title=artifact.title,
+                    type=artifact.type.value,
+                    language=artifact.language,
+                    is_runnable=artifact.is_runnable,
+                )
+            else:
+                # Empty blocks are not kept as artifacts
+                payload["discarded"] = True
+
+        return {
+            "chunk": "",
+            "message_id": message_id,
+            "session_id": session_id,
+            "is_complete": False,
+            "has_artifacts": False,
+            "artifacts": [],
+            "event": f"artifact_{event.kind}",
+            "artifact": payload,
+        }
+
+    async def get_session_artifacts(self, session_id: str) -> List[CodeArtifact]:
         """Get all artifacts for a session"""
-        return self.artifact_service.get_artifacts_by_session(session_id)
+        return await self.artifact_service.get_artifacts_by_session(session_id)
+
+    async def load_artifact(self, artifact_id: str) -> None:
+        """Cache an artifact held in shared state, so the getters below find it"""
+        await self.artifact_service.load([artifact_id])
 
     def get_artifact(self, artifact_id: str) -> Optional[CodeArtifact]:
         """Get a specific artifact"""
         return self.artifact_service.get_artifact(artifact_id)
+
+    def get_artifact_metadata(self, artifact_id: str) -> Optional[ArtifactMetadata]:
+        """Get a specific artifact without its content"""
+        return self.artifact_service.get_artifact_metadata(artifact_id)
+
+    def get_artifact_etag(self, artifact_id: str) -> Optional[str]:
+        """Get the content hash of an artifact's body"""
+        return self.artifact_service.get_artifact_etag(artifact_id)
+
+    def pick_artifact_encoding(
+        self, artifact_id: str, accept_encoding: Optional[str]
+    ) -> Optional[str]:
+        """Content coding to send an artifact with, or None for identity"""
+        return self.artifact_service.pick_encoding(artifact_id, accept_encoding)
+
+    async def get_artifact_body(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[bytes]:
+        """Get an artifact's content as UTF-8 bytes, optionally compressed"""
+        return await self.artifact_service.get_artifact_body(artifact_id, encoding)
+
+    def get_artifact_path(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[str]:
+        """Get the file holding an artifact's content, if stored on disk"""
+        return self.artifact_service.get_artifact_path(artifact_id, encoding)
+
+    async def get_artifact_json(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[bytes]:
+        """Get an artifact as JSON bytes, optionally compressed"""
+        return await self.artifact_service.get_artifact_json(artifact_id, encoding)
+
+    async def export_session_artifacts(
+        self, session_id: str, archive_format: str = "zip"
+    ) -> Optional[Iterator[bytes]]:
+        """Stream a session's artifacts as an archive, or None if it has none"""
+        entries = await self.artifact_service.export_session(session_id)
+        if entries is None:
+            return None
+        return iter_archive(archive_format, entries)
+
+    async def list_session_artifacts(
+        self,
+        session_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_content: bool = True,
+    ) -> Tuple[List[Union[CodeArtifact, ArtifactMetadata]], Optional[str], int]:
+        """Get one page of a session's artifacts"""
+        return await self.artifact_service.list_session_artifacts(
+            session_id, cursor, limit, include_content
+        )
+
+    async def get_artifact_analysis(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Get the static analysis of an artifact, computing it if needed"""
+        await self.artifact_service.load([artifact_id])
+        artifact = self.artifact_service.get_artifact_metadata(artifact_id)
+        if artifact is None:
+            return None
+        if self.analysis_service is None:
+            raise ArtifactException("Artifact analysis is disabled")
+
+        content_hash = self.artifact_service.get_artifact_etag(artifact_id)
+        result = self.analysis_service.get(content_hash, artifact.language)
+        if result is None:
+            body = await self.artifact_service.get_artifact_body(artifact_id)
+            if body is None:
+                # Deleted while its body was read
+                return None
+            result = await self.analysis_service.analyze(
+                content_hash, body.decode("utf-8"), artifact.language
+            )
+        return {
+            "artifact_id": artifact_id,
+            "language": artifact.language,
+            "content_hash": content_hash,
+            **result,
+        }
+
+    async def get_artifact_stats(self) -> Dict[str, Any]:
+        """Get artifact counts by type, language and runnable status"""
+        return await self.artifact_service.get_artifact_stats()
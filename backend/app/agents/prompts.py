@@ -168,6 +168,26 @@ Please provide:
 
 Make your explanation suitable for someone learning this concept, using clear language and practical examples."""
 
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a coding assistant.
+
+Previous summary:
+{previous_summary}
+
+New conversation turns:
+{transcript}
+
+Write a concise summary (at most {max_words} words) that merges the previous summary with the new turns. Keep:
+- What the user is building and their stated requirements or preferences
+- Decisions made, languages/frameworks chosen, and names of files, components or functions produced
+- Open questions or follow-ups the user asked for
+
+Do not include code. Respond with the summary only."""
+
+SUMMARY_CONTEXT_MESSAGE = """Summary of our earlier conversation:
+{summary}"""
+
+SUMMARY_CONTEXT_REPLY = "Understood. I'll keep that earlier context in mind."
+
 
 def get_system_prompt() -> str:
     """Get the main system prompt"""
@@ -221,3 +241,19 @@ def get_debugging_prompt(
 def get_explanation_prompt(content: str, context: str = "") -> str:
     """Get the explanation prompt"""
     return EXPLANATION_PROMPT.format(content=content, context=context)
+
+
+def get_summary_prompt(
+    previous_summary: str, transcript: str, max_words: int = 200
+) -> str:
+    """Get the rolling conversation summary prompt"""
+    return SUMMARY_PROMPT.format(
+        previous_summary=previous_summary or "(none)",
+        transcript=transcript,
+        max_words=max_words,
+    )
+
+
+def get_summary_context_message(summary: str) -> str:
+    """Get the history message that carries the conversation summary"""
+    return SUMMARY_CONTEXT_MESSAGE.format(summary=summary)
@@ -1,23 +1,115 @@
+import asyncio
+from typing import Optional
+
 from app.agents.coding_agent import CodingAgent
+from app.config.settings import get_settings
 from app.core.deps import get_coding_agent
-from app.schemas import CodeArtifact
-from fastapi import APIRouter, Depends, HTTPException, Response
+from app.core.exceptions import ArtifactException
+from app.schemas import ArtifactAnalysis, ArtifactPage, ArtifactStats, CodeArtifact
+from app.utils.archive_stream import ARCHIVE_FORMATS
+from app.utils.artifact_files import artifact_filename, content_type_for
+from app.utils.http_cache import etag_matches
+from app.utils.http_range import parse_range
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 
 router = APIRouter()
 
 
+def _cache_headers(etag: str, encoding: Optional[str]) -> dict:
+    """Validator and caching headers for an immutable artifact representation"""
+    headers = {
+        "ETag": f'"{etag}-{encoding}"' if encoding else f'"{etag}"',
+        "Cache-Control": get_settings().artifact_cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def _not_modified(request: Request, headers: dict) -> Optional[Response]:
+    """304 response when the client already holds this representation"""
+    if not etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return None
+    headers = {k: v for k, v in headers.items() if k != "Content-Encoding"}
+    return Response(status_code=304, headers=headers)
+
+
+@router.get("/stats", response_model=ArtifactStats)
+async def get_artifact_stats(
+    agent: CodingAgent = Depends(get_coding_agent),
+) -> ArtifactStats:
+    """Get artifact counts by type, language and runnable status"""
+    return ArtifactStats(**await agent.get_artifact_stats())
+
+
+@router.get("/sessions/{session_id}", response_model=ArtifactPage)
+async def list_session_artifacts(
+    session_id: str,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    include_content: bool = Query(True, description="Set to false for metadata only"),
+    agent: CodingAgent = Depends(get_coding_agent),
+) -> ArtifactPage:
+    """List a session's artifacts, oldest first, with cursor pagination"""
+    try:
+        page, next_cursor, total = await agent.list_session_artifacts(
+            session_id, cursor, limit, include_content
+        )
+    except ArtifactException as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+
+    return ArtifactPage(artifacts=page, next_cursor=next_cursor, total=total)
+
+
+@router.get("/sessions/{session_id}/export")
+async def export_session_artifacts(
+    session_id: str,
+    format: str = Query("zip", pattern="^(zip|tar\\.gz)$"),
+    agent: CodingAgent = Depends(get_coding_agent),
+):
+    """Download all of a session's artifacts as a zip or tar.gz archive"""
+    archive = await agent.export_session_artifacts(session_id, format)
+    if archive is None:
+        raise HTTPException(status_code=404, detail="No artifacts for this session")
+
+    # A sync iterator: Starlette runs it in the threadpool, so compression
+    # stays off the event loop and the archive is sent as it is built
+    return StreamingResponse(
+        archive,
+        media_type=ARCHIVE_FORMATS[format],
+        headers={
+            "Content-Disposition": f"attachment; filename=artifacts-{session_id}.{format}"
+        },
+    )
+
+
 @router.get("/{artifact_id}", response_model=CodeArtifact)
 async def get_artifact(
-    artifact_id: str, agent: CodingAgent = Depends(get_coding_agent)
-) -> CodeArtifact:
-    """Get a specific artifact by ID"""
+    artifact_id: str, request: Request, agent: CodingAgent = Depends(get_coding_agent)
+) -> Response:
+    """Get a specific artifact by ID (ETag validated, gzip/zstd negotiated)"""
     try:
-        artifact = agent.get_artifact(artifact_id)
+        await agent.load_artifact(artifact_id)
+        etag = agent.get_artifact_etag(artifact_id)
 
-        if not artifact:
+        if not etag:
             raise HTTPException(status_code=404, detail="Artifact not found")
 
-        return artifact
+        encoding = agent.pick_artifact_encoding(
+            artifact_id, request.headers.get("accept-encoding")
+        )
+        # The JSON carries metadata too; tie the validator to this artifact
+        headers = _cache_headers(f"{artifact_id}.{etag}", encoding)
+        not_modified = _not_modified(request, headers)
+        if not_modified is not None:
+            return not_modified
+
+        content = await agent.get_artifact_json(artifact_id, encoding)
+        if content is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        return Response(content=content, media_type="application/json", headers=headers)
 
     except HTTPException:
         raise
@@ -25,57 +117,77 @@ async def get_artifact(
         raise HTTPException(status_code=500, detail=f"Failed to get artifact: {str(e)}")
 
 
+@router.get("/{artifact_id}/analysis", response_model=ArtifactAnalysis)
+async def get_artifact_analysis(
+    artifact_id: str, agent: CodingAgent = Depends(get_coding_agent)
+) -> ArtifactAnalysis:
+    """Get imports, functions, validation and (for Python) syntax of an artifact"""
+    try:
+        analysis = await asyncio.wait_for(
+            agent.get_artifact_analysis(artifact_id),
+            timeout=get_settings().analysis_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Artifact analysis timed out")
+
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return ArtifactAnalysis(**analysis)
+
+
 @router.get("/{artifact_id}/download")
 async def download_artifact(
-    artifact_id: str, agent: CodingAgent = Depends(get_coding_agent)
+    artifact_id: str, request: Request, agent: CodingAgent = Depends(get_coding_agent)
 ):
-    """Download an artifact as a file"""
+    """Download an artifact as a file (supports Range and conditional requests)"""
     try:
-        artifact = agent.get_artifact(artifact_id)
+        await agent.load_artifact(artifact_id)
+        artifact = agent.get_artifact_metadata(artifact_id)
 
         if not artifact:
             raise HTTPException(status_code=404, detail="Artifact not found")
 
-        # Determine file extension based on language/type
-        extension_map = {
-            "python": "py",
-            "javascript": "js",
-            "html": "html",
-            "css": "css",
-            "jsx": "jsx",
-            "typescript": "ts",
-            "json": "json",
-            "markdown": "md",
-            "bash": "sh",
-            "sql": "sql",
-        }
-
-        extension = extension_map.get(artifact.language.lower(), "txt")
-        filename = f"{artifact.title.replace(' ', '_').lower()}.{extension}"
-
-        # Determine content type
-        content_type_map = {
-            "py": "text/x-python",
-            "js": "application/javascript",
-            "html": "text/html",
-            "css": "text/css",
-            "jsx": "text/jsx",
-            "ts": "application/typescript",
-            "json": "application/json",
-            "md": "text/markdown",
-            "sh": "text/x-shellscript",
-            "sql": "application/sql",
-        }
-
-        content_type = content_type_map.get(extension, "text/plain")
+        filename = artifact_filename(artifact.title, artifact.language)
+        content_type = content_type_for(filename)
+
+        # Ranges refer to the identity body, so only compress full responses
+        encoding = None
+        if "range" not in request.headers:
+            encoding = agent.pick_artifact_encoding(
+                artifact_id, request.headers.get("accept-encoding")
+            )
+        headers = _cache_headers(agent.get_artifact_etag(artifact_id), encoding)
+        not_modified = _not_modified(request, headers)
+        if not_modified is not None:
+            return not_modified
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+        headers["Accept-Ranges"] = "bytes"
+
+        # Bodies on disk are sent from the file (sendfile / pathsend where
+        # the server supports it); FileResponse handles Range itself
+        path = agent.get_artifact_path(artifact_id, encoding)
+        if path is not None:
+            return FileResponse(path, media_type=content_type, headers=headers)
+
+        body = await agent.get_artifact_body(artifact_id, encoding) or b""
+        if encoding:
+            return Response(content=body, media_type=content_type, headers=headers)
+        try:
+            byte_range = parse_range(request.headers.get("range"), len(body))
+        except ValueError:
+            return Response(
+                status_code=416, headers={"Content-Range": f"bytes */{len(body)}"}
+            )
+        if byte_range is None:
+            return Response(content=body, media_type=content_type, headers=headers)
 
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
         return Response(
-            content=artifact.content,
+            content=body[start : end + 1],
+            status_code=206,
             media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": content_type,
-            },
+            headers=headers,
         )
 
     except HTTPException:
@@ -1,31 +1,119 @@
+import hmac
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
 from app.agents.coding_agent import CodingAgent
-from app.core.deps import get_coding_agent
-from app.core.exceptions import InvalidRequestException
+from app.config.settings import get_settings
+from app.core.deps import get_admission_controller, get_coding_agent
+from app.core.exceptions import (
+    ForbiddenException,
+    InvalidRequestException,
+    TooManyRequestsException,
+)
+from app.services.admission import AdmissionController
 from app.schemas import ChatRequest, StreamChunk
-from fastapi import APIRouter, Depends, HTTPException
+from app.utils.profiler import RequestProfiler
+from app.utils.spans import SpanRecorder
+from app.utils.sse import DONE_FRAME, SSEEncoder
+from app.utils.stream_coalescer import coalesce_stream
+from fastapi import APIRouter, Depends, Header, HTTPException
 from fastapi.responses import StreamingResponse
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls on_close however the response ends.
+
+    A client that disconnects before the body starts never enters the
+    generator, so cleanup in its finally would not run.
+    """
+
+    def __init__(self, *args, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.on_close is not None:
+                self.on_close()
 
 
 @router.post("/stream")
 async def chat_stream(
-    request: ChatRequest, agent: CodingAgent = Depends(get_coding_agent)
+    request: ChatRequest,
+    agent: CodingAgent = Depends(get_coding_agent),
+    admission: Optional[AdmissionController] = Depends(get_admission_controller),
+    profile_token: Optional[str] = Header(None, alias="X-Profile"),
 ):
-    """Send a message to the coding agent with streaming response"""
+    """Send a message to the coding agent with streaming response.
+
+    The final chunk carries server_timing, the milliseconds spent in each
+    phase (queue, history, ttft, upstream, send, artifacts, persist,
+    serialize), since the response headers are sent before they are known.
+    """
+    settings = get_settings()
+
+    profiler = None
+    if profile_token is not None:
+        if not settings.profile_token or not hmac.compare_digest(
+            profile_token.encode(), settings.profile_token.encode()
+        ):
+            raise ForbiddenException("Profiling is not enabled for this token")
+        profiler = RequestProfiler(settings.profile_dir, request.session_id)
+
     try:
+        # Decide admission before responding so a full queue can return 429
+        ticket = admission.enter(request.session_id) if admission else None
 
         async def generate_stream():
             """Generate streaming response"""
+            spans = SpanRecorder()
+            profiling = False
             try:
-                async for chunk_data in agent.stream_response(
-                    message=request.message, session_id=request.session_id
-                ):
-                    chunk = StreamChunk(**chunk_data)
-                    yield f"data: {chunk.model_dump_json()}\n\n"
+                if ticket is not None:
+                    await ticket.wait()
+                    spans.lap("queue")
+                if profiler is not None:
+                    profiling = profiler.start()
+                    if not profiling:
+                        logger.debug("Profile skipped: another request is being profiled")
+
+                stream = agent.stream_response(
+                    message=request.message,
+                    session_id=request.session_id,
+                    admission=ticket.summary() if ticket else None,
+                    spans=spans,
+                )
+                if settings.stream_coalesce_enabled:
+                    stream = coalesce_stream(
+                        stream,
+                        max_bytes=settings.stream_coalesce_max_bytes,
+                        max_latency=settings.stream_coalesce_max_latency_ms / 1000,
+                    )
+
+                encoder = SSEEncoder()
+                serializing = 0.0
+                async for chunk_data in stream:
+                    if chunk_data.get("is_complete"):
+                        _finish_timing(
+                            chunk_data,
+                            spans,
+                            serializing,
+                            profiler.name if profiling else None,
+                            settings.stream_timing_log,
+                        )
+                    encoding = time.perf_counter()
+                    frame = encoder.encode(chunk_data)
+                    serializing += time.perf_counter() - encoding
+                    yield frame
 
                 # Send end marker
-                yield "data: [DONE]\n\n"
+                yield DONE_FRAME
 
             except Exception as e:
                 error_chunk = StreamChunk(
@@ -35,11 +123,20 @@ async def chat_stream(
                     is_complete=True,
                     has_artifacts=False,
                 )
-                yield f"data: {error_chunk.model_dump_json()}\n\n"
-                yield "data: [DONE]\n\n"
+                yield SSEEncoder.encode_model(error_chunk)
+                yield DONE_FRAME
 
-        return StreamingResponse(
+            finally:
+                if ticket is not None:
+                    ticket.release()
+                if profiling:
+                    profiler.stop()
+
+        # Released as soon as the stream ends, and again (a no-op) when the
+        # response closes, which also covers disconnects before it started
+        return _ReleasingStreamingResponse(
             generate_stream(),
+            on_close=ticket.release if ticket is not None else None,
             media_type="text/plain",
             headers={
                 "Cache-Control": "no-cache",
@@ -50,5 +147,28 @@ async def chat_stream(
 
     except InvalidRequestException as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TooManyRequestsException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def _finish_timing(
+    chunk_data: Dict[str, Any],
+    spans: SpanRecorder,
+    serializing: float,
+    profile: Optional[str],
+    log: bool,
+) -> None:
+    """Add the timing summary (and profile name) to a stream's final chunk"""
+    spans.add("serialize", serializing)
+    chunk_data["server_timing"] = spans.server_timing()
+    if profile is not None:
+        chunk_data["profile"] = profile
+    if log:
+        logger.debug(
+            "Stream %s (session %s): %s",
+            chunk_data["message_id"],
+            chunk_data["session_id"],
+            chunk_data["server_timing"],
+        )
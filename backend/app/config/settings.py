@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 
 
@@ -19,14 +19,136 @@ class Settings(BaseSettings):
     # CORS settings
     allowed_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
 
+    # Server processes; more than one needs a shared state_backend
+    workers: int = 1
+
+    # Shared state: "local" keeps sessions and artifacts in each process;
+    # "memory" (in-process) and "redis" store them in a StateBackend, with
+    # hot objects cached per process and invalidated when another changes them
+    state_backend: str = "local"
+    redis_url: str = "redis://localhost:6379/0"
+    state_key_prefix: str = "chatai:"
+
+    # Prometheus metrics at /metrics (per process)
+    metrics_enabled: bool = True
+
+    # Per-phase timings of each chat stream, sent in its final chunk as a
+    # Server-Timing style summary and optionally logged at debug level
+    stream_timing_log: bool = False
+    # A chat request with header "X-Profile: <profile_token>" is run under
+    # cProfile and its profile written to profile_dir; disabled when unset
+    profile_token: Optional[str] = None
+    profile_dir: str = "./profiles"
+
+    # Event-loop lag: a heartbeat exported as a histogram, and a watchdog
+    # thread that prints the loop's stack when it is blocked past the stall
+    # threshold. loop_debug also times every callback and prints slow ones
+    loop_monitor_enabled: bool = True
+    loop_lag_interval_ms: float = 100.0
+    loop_stall_threshold_ms: float = 250.0
+    loop_debug: bool = False
+    loop_slow_callback_ms: float = 50.0
+
     # Memory settings
     max_conversation_history: int = 50
+    max_sessions: int = 1000
+    session_idle_ttl_seconds: Optional[float] = 3600.0
+    session_sweep_interval_seconds: float = 60.0
+    memory_max_bytes: Optional[int] = None
+    memory_backend: str = "memory"  # memory or sqlite
+    memory_db_url: str = "sqlite:///./chat_memory.db"
+    memory_write_batch_size: int = 256
+    memory_flush_interval_ms: float = 50.0
+
+    # Context assembly (history is chosen by token budget; older turns are
+    # folded into a rolling summary in the background)
+    context_max_tokens: int = 6000
+    context_summary_enabled: bool = True
+    context_summary_max_words: int = 200
+    context_summary_message_chars: int = 2000
+
+    # Exact-match response cache (replayed hits can be paced per chunk)
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 1000
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_replay_delay_ms: float = 0.0
+
+    # Single-flight: concurrent identical requests share one generation
+    single_flight_enabled: bool = True
+    single_flight_queue_size: int = 64
+
+    # Admission control: concurrent generations beyond the limit are queued
+    # fairly across sessions; a full queue returns 429
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 32
+    admission_max_queue: int = 128
+
+    # Upstream resilience: TTFT deadline, retries before the first token,
+    # optional hedging at a TTFT percentile and a circuit breaker
+    upstream_resilience_enabled: bool = True
+    upstream_ttft_timeout_seconds: float = 20.0
+    upstream_retries: int = 2
+    upstream_retry_backoff_ms: float = 200.0
+    upstream_retry_backoff_max_ms: float = 2000.0
+    upstream_hedge_enabled: bool = False
+    upstream_hedge_percentile: float = 95.0
+    upstream_hedge_min_samples: int = 20
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 30.0
+
+    # Artifact storage: deduplicated, zstd-compressed bodies under a budget
+    artifact_max_bytes: Optional[int] = 256 * 1024 * 1024
+    artifact_compress_threshold: int = 512
+    artifact_zstd_level: int = 3
+    artifact_zstd_dictionary_path: Optional[str] = None
+    # memory or disk (one uncompressed file per body, served with sendfile,
+    # under <artifact_storage_path>/blobs, which is cleared on start)
+    artifact_storage: str = "memory"
+    artifact_storage_path: str = "./artifact_store"
+    # HTTP: artifacts never change, so responses are cacheable indefinitely;
+    # gzip/zstd variants are built on first request and kept
+    artifact_cache_control: str = "private, max-age=31536000, immutable"
+    artifact_encode_min_bytes: int = 1024
+    artifact_variant_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Artifact analysis (imports, functions, validation, Python ast) runs on
+    # a process pool after each artifact is created; results cached by hash
+    analysis_enabled: bool = True
+    analysis_workers: int = 2
+    analysis_cache_entries: int = 10000
+    analysis_max_pending: int = 256
+    analysis_timeout_seconds: float = 10.0
 
     # Gemini settings
     gemini_model: str = "gemini-2.0-flash-exp"
     max_tokens: int = 8192
     temperature: float = 0.1
 
+    # Streaming settings
+    gemini_stream_workers: int = 32
+    gemini_stream_queue_size: int = 16
+
+    # SSE frame coalescing (merge small chunks up to a size or latency window;
+    # the first text chunk is always sent at once)
+    stream_coalesce_enabled: bool = True
+    stream_coalesce_max_bytes: int = 1024
+    stream_coalesce_max_latency_ms: float = 25.0
+
+    # LLM provider settings (gemini, fake or replay)
+    llm_provider: str = "gemini"
+    fake_ttft_ms: float = 300.0
+    fake_chunk_delay_ms: float = 30.0
+    fake_jitter_ms: float = 10.0
+    fake_failure_rate: float = 0.0
+    fake_fail_after_chunks: int = 0
+    fake_seed: int = 0
+    fake_slow_rate: float = 0.0
+    fake_slow_ttft_ms: float = 5000.0
+    replay_file: Optional[str] = None
+    replay_speed: float = 1.0
+    record_streams_file: Optional[str] = None
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,26 +1,254 @@
 from functools import lru_cache
+from typing import Optional
 from app.config.settings import get_settings, Settings
 from app.services.gemini_service import GeminiService
+from app.services.fake_provider import FakeProvider, RecordingProvider, ReplayProvider
+from app.services.llm_provider import LLMProvider
 from app.services.memory_service import MemoryService
+from app.services.memory_store import SQLiteConversationStore, StateConversationStore
+from app.services.state_backend import InProcessStateBackend, RedisStateBackend, StateBackend
 from app.services.artifact_service import ArtifactService
+from app.services.blob_store import BlobStore, DiskBlobStore
+from app.utils.http_cache import EncodedVariantCache
+from app.services.admission import AdmissionController
+from app.services.analysis_service import AnalysisService
+from app.services.loop_monitor import LoopLagMonitor
+from app.services.resilience import CircuitBreaker, ResilientProvider
+from app.services.response_cache import CachingProvider, ResponseCache
+from app.services.single_flight import StreamSingleFlight
+from app.agents.prompts import get_system_prompt
+from app.services.context_service import ContextService
 from app.agents.coding_agent import CodingAgent
 
 
 @lru_cache()
-def get_gemini_service() -> GeminiService:
+def get_base_provider() -> LLMProvider:
+    """Build the LLM provider selected by settings.llm_provider"""
     settings = get_settings()
-    return GeminiService(api_key=settings.google_api_key)
+
+    if settings.llm_provider == "fake":
+        provider: LLMProvider = FakeProvider(
+            ttft_ms=settings.fake_ttft_ms,
+            chunk_delay_ms=settings.fake_chunk_delay_ms,
+            jitter_ms=settings.fake_jitter_ms,
+            failure_rate=settings.fake_failure_rate,
+            fail_after_chunks=settings.fake_fail_after_chunks,
+            seed=settings.fake_seed,
+            slow_rate=settings.fake_slow_rate,
+            slow_ttft_ms=settings.fake_slow_ttft_ms,
+        )
+    elif settings.llm_provider == "replay":
+        if not settings.replay_file:
+            raise ValueError("replay_file must be set when llm_provider is 'replay'")
+        provider = ReplayProvider(settings.replay_file, speed=settings.replay_speed)
+    elif settings.llm_provider == "gemini":
+        provider = GeminiService(api_key=settings.google_api_key)
+        # Keep the prepared-history cache in step with stored sessions
+        get_memory_service().add_listener(provider.history_cache)
+    else:
+        raise ValueError(f"Unknown llm_provider: {settings.llm_provider}")
+
+    if settings.record_streams_file:
+        provider = RecordingProvider(provider, settings.record_streams_file)
+
+    if settings.upstream_resilience_enabled:
+        provider = ResilientProvider(
+            provider,
+            ttft_timeout=settings.upstream_ttft_timeout_seconds,
+            retries=settings.upstream_retries,
+            backoff=settings.upstream_retry_backoff_ms / 1000,
+            backoff_max=settings.upstream_retry_backoff_max_ms / 1000,
+            hedge_percentile=(
+                settings.upstream_hedge_percentile if settings.upstream_hedge_enabled else None
+            ),
+            hedge_min_samples=settings.upstream_hedge_min_samples,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.circuit_failure_threshold,
+                reset_timeout=settings.circuit_reset_seconds,
+            ),
+        )
+
+    return provider
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    settings = get_settings()
+    return ResponseCache(
+        max_entries=settings.response_cache_max_entries,
+        max_bytes=settings.response_cache_max_bytes,
+        ttl=settings.response_cache_ttl_seconds,
+    )
+
+
+def get_provider_fingerprint() -> str:
+    """Everything besides history and prompt that shapes a response"""
+    settings = get_settings()
+    return "|".join(
+        (
+            settings.llm_provider,
+            settings.gemini_model,
+            str(settings.temperature),
+            str(settings.max_tokens),
+            get_system_prompt(),
+        )
+    )
+
+
+@lru_cache()
+def get_gemini_service() -> LLMProvider:
+    """The provider used for chat responses, behind the response cache"""
+    settings = get_settings()
+    provider = get_base_provider()
+
+    if settings.response_cache_enabled:
+        provider = CachingProvider(
+            provider,
+            get_response_cache(),
+            get_provider_fingerprint(),
+            chunk_delay=settings.response_cache_replay_delay_ms / 1000,
+        )
+
+    return provider
+
+
+@lru_cache()
+def get_state_backend() -> Optional[StateBackend]:
+    """The shared state backend, or None when state stays in each process"""
+    settings = get_settings()
+    if settings.state_backend == "local":
+        return None
+    if settings.state_backend == "memory":
+        return InProcessStateBackend()
+    if settings.state_backend == "redis":
+        return RedisStateBackend(settings.redis_url, prefix=settings.state_key_prefix)
+    raise ValueError(f"Unknown state_backend: {settings.state_backend}")
 
 
 @lru_cache()
 def get_memory_service() -> MemoryService:
     settings = get_settings()
-    return MemoryService(max_conversations=settings.max_conversation_history)
+    state = get_state_backend()
+
+    store = None
+    if state is not None:
+        if settings.memory_backend != "memory":
+            raise ValueError("memory_backend must be 'memory' with a shared state_backend")
+        store = StateConversationStore(
+            state,
+            max_messages=settings.max_conversation_history,
+            batch_size=settings.memory_write_batch_size,
+            flush_interval=settings.memory_flush_interval_ms / 1000,
+        )
+    elif settings.memory_backend == "sqlite":
+        store = SQLiteConversationStore(
+            settings.memory_db_url,
+            max_messages=settings.max_conversation_history,
+            batch_size=settings.memory_write_batch_size,
+            flush_interval=settings.memory_flush_interval_ms / 1000,
+        )
+    elif settings.memory_backend != "memory":
+        raise ValueError(f"Unknown memory_backend: {settings.memory_backend}")
+
+    return MemoryService(
+        max_conversations=settings.max_sessions,
+        store=store,
+        max_messages=settings.max_conversation_history,
+        idle_ttl=settings.session_idle_ttl_seconds,
+        max_bytes=settings.memory_max_bytes,
+    )
 
 
 @lru_cache()
 def get_artifact_service() -> ArtifactService:
-    return ArtifactService()
+    settings = get_settings()
+
+    if settings.artifact_storage == "disk":
+        if settings.workers > 1:
+            # The store owns its directory: workers would delete each other's files
+            raise ValueError("artifact_storage 'disk' cannot be shared by several workers")
+        blob_store = DiskBlobStore(settings.artifact_storage_path)
+    elif settings.artifact_storage == "memory":
+        dictionary = None
+        if settings.artifact_zstd_dictionary_path:
+            with open(settings.artifact_zstd_dictionary_path, "rb") as handle:
+                dictionary = handle.read()
+
+        blob_store = BlobStore(
+            compress_threshold=settings.artifact_compress_threshold,
+            level=settings.artifact_zstd_level,
+            dictionary=dictionary,
+        )
+    else:
+        raise ValueError(f"Unknown artifact_storage: {settings.artifact_storage}")
+
+    return ArtifactService(
+        blob_store=blob_store,
+        max_bytes=settings.artifact_max_bytes,
+        variants=EncodedVariantCache(settings.artifact_variant_cache_max_bytes),
+        encode_min_bytes=settings.artifact_encode_min_bytes,
+        state=get_state_backend(),
+    )
+
+
+@lru_cache()
+def get_analysis_service() -> Optional[AnalysisService]:
+    settings = get_settings()
+    if not settings.analysis_enabled:
+        return None
+    return AnalysisService(
+        max_workers=settings.analysis_workers,
+        max_entries=settings.analysis_cache_entries,
+        max_pending=settings.analysis_max_pending,
+    )
+
+
+@lru_cache()
+def get_single_flight() -> Optional[StreamSingleFlight]:
+    settings = get_settings()
+    if not settings.single_flight_enabled:
+        return None
+    return StreamSingleFlight(
+        get_provider_fingerprint(), queue_size=settings.single_flight_queue_size
+    )
+
+
+@lru_cache()
+def get_admission_controller() -> Optional[AdmissionController]:
+    settings = get_settings()
+    if not settings.admission_enabled:
+        return None
+    return AdmissionController(
+        max_in_flight=settings.admission_max_in_flight,
+        max_queue=settings.admission_max_queue,
+    )
+
+
+@lru_cache()
+def get_loop_monitor() -> Optional[LoopLagMonitor]:
+    settings = get_settings()
+    if not settings.loop_monitor_enabled:
+        return None
+    return LoopLagMonitor(
+        interval=settings.loop_lag_interval_ms / 1000,
+        stall_threshold=settings.loop_stall_threshold_ms / 1000,
+        slow_callback_threshold=(
+            settings.loop_slow_callback_ms / 1000 if settings.loop_debug else None
+        ),
+    )
+
+
+@lru_cache()
+def get_context_service() -> ContextService:
+    settings = get_settings()
+    return ContextService(
+        memory_service=get_memory_service(),
+        provider=get_base_provider(),
+        max_tokens=settings.context_max_tokens,
+        summary_enabled=settings.context_summary_enabled,
+        summary_max_words=settings.context_summary_max_words,
+        summary_message_chars=settings.context_summary_message_chars,
+    )
 
 
 def get_coding_agent() -> CodingAgent:
@@ -28,9 +256,15 @@ def get_coding_agent() -> CodingAgent:
     gemini_service = get_gemini_service()
     memory_service = get_memory_service()
     artifact_service = get_artifact_service()
+    context_service = get_context_service()
+    single_flight = get_single_flight()
+    analysis_service = get_analysis_service()
     
     return CodingAgent(
         gemini_service=gemini_service,
         memory_service=memory_service,
-        artifact_service=artifact_service
+        artifact_service=artifact_service,
+        context_service=context_service,
+        single_flight=single_flight,
+        analysis_service=analysis_service,
     )
\ No newline at end of file
@@ -17,6 +17,11 @@ class GeminiAPIException(APIException):
         super().__init__(status_code=503, detail=detail)
 
 
+class UpstreamUnavailableException(GeminiAPIException):
+    def __init__(self, detail: str = "The model is temporarily unavailable, please retry shortly"):
+        super().__init__(detail=detail)
+
+
 class MemoryException(APIException):
     def __init__(self, detail: str = "Memory operation failed"):
         super().__init__(status_code=500, detail=detail)
@@ -37,4 +42,18 @@ class SessionNotFoundException(APIException):
 
 class InvalidRequestException(APIException):
     def __init__(self, detail: str = "Invalid request"):
-        super().__init__(status_code=400, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=400, detail=detail)
+
+
+class TooManyRequestsException(APIException):
+    def __init__(self, retry_after: int = 1, detail: str = "Too many requests, please retry later"):
+        super().__init__(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class ForbiddenException(APIException):
+    def __init__(self, detail: str = "Not permitted"):
+        super().__init__(status_code=403, detail=detail)
@@ -0,0 +1,59 @@
+from app.utils.metrics import MetricsRegistry
+
+# Prometheus text format, served at /metrics
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry("chatai")
+
+# Chat streams (CodingAgent.stream_response)
+STREAM_TTFT = registry.histogram(
+    "stream_ttft_seconds",
+    "Time from receiving a chat message to its first response chunk",
+    (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0),
+)
+STREAM_CHUNK_GAP = registry.histogram(
+    "stream_chunk_gap_seconds",
+    "Time between consecutive response chunks",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+STREAM_DURATION = registry.histogram(
+    "stream_duration_seconds",
+    "Total time to stream a chat response",
+    (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+STREAM_TOKENS_PER_SECOND = registry.histogram(
+    "stream_tokens_per_second",
+    "Estimated response tokens per second after the first chunk",
+    (5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0),
+)
+STREAM_TOKENS = registry.counter("stream_tokens", "Estimated response tokens streamed")
+STREAMS_IN_FLIGHT = registry.gauge("streams_in_flight", "Chat responses being streamed")
+
+# Upstream model (GeminiService)
+UPSTREAM_TTFT = registry.histogram(
+    "upstream_ttft_seconds",
+    "Time from sending a prompt upstream to its first chunk",
+    (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0),
+)
+
+# Event loop (LoopLagMonitor)
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop's heartbeat woke up",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_STALLS = registry.counter(
+    "event_loop_stalls", "Times the event loop was blocked past the stall threshold"
+)
+EVENT_LOOP_SLOW_CALLBACKS = registry.counter(
+    "event_loop_slow_callbacks", "Event loop callbacks slower than the debug threshold"
+)
+
+ERRORS = registry.counter(
+    "errors", "Errors by where they were caught and exception class", ("component", "exception")
+)
+
+
+def record_error(component: str, error: BaseException) -> None:
+    """Count an error under its component and exception class name"""
+    ERRORS.labels(component, type(error).__name__).inc()
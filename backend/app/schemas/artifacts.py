@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 from enum import Enum
 
@@ -16,13 +16,12 @@ class ArtifactType(str, Enum):
     OTHER = "other"
 
 
-class CodeArtifact(BaseModel):
+class ArtifactMetadata(BaseModel):
     id: str
     title: str
     description: Optional[str] = None
     type: ArtifactType
     language: str
-    content: str
     session_id: str
     message_id: str
     created_at: datetime
@@ -31,6 +30,10 @@ class CodeArtifact(BaseModel):
     preview_url: Optional[str] = None
 
 
+class CodeArtifact(ArtifactMetadata):
+    content: str
+
+
 class ArtifactRequest(BaseModel):
     session_id: str
     message_id: str
@@ -38,4 +41,29 @@ class ArtifactRequest(BaseModel):
 
 class ArtifactResponse(BaseModel):
     artifacts: list[CodeArtifact]
-    total: int
\ No newline at end of file
+    total: int
+
+
+class ArtifactPage(BaseModel):
+    artifacts: List[Union[CodeArtifact, ArtifactMetadata]]
+    next_cursor: Optional[str] = None
+    total: int
+
+
+class ArtifactStats(BaseModel):
+    total_artifacts: int
+    by_type: Dict[str, int]
+    by_language: Dict[str, int]
+    runnable_count: int
+
+
+class ArtifactAnalysis(BaseModel):
+    artifact_id: str
+    language: str
+    content_hash: str
+    is_complete: bool
+    imports: List[str]
+    functions: List[Dict[str, str]]
+    validation: Dict[str, Any]
+    # Python only: ast parse result and top-level structure
+    syntax: Optional[Dict[str, Any]] = None
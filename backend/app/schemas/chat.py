@@ -47,6 +47,15 @@ class StreamChunk(BaseModel):
     is_complete: bool = False
     has_artifacts: bool = False
     artifacts: Optional[List[str]] = None
+    # Artifact lifecycle (artifact_started, artifact_delta, artifact_completed)
+    # or admission, sent first with the request's queue depth and wait
+    event: Optional[str] = None
+    artifact: Optional[Dict[str, Any]] = None
+    admission: Optional[Dict[str, Any]] = None
+    # Final chunk: per-phase milliseconds in Server-Timing syntax, and the
+    # file name of the request's profile when one was requested
+    server_timing: Optional[str] = None
+    profile: Optional[str] = None
 
 
 class ChatSession(BaseModel):
@@ -1,34 +1,99 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
 from datetime import datetime, timezone
 from .chat import ChatMessage
+from app.utils.history_buffer import HistoryRing, MessageRecord
 
+# Rough per-message cost of the record object around its strings
+MESSAGE_OVERHEAD_BYTES = 120
 
-class ConversationMemory(BaseModel):
-    session_id: str
-    messages: List[ChatMessage]
-    context: Dict[str, Any] = {}
-    created_at: datetime
-    updated_at: datetime
-    max_size: int = 50
 
-    def add_message(self, message: ChatMessage) -> None:
+def estimate_message_bytes(message: Union[ChatMessage, MessageRecord]) -> int:
+    """Estimate the memory held by a stored message"""
+    return len(message.content) + len(message.id) + MESSAGE_OVERHEAD_BYTES
+
+
+class ConversationMemory:
+    """A session's conversation state.
+
+    Kept as a plain slotted class rather than a Pydantic model because it is
+    internal to MemoryService and touched on every message. Messages are
+    stored as compact MessageRecords in a fixed-capacity ring buffer;
+    ChatMessage models are only built when `messages` or
+    `get_recent_messages` is read.
+    """
+
+    __slots__ = (
+        "session_id",
+        "context",
+        "created_at",
+        "updated_at",
+        "max_size",
+        "_history",
+        "_size_bytes",
+    )
+
+    def __init__(
+        self,
+        session_id: str,
+        created_at: datetime,
+        updated_at: datetime,
+        messages: Optional[Sequence[Union[ChatMessage, MessageRecord]]] = None,
+        context: Optional[Dict[str, Any]] = None,
+        max_size: int = 50,
+    ):
+        self.session_id = session_id
+        self.context: Dict[str, Any] = context if context is not None else {}
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.max_size = max_size
+        self._history = HistoryRing(max_size)
+        self._size_bytes = 0
+        for message in messages or []:
+            self._append(message)
+
+    @property
+    def messages(self) -> List[ChatMessage]:
+        """All stored messages as ChatMessage models, oldest first"""
+        return [record.to_message() for record in self._history]
+
+    @property
+    def size_bytes(self) -> int:
+        """Estimated memory held by this conversation's messages"""
+        return self._size_bytes
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def _append(self, message: Union[ChatMessage, MessageRecord]) -> None:
+        record = (
+            message if isinstance(message, MessageRecord) else MessageRecord.from_message(message)
+        )
+        self._size_bytes += estimate_message_bytes(record)
+
+        # The ring keeps only the last max_size messages
+        dropped = self._history.append(record)
+        if dropped is not None:
+            self._size_bytes -= estimate_message_bytes(dropped)
+
+    def add_message(self, message: Union[ChatMessage, MessageRecord]) -> None:
         """Add a message to memory and maintain size limit"""
-        self.messages.append(message)
+        self._append(message)
         self.updated_at = datetime.now(timezone.utc)
 
-        # Keep only the last max_size messages
-        if len(self.messages) > self.max_size:
-            self.messages = self.messages[-self.max_size :]
+    def get_recent_records(self, count: Optional[int] = None) -> List[MessageRecord]:
+        """Get the most recent stored records without building models"""
+        return self._history.recent(count)
 
     def get_recent_messages(self, count: int = 10) -> List[ChatMessage]:
         """Get the most recent messages"""
-        return self.messages[-count:] if self.messages else []
+        return [record.to_message() for record in self._history.recent(count)]
 
     def clear(self) -> None:
         """Clear all messages"""
-        self.messages = []
+        self._history.clear()
         self.context = {}
+        self._size_bytes = 0
         self.updated_at = datetime.now(timezone.utc)
 
 
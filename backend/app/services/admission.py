@@ -0,0 +1,178 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.exceptions import TooManyRequestsException
+
+
+class AdmissionTicket:
+    """A request's place in the admission controller.
+
+    Use as an async context manager: entering waits for a slot (if the
+    request was queued) and exiting releases it, including on cancellation.
+    """
+
+    def __init__(
+        self,
+        controller: "AdmissionController",
+        session_id: str,
+        waiter: Optional[asyncio.Future],
+        queue_depth: int,
+    ):
+        self.controller = controller
+        self.session_id = session_id
+        self.waiter = waiter
+        self.queue_depth = queue_depth
+        self.entered = time.monotonic()
+        self.admitted_at: Optional[float] = None if waiter else self.entered
+        self.released = False
+
+    @property
+    def wait_seconds(self) -> float:
+        if self.admitted_at is None:
+            return time.monotonic() - self.entered
+        return self.admitted_at - self.entered
+
+    async def wait(self) -> None:
+        """Wait until a slot is granted"""
+        if self.waiter is None or self.admitted_at is not None:
+            return
+        try:
+            await self.waiter
+        except asyncio.CancelledError:
+            self.controller._abandon(self)
+            self.released = True
+            raise
+        self.admitted_at = time.monotonic()
+        self.controller._record_wait(self.wait_seconds)
+
+    def release(self) -> None:
+        """Give the slot back; safe to call more than once"""
+        if self.released:
+            return
+        self.released = True
+        if self.admitted_at is not None:
+            self.controller._release(time.monotonic() - self.admitted_at)
+        else:
+            self.controller._abandon(self)
+
+    def summary(self) -> Dict[str, Any]:
+        """Queueing details reported to the client"""
+        return {
+            "queue_depth": self.queue_depth,
+            "wait_ms": round(self.wait_seconds * 1000, 1),
+        }
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Caps concurrent upstream generations and queues the excess fairly.
+
+    Requests beyond max_in_flight wait in per-session FIFO queues that are
+    served round-robin, so one session sending many requests cannot starve
+    the others. When max_queue requests are already waiting, new ones are
+    rejected with 429 and a Retry-After estimated from recent stream
+    durations.
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 128):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        # Session id -> its waiters; the order of sessions is the round-robin
+        self.waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # Smoothed slot hold time, used for Retry-After
+        self.avg_hold = 0.0
+
+    def enter(self, session_id: str) -> AdmissionTicket:
+        """Admit or queue a request; raises TooManyRequestsException when full"""
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return AdmissionTicket(self, session_id, None, 0)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise TooManyRequestsException(retry_after=self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        return AdmissionTicket(self, session_id, waiter, self.queued)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        if not self.avg_hold:
+            return 1
+        return max(1, math.ceil(self.avg_hold * (self.queued / self.max_in_flight + 1)))
+
+    def _grant_next(self) -> bool:
+        """Hand a free slot to the next session in round-robin order"""
+        while self.waiting:
+            session_id, waiters = next(iter(self.waiting.items()))
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self.waiting.move_to_end(session_id)
+            else:
+                del self.waiting[session_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                self.admitted += 1
+                return True
+        return False
+
+    def _release(self, held: float) -> None:
+        self.avg_hold = held if not self.avg_hold else 0.8 * self.avg_hold + 0.2 * held
+        self._hand_back()
+
+    def _hand_back(self) -> None:
+        # The slot passes straight to a waiter, or is freed
+        if not self._grant_next():
+            self.in_flight -= 1
+
+    def _abandon(self, ticket: AdmissionTicket) -> None:
+        """Drop a ticket that leaves before using its slot"""
+        waiter = ticket.waiter
+        if waiter is None:
+            return
+        if waiter.done() and not waiter.cancelled():
+            # Granted just as the client went away; pass the slot on
+            self._hand_back()
+            return
+
+        waiters = self.waiting.get(ticket.session_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self.waiting[ticket.session_id]
+
+    def _record_wait(self, wait: float) -> None:
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get admission and queueing statistics"""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / self.admitted * 1000 if self.admitted else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,180 @@
+import ast
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.code_parser import CodeParser
+from app.utils.validators import InputValidator
+
+logger = logging.getLogger(__name__)
+
+_parser = CodeParser()
+
+
+def _python_syntax(code: str) -> Dict[str, Any]:
+    """Parse Python code with ast and list its top-level structure"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return {"valid": False, "error": e.msg, "line": e.lineno, "offset": e.offset}
+    except ValueError as e:
+        # e.g. null bytes in the source
+        return {"valid": False, "error": str(e), "line": None, "offset": None}
+
+    functions, classes, modules = [], [], []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            classes.append(node.name)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+
+    return {
+        "valid": True,
+        "functions": functions,
+        "classes": classes,
+        "modules": sorted(set(modules)),
+    }
+
+
+def analyze_code(code: str, language: str) -> Dict[str, Any]:
+    """Run every static analysis on a code body; executed in a worker process"""
+    return {
+        "is_complete": _parser.is_complete_code(code, language),
+        "imports": _parser.extract_imports(code, language),
+        "functions": _parser.extract_functions(code, language),
+        "validation": InputValidator.validate_code_content(code, language),
+        "syntax": _python_syntax(code) if language == "python" else None,
+    }
+
+
+def _warm_up() -> None:
+    """No-op task used to start the worker processes ahead of time"""
+
+
+class AnalysisService:
+    """Runs artifact analyses on a process pool and caches the results.
+
+    schedule() is called as artifacts are created and only submits work: it
+    never waits, and drops the request when max_pending analyses are already
+    queued (the result is then computed when first asked for). Results are
+    cached by content hash and language, so identical bodies are analysed
+    once, and concurrent requests for the same body share one computation.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_entries: int = 10000,
+        max_pending: int = 256,
+        executor: Optional[Executor] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        # Workers are spawned rather than forked: the server process runs
+        # threads (thread pool, store writer) that fork would copy mid-state
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+        self.results: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        """Start the worker processes so the first analysis does not pay for it.
+
+        If they cannot start (e.g. the main module cannot be imported by a
+        spawned process), analyses run on a single thread instead, so the
+        app still comes up.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(
+                *(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.max_workers))
+            )
+        except Exception as e:
+            logger.warning(
+                "Analysis worker processes failed to start (%r); analysing on a thread instead", e
+            )
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+
+    def get(self, content_hash: str, language: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis for a body, if there is one"""
+        result = self.results.get((content_hash, language))
+        if result is not None:
+            self.results.move_to_end((content_hash, language))
+            self.hits += 1
+        return result
+
+    def _submit(self, key: Tuple[str, str], code: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, analyze_code, code, key[1])
+        self.pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key: Tuple[str, str], future: asyncio.Future) -> None:
+        self.pending.pop(key, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed += 1
+            print(f"Error analysing artifact: {future.exception()}")
+            return
+        self.completed += 1
+        self.results[key] = future.result()
+        while len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
+
+    def schedule(self, content_hash: str, code: str, language: str) -> None:
+        """Queue a body for analysis without waiting for it"""
+        key = (content_hash, language)
+        if key in self.results or key in self.pending:
+            return
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        try:
+            self._submit(key, code)
+        except Exception as e:
+            # A broken pool must not fail the response being streamed
+            self.failed += 1
+            print(f"Error scheduling artifact analysis: {e}")
+
+    async def analyze(self, content_hash: str, code: str, language: str) -> Dict[str, Any]:
+        """Get the analysis for a body, computing it if needed"""
+        key = (content_hash, language)
+        result = self.get(content_hash, language)
+        if result is not None:
+            return result
+        future = self.pending.get(key) or self._submit(key, code)
+        # Shield: a client giving up must not cancel work others may share
+        return await asyncio.shield(future)
+
+    def close(self) -> None:
+        """Stop the worker processes, dropping queued analyses"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get analysis cache and queue statistics"""
+        return {
+            "cached": len(self.results),
+            "pending": len(self.pending),
+            "hits": self.hits,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -1,16 +1,107 @@
-import re
+import asyncio
 import uuid
-from typing import List, Dict, Optional, Tuple
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
 from datetime import datetime
-from app.schemas import CodeArtifact, ArtifactType
+import orjson
+from app.schemas import ArtifactMetadata, CodeArtifact
+from app.services.blob_store import BlobStore, DiskBlobStore
+from app.services.state_backend import Invalidations, StateBackend
+from app.utils.archive_stream import ArchiveEntry
+from app.utils.artifact_classifier import ArtifactClassifier
+from app.utils.artifact_files import UniqueNames, artifact_filename
 from app.utils.code_parser import CodeParser
+from app.utils.http_cache import EncodedVariantCache, encode_body, negotiate_encoding
 from app.core.exceptions import ArtifactException
 
+# Rough per-artifact cost of the metadata model and index entries
+ARTIFACT_OVERHEAD_BYTES = 1500
+
+# Shared state keys
+SEQ_KEY = "artifacts:seq"
+TYPES_KEY = "artifacts:types"
+LANGUAGES_KEY = "artifacts:languages"
+FLAGS_KEY = "artifacts:flags"
+
+
+class _SessionIndex:
+    """A session's artifact ids in insertion order, keyed by sequence number"""
+
+    __slots__ = ("seqs", "ids")
 
-class ArtifactService:
     def __init__(self):
-        self.artifacts: Dict[str, CodeArtifact] = {}
+        self.seqs: List[int] = []
+        self.ids: List[str] = []
+
+
+class ArtifactService:
+    """Stores artifacts as metadata plus a reference into a BlobStore.
+
+    Bodies live in the content-addressed blob store (deduplicated and
+    compressed in memory, or one file per body with DiskBlobStore);
+    CodeArtifact models with content are only rebuilt when an artifact is
+    read. With max_bytes set, the oldest artifacts are evicted once the
+    estimated footprint (including bodies on disk) exceeds it.
+
+    For HTTP responses, the blob key doubles as a strong validator, and
+    gzip/zstd variants are produced on first request: as files next to the
+    body with DiskBlobStore, otherwise in a bounded EncodedVariantCache.
+
+    With a StateBackend, artifacts, bodies, indexes and stats are written to
+    the backend so every process sees them, and the local structures become
+    a cache: artifacts are loaded on first access, max_bytes evicts only
+    cached copies, and deletions are announced on the "artifacts" channel
+    so other processes drop theirs. Writes to the backend are queued to a
+    single writer thread (in order), so creating an artifact while a
+    response streams never blocks the loop; the stream awaits committed()
+    before announcing the id, so any process can serve it by then. Reads
+    that miss the cache go to the backend on a thread via the async
+    methods and load().
+    """
+
+    def __init__(
+        self,
+        blob_store: Optional[Union[BlobStore, DiskBlobStore]] = None,
+        max_bytes: Optional[int] = None,
+        variants: Optional[EncodedVariantCache] = None,
+        encode_min_bytes: int = 1024,
+        state: Optional[StateBackend] = None,
+    ):
+        self.artifacts: Dict[str, ArtifactMetadata] = {}
+        self.content_keys: Dict[str, str] = {}
+        self.blob_store = blob_store or BlobStore()
+        self.max_bytes = max_bytes
+        self.variants = variants or EncodedVariantCache()
+        self.encode_min_bytes = encode_min_bytes
+        self.evictions = 0
         self.code_parser = CodeParser()
+        self.classifier = ArtifactClassifier()
+        self.state = state
+        self.invalidations = Invalidations(state, "artifacts") if state is not None else None
+        self._writer = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-state-writer")
+            if state is not None
+            else None
+        )
+        self.failed_writes = 0
+        # Creations still queued to the writer, by artifact id
+        self._uncommitted: Dict[str, Future] = {}
+
+        # Secondary indexes, maintained on insert and delete. Every artifact
+        # gets an increasing sequence number, which is also the cursor used
+        # to page through a session's artifacts.
+        self._seq: Dict[str, int] = {}
+        self._next_seq = count(1)
+        self.by_session: Dict[str, _SessionIndex] = {}
+        self.by_message: Dict[str, List[str]] = {}
+
+        # Incrementally maintained stats
+        self.type_counts: Counter = Counter()
+        self.language_counts: Counter = Counter()
+        self.runnable_count = 0
 
     def extract_artifacts_from_response(
         self, response: str, session_id: str, message_id: str
@@ -22,53 +113,352 @@ class ArtifactService:
             artifacts = []
 
             for block in code_blocks:
-                artifact = self._create_artifact_from_code_block(
+                artifact = self.add_artifact_from_code_block(
                     block, session_id, message_id
                 )
                 if artifact:
                     artifacts.append(artifact)
-                    self.artifacts[artifact.id] = artifact
 
             return artifacts
 
         except Exception as e:
             raise ArtifactException(f"Failed to extract artifacts: {str(e)}")
 
+    def add_artifact_from_code_block(
+        self,
+        code_block: Dict,
+        session_id: str,
+        message_id: str,
+        artifact_id: Optional[str] = None,
+    ) -> Optional[CodeArtifact]:
+        """Create and store an artifact from a single parsed code block"""
+        artifact = self._create_artifact_from_code_block(
+            code_block, session_id, message_id, artifact_id
+        )
+        if artifact:
+            self._store(artifact)
+        return artifact
+
+    def _store(self, artifact: CodeArtifact) -> None:
+        """Store an artifact and add it to the indexes and counters"""
+        # Only the cache is checked: ids are fresh uuids, so one from another
+        # process cannot collide
+        if artifact.id in self.artifacts:
+            self.delete_artifact(artifact.id)
+
+        metadata = ArtifactMetadata.model_construct(
+            **{field: getattr(artifact, field) for field in ArtifactMetadata.model_fields}
+        )
+        if self.state is None:
+            seq = next(self._next_seq)
+            self._cache(metadata, artifact.content, seq)
+            self._index(metadata, seq)
+        else:
+            # The shared sequence number is taken by the writer; the cached
+            # copy does not need it
+            key = self._cache(metadata, artifact.content, 0)
+            future = self._write_behind(self._write_shared, metadata, key, artifact.content)
+            self._uncommitted[metadata.id] = future
+            future.add_done_callback(lambda _: self._uncommitted.pop(metadata.id, None))
+
+        self._enforce_budget()
+
+    def _cache(self, metadata: ArtifactMetadata, content: str, seq: int) -> str:
+        """Hold an artifact in the local structures; returns its content key"""
+        key = self.content_keys[metadata.id] = self.blob_store.put(content)
+        self.artifacts[metadata.id] = metadata
+        self._seq[metadata.id] = seq
+        return key
+
+    def _forget(self, artifact_id: str) -> ArtifactMetadata:
+        """Drop an artifact from the local structures"""
+        self.blob_store.release(self.content_keys.pop(artifact_id))
+        self._seq.pop(artifact_id)
+        return self.artifacts.pop(artifact_id)
+
+    def _enforce_budget(self) -> None:
+        if self.max_bytes is None:
+            return
+        # Oldest first; never the artifact just stored
+        while self.estimated_bytes > self.max_bytes and len(self.artifacts) > 1:
+            oldest = next(iter(self.artifacts))
+            if self.state is None:
+                self.delete_artifact(oldest)
+            else:
+                # The backend still has it; only the cached copy goes
+                self._forget(oldest)
+            self.evictions += 1
+
+    def _index(self, metadata: ArtifactMetadata, seq: int) -> None:
+        index = self.by_session.get(metadata.session_id)
+        if index is None:
+            index = self.by_session[metadata.session_id] = _SessionIndex()
+        index.seqs.append(seq)
+        index.ids.append(metadata.id)
+        self.by_message.setdefault(metadata.message_id, []).append(metadata.id)
+
+        self.type_counts[metadata.type.value] += 1
+        self.language_counts[metadata.language] += 1
+        if metadata.is_runnable:
+            self.runnable_count += 1
+
+    def _unindex(self, metadata: ArtifactMetadata, seq: int) -> None:
+        index = self.by_session[metadata.session_id]
+        position = bisect_right(index.seqs, seq) - 1
+        del index.seqs[position]
+        del index.ids[position]
+        if not index.ids:
+            del self.by_session[metadata.session_id]
+
+        message_ids = self.by_message[metadata.message_id]
+        message_ids.remove(metadata.id)
+        if not message_ids:
+            del self.by_message[metadata.message_id]
+
+        self._decrement(self.type_counts, metadata.type.value)
+        self._decrement(self.language_counts, metadata.language)
+        if metadata.is_runnable:
+            self.runnable_count -= 1
+
+    # Shared state -------------------------------------------------------
+
+    def _write_behind(self, write: Callable[..., None], *args: Any) -> Future:
+        """Queue a backend write to the writer thread"""
+        future = self._writer.submit(write, *args)
+        future.add_done_callback(self._write_done)
+        return future
+
+    def _write_done(self, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            self.failed_writes += 1
+            print(f"Error writing artifact state: {error}")
+
+    async def committed(self, artifact_id: str) -> None:
+        """Wait until an artifact created here is in the backend.
+
+        A failed write is counted and logged by the writer, not raised here.
+        """
+        future = self._uncommitted.get(artifact_id)
+        if future is not None:
+            await asyncio.wait((asyncio.wrap_future(future),))
+
+    def flush(self) -> None:
+        """Wait until queued backend writes are done"""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def close(self) -> None:
+        """Finish queued backend and body writes and stop the writers"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+        self.blob_store.close()
+
+    def _write_shared(self, metadata: ArtifactMetadata, key: str, content: str) -> None:
+        seq = self.state.incr(SEQ_KEY)
+        document = {"metadata": metadata.model_dump(mode="json"), "key": key, "seq": seq}
+        with self.state.batch() as state:
+            state.set(f"artifact:{metadata.id}", orjson.dumps(document))
+            state.set(f"blob:{key}", content.encode("utf-8"))
+            state.incr(f"blob:{key}:refs")
+            state.index_add(f"artifacts:session:{metadata.session_id}", seq, metadata.id)
+            state.index_add(f"artifacts:message:{metadata.message_id}", seq, metadata.id)
+            state.counter_add(TYPES_KEY, metadata.type.value)
+            state.counter_add(LANGUAGES_KEY, metadata.language)
+            if metadata.is_runnable:
+                state.counter_add(FLAGS_KEY, "runnable")
+
+    def _delete_shared(self, metadata: ArtifactMetadata, key: str) -> None:
+        remaining = self.state.incr(f"blob:{key}:refs", -1)
+        with self.state.batch() as state:
+            state.delete(f"artifact:{metadata.id}")
+            if remaining <= 0:
+                state.delete(f"blob:{key}", f"blob:{key}:refs")
+            state.index_remove(f"artifacts:session:{metadata.session_id}", metadata.id)
+            state.index_remove(f"artifacts:message:{metadata.message_id}", metadata.id)
+            state.counter_add(TYPES_KEY, metadata.type.value, -1)
+            state.counter_add(LANGUAGES_KEY, metadata.language, -1)
+            if metadata.is_runnable:
+                state.counter_add(FLAGS_KEY, "runnable", -1)
+            self.invalidations.publish(metadata.id, state)
+
+    def _read_shared(self, artifact_id: str) -> Optional[Tuple[ArtifactMetadata, str, int]]:
+        """An artifact's metadata, content key and sequence number from the backend"""
+        document = self.state.get(f"artifact:{artifact_id}")
+        if document is None:
+            return None
+        document = orjson.loads(document)
+        metadata = ArtifactMetadata.model_validate(document["metadata"])
+        return metadata, document["key"], document["seq"]
+
+    def _fetch_shared(
+        self, artifact_ids: List[str]
+    ) -> List[Optional[Tuple[ArtifactMetadata, int, str]]]:
+        """Metadata, sequence number and body of each artifact from the backend.
+
+        Touches only the backend, so it can run on a thread.
+        """
+        fetched = []
+        for artifact_id in artifact_ids:
+            stored = self._read_shared(artifact_id)
+            body = self.state.get(f"blob:{stored[1]}") if stored is not None else None
+            if body is None:
+                fetched.append(None)
+            else:
+                fetched.append((stored[0], stored[2], body.decode("utf-8")))
+        return fetched
+
+    def _load_shared(self, artifact_id: str) -> Optional[ArtifactMetadata]:
+        """Cache an artifact from the backend (blocking; see load())"""
+        fetched = self._fetch_shared([artifact_id])[0]
+        if fetched is None:
+            return None
+        metadata, seq, content = fetched
+        self._cache(metadata, content, seq)
+        self._enforce_budget()
+        return metadata
+
+    async def load(self, artifact_ids: List[str]) -> None:
+        """Cache artifacts from the backend, reading it off the event loop.
+
+        The synchronous getters load a missing artifact inline, blocking on
+        the backend; async callers load first so that those find it cached.
+        """
+        if self.state is None:
+            return
+        self._drop_changed()
+        missing = [artifact_id for artifact_id in artifact_ids if artifact_id not in self.artifacts]
+        if not missing:
+            return
+        fetched = await asyncio.to_thread(self._fetch_shared, missing)
+        for artifact_id, stored in zip(missing, fetched):
+            if stored is not None and artifact_id not in self.artifacts:
+                metadata, seq, content = stored
+                self._cache(metadata, content, seq)
+        self._enforce_budget()
+
+    def _drop_changed(self) -> None:
+        """Drop cached artifacts that other processes have deleted or replaced"""
+        for artifact_id in self.invalidations.drain():
+            if artifact_id in self.artifacts:
+                self._forget(artifact_id)
+
+    def _shared_ids(self, index_key: str) -> List[str]:
+        return [artifact_id for _, artifact_id in self.state.index_range(index_key)]
+
+    def _loaded(
+        self, artifact_ids: List[str], include_content: bool = True
+    ) -> List[Union[CodeArtifact, ArtifactMetadata]]:
+        """Artifacts by id, loading uncached ones and skipping missing ones"""
+        artifacts = []
+        for artifact_id in artifact_ids:
+            metadata = self.get_artifact_metadata(artifact_id)
+            if metadata is not None:
+                # Built now: loading the next one may evict this one from the cache
+                artifacts.append(self._with_content(metadata) if include_content else metadata)
+        return artifacts
+
+    async def _load_artifacts(
+        self, artifact_ids: List[str], include_content: bool = True
+    ) -> List[Union[CodeArtifact, ArtifactMetadata]]:
+        """Artifacts by id from the backend, skipping missing ones.
+
+        When they all fit in the cache their bodies are read together (off
+        the loop for files); when loading them evicts some, each is built as
+        it is loaded instead, before a later one can evict it.
+        """
+        evictions = self.evictions
+        await self.load(artifact_ids)
+        if self.evictions != evictions:
+            return self._loaded(artifact_ids, include_content)
+        cached = self._cached(
+            artifact_id for artifact_id in artifact_ids if artifact_id in self.artifacts
+        )
+        if not include_content:
+            return [metadata for metadata, _ in cached]
+        return await self._with_contents(cached)
+
+    def _content_key(self, artifact_id: str) -> Optional[str]:
+        if self.state is not None:
+            # Loads the artifact if another process created it
+            self.get_artifact_metadata(artifact_id)
+        return self.content_keys.get(artifact_id)
+
+    @property
+    def estimated_bytes(self) -> int:
+        """Estimated bytes held by stored artifacts and their bodies"""
+        return self.blob_store.stored_bytes + len(self.artifacts) * ARTIFACT_OVERHEAD_BYTES
+
+    def _with_content(self, metadata: ArtifactMetadata) -> CodeArtifact:
+        """Rebuild the full artifact model from metadata and its body"""
+        return CodeArtifact.model_construct(
+            **dict(metadata), content=self.blob_store.get(self.content_keys[metadata.id])
+        )
+
+    def _cached(self, artifact_ids: Iterable[str]) -> List[Tuple[ArtifactMetadata, str]]:
+        """Cached artifacts with their content keys"""
+        return [
+            (self.artifacts[artifact_id], self.content_keys[artifact_id])
+            for artifact_id in artifact_ids
+        ]
+
+    def _bodies(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.blob_store.get_bytes(key) for key in keys]
+
+    async def _read_bodies(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Bodies by content key, read on a thread when they are files"""
+        if self.blob_store.blocking_reads:
+            return await asyncio.to_thread(self._bodies, keys)
+        return self._bodies(keys)
+
+    async def _with_contents(
+        self, artifacts: List[Tuple[ArtifactMetadata, str]]
+    ) -> List[CodeArtifact]:
+        """Full artifact models for (metadata, content key) pairs.
+
+        Bodies released while they were read (the artifact was deleted or
+        evicted meanwhile) are skipped.
+        """
+        bodies = await self._read_bodies([key for _, key in artifacts])
+        return [
+            CodeArtifact.model_construct(**dict(metadata), content=body.decode("utf-8"))
+            for (metadata, _), body in zip(artifacts, bodies)
+            if body is not None
+        ]
+
     def _create_artifact_from_code_block(
-        self, code_block: Dict, session_id: str, message_id: str
+        self,
+        code_block: Dict,
+        session_id: str,
+        message_id: str,
+        artifact_id: Optional[str] = None,
     ) -> Optional[CodeArtifact]:
         """Create a CodeArtifact from a parsed code block"""
         try:
             language = code_block.get("language", "text").lower()
-            content = code_block.get("code", "")
+            content = code_block.get("code", "").strip()
 
-            if not content.strip():
+            if not content:
                 return None
 
-            # Determine artifact type
-            artifact_type = self._determine_artifact_type(language, content)
-
-            # Generate title and description
-            title = self._generate_title(language, content)
-            description = self._generate_description(content, artifact_type)
-
-            # Check if it's runnable
-            is_runnable = self._is_runnable(artifact_type, content)
+            # Type, title, description, runnable flag and metrics in one pass
+            result = self.classifier.classify(content, language)
 
             artifact = CodeArtifact(
-                id=str(uuid.uuid4()),
-                title=title,
-                description=description,
-                type=artifact_type,
-                language=language,
+                id=artifact_id or str(uuid.uuid4()),
+                title=result.title,
+                description=result.description,
+                type=result.type,
+                language=result.language,
                 content=content,
                 session_id=session_id,
                 message_id=message_id,
                 created_at=datetime.utcnow(),
-                is_runnable=is_runnable,
+                is_runnable=result.is_runnable,
                 metadata={
-                    "lines_of_code": len(content.split("\n")),
-                    "character_count": len(content),
+                    "lines_of_code": result.line_count,
+                    "non_empty_lines": result.non_empty_lines,
+                    "character_count": result.character_count,
                     "extracted_from_response": True,
                 },
             )
@@ -79,167 +469,251 @@ class ArtifactService:
             print(f"Error creating artifact: {e}")
             return None
 
-    def _determine_artifact_type(self, language: str, content: str) -> ArtifactType:
-        """Determine the artifact type based on language and content"""
-        language = language.lower()
-
-        if language in ["html", "htm"]:
-            return ArtifactType.HTML
-        elif language in ["css"]:
-            return ArtifactType.CSS
-        elif language in ["javascript", "js"]:
-            return ArtifactType.JAVASCRIPT
-        elif language in ["python", "py"]:
-            return ArtifactType.PYTHON
-        elif language in ["jsx", "tsx"] or "react" in language.lower():
-            return ArtifactType.REACT
-        elif language in ["markdown", "md"]:
-            return ArtifactType.MARKDOWN
-        elif language in ["json"]:
-            return ArtifactType.JSON
-        else:
-            # Check content for clues
-            if "<html" in content.lower() or "<!doctype html" in content.lower():
-                return ArtifactType.HTML
-            elif "import React" in content or "from React" in content:
-                return ArtifactType.REACT
-            elif "def " in content or "import " in content:
-                return ArtifactType.PYTHON
-            elif "function " in content or "const " in content or "let " in content:
-                return ArtifactType.JAVASCRIPT
-            else:
-                return ArtifactType.CODE
-
-    def _generate_title(self, language: str, content: str) -> str:
-        """Generate a title for the artifact"""
-        # Try to extract title from comments or function names
-        lines = content.split("\n")[:5]  # Check first 5 lines
-
-        for line in lines:
-            line = line.strip()
-            # Check for comments with titles
-            if line.startswith("#") or line.startswith("//") or line.startswith("/*"):
-                clean_line = re.sub(r"^[#/\*\s]+", "", line).strip()
-                if clean_line and len(clean_line) < 50:
-                    return clean_line
-
-            # Check for function names
-            func_match = re.search(r"(function|def|class)\s+(\w+)", line)
-            if func_match:
-                return f"{func_match.group(2)} ({language})"
-
-            # Check for React components
-            react_match = re.search(r"const\s+(\w+)\s*=.*=>", line)
-            if react_match:
-                return f"{react_match.group(1)} Component"
-
-        return f"{language.title()} Code"
-
-    def _generate_description(self, content: str, artifact_type: ArtifactType) -> str:
-        """Generate a description for the artifact"""
-        lines = content.split("\n")
-        line_count = len([line for line in lines if line.strip()])
-
-        if artifact_type == ArtifactType.HTML:
-            return f"HTML document with {line_count} lines"
-        elif artifact_type == ArtifactType.REACT:
-            return f"React component with {line_count} lines"
-        elif artifact_type == ArtifactType.PYTHON:
-            return f"Python code with {line_count} lines"
-        elif artifact_type == ArtifactType.JAVASCRIPT:
-            return f"JavaScript code with {line_count} lines"
-        else:
-            return f"Code artifact with {line_count} lines"
-
-    def _is_runnable(self, artifact_type: ArtifactType, content: str) -> bool:
-        """Determine if the artifact can be run/previewed"""
-        runnable_types = [
-            ArtifactType.HTML,
-            ArtifactType.JAVASCRIPT,
-            ArtifactType.REACT,
-            ArtifactType.CSS,
-        ]
+    def get_artifact(self, artifact_id: str) -> Optional[CodeArtifact]:
+        """Get an artifact by ID"""
+        metadata = self.get_artifact_metadata(artifact_id)
+        return self._with_content(metadata) if metadata is not None else None
+
+    def get_artifact_metadata(self, artifact_id: str) -> Optional[ArtifactMetadata]:
+        """Get an artifact without loading its content"""
+        if self.state is not None:
+            self._drop_changed()
+            if artifact_id not in self.artifacts:
+                return self._load_shared(artifact_id)
+        return self.artifacts.get(artifact_id)
 
-        if artifact_type in runnable_types:
-            return True
+    def get_artifact_etag(self, artifact_id: str) -> Optional[str]:
+        """Get the content hash of an artifact's body"""
+        return self._content_key(artifact_id)
 
-        # Check for complete HTML documents
-        if "<html" in content.lower() and "</html>" in content.lower():
-            return True
+    def pick_encoding(self, artifact_id: str, accept_encoding: Optional[str]) -> Optional[str]:
+        """Content coding to send an artifact with, or None for identity"""
+        key = self._content_key(artifact_id)
+        if key is None or self.blob_store.size_of(key) < self.encode_min_bytes:
+            return None
+        return negotiate_encoding(accept_encoding)
 
-        return False
+    async def get_artifact_body(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[bytes]:
+        """Get an artifact's UTF-8 encoded content, optionally compressed.
 
-    def get_artifact(self, artifact_id: str) -> Optional[CodeArtifact]:
-        """Get an artifact by ID"""
-        return self.artifacts.get(artifact_id)
+        Compression runs on a thread; results are kept in the variant cache.
+        """
+        key = self._content_key(artifact_id)
+        if key is None:
+            return None
+        if encoding is not None:
+            encoded = self.variants.lookup((key, encoding))
+            if encoded is not None:
+                return encoded
+        body = (await self._read_bodies([key]))[0]
+        if body is None or encoding is None:
+            return body
+        encoded = await asyncio.to_thread(encode_body, body, encoding)
+        return self.variants.store((key, encoding), encoded)
+
+    def get_artifact_path(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[str]:
+        """Get the file holding an artifact's content, if bodies are on disk"""
+        key = self._content_key(artifact_id)
+        if key is None:
+            return None
+        if encoding is None:
+            return self.blob_store.path_of(key)
+        return self.blob_store.variant_path(key, encoding)
+
+    async def get_artifact_json(
+        self, artifact_id: str, encoding: Optional[str] = None
+    ) -> Optional[bytes]:
+        """Get an artifact serialized as JSON, optionally compressed"""
+        key = self._content_key(artifact_id)
+        if key is None:
+            return None
+        if encoding is not None:
+            encoded = self.variants.lookup(("json", artifact_id, key, encoding))
+            if encoded is not None:
+                return encoded
+
+        document = self.variants.lookup(("json", artifact_id, key, None))
+        if document is None:
+            artifacts = await self._with_contents([(self.artifacts[artifact_id], key)])
+            if not artifacts:
+                return None
+            document = self.variants.store(
+                ("json", artifact_id, key, None), artifacts[0].model_dump_json().encode()
+            )
+        if encoding is None:
+            return document
+        encoded = await asyncio.to_thread(encode_body, document, encoding)
+        return self.variants.store(("json", artifact_id, key, encoding), encoded)
 
-    def get_artifacts_by_session(self, session_id: str) -> List[CodeArtifact]:
+    async def _load_index(self, index_key: str) -> List[CodeArtifact]:
+        artifact_ids = await asyncio.to_thread(self._shared_ids, index_key)
+        return await self._load_artifacts(artifact_ids)
+
+    async def get_artifacts_by_session(self, session_id: str) -> List[CodeArtifact]:
         """Get all artifacts for a session"""
-        return [
-            artifact
-            for artifact in self.artifacts.values()
-            if artifact.session_id == session_id
-        ]
+        if self.state is not None:
+            return await self._load_index(f"artifacts:session:{session_id}")
+        index = self.by_session.get(session_id)
+        if index is None:
+            return []
+        return await self._with_contents(self._cached(index.ids))
+
+    async def get_artifacts_by_message(self, message_id: str) -> List[CodeArtifact]:
+        """Get all artifacts for a specific message"""
+        if self.state is not None:
+            return await self._load_index(f"artifacts:message:{message_id}")
+        return await self._with_contents(self._cached(self.by_message.get(message_id, ())))
+
+    async def export_session(self, session_id: str) -> Optional[Iterator[ArchiveEntry]]:
+        """Archive entries for a session's artifacts, or None if it has none.
+
+        The artifact list is taken now; bodies are read one at a time as the
+        entries are consumed, and artifacts deleted meanwhile are skipped.
+        With a StateBackend they are read straight from it, bypassing (and
+        not filling) the local cache.
+        """
+        if self.state is not None:
+            artifact_ids = await asyncio.to_thread(
+                self._shared_ids, f"artifacts:session:{session_id}"
+            )
+            return self._export_shared(artifact_ids)
 
-    # def get_artifacts_by_message(self, message_id: str) -> List[CodeArtifact]:
-    #     """Get all artifacts for a specific message"""
-    #     return [
-    #         artifact
-    #         for artifact in self.artifacts.values()
-    #         if artifact.message_id == message_id
-    #     ]
-
-    # def delete_artifact(self, artifact_id: str) -> bool:
-    #     """Delete an artifact"""
-    #     if artifact_id in self.artifacts:
-    #         del self.artifacts[artifact_id]
-    #         return True
-    #     return False
-
-    # def update_artifact(
-    #     self, artifact_id: str, updates: Dict
-    # ) -> Optional[CodeArtifact]:
-    #     """Update an artifact"""
-    #     if artifact_id not in self.artifacts:
-    #         return None
-
-    #     artifact = self.artifacts[artifact_id]
-    #     for key, value in updates.items():
-    #         if hasattr(artifact, key):
-    #             setattr(artifact, key, value)
-
-    #     return artifact
-
-    # def get_artifact_stats(self) -> Dict:
-    #     """Get statistics about artifacts"""
-    #     if not self.artifacts:
-    #         return {
-    #             "total_artifacts": 0,
-    #             "by_type": {},
-    #             "by_language": {},
-    #             "runnable_count": 0,
-    #         }
-
-    #     by_type = {}
-    #     by_language = {}
-    #     runnable_count = 0
-
-    #     for artifact in self.artifacts.values():
-    #         # Count by type
-    #         type_name = artifact.type.value
-    #         by_type[type_name] = by_type.get(type_name, 0) + 1
-
-    #         # Count by language
-    #         language = artifact.language
-    #         by_language[language] = by_language.get(language, 0) + 1
-
-    #         # Count runnable
-    #         if artifact.is_runnable:
-    #             runnable_count += 1
-
-    #     return {
-    #         "total_artifacts": len(self.artifacts),
-    #         "by_type": by_type,
-    #         "by_language": by_language,
-    #         "runnable_count": runnable_count,
-    #     }
+        index = self.by_session.get(session_id)
+        if index is None:
+            return None
+        artifacts = [self.artifacts[artifact_id] for artifact_id in index.ids]
+
+        def entries() -> Iterator[ArchiveEntry]:
+            names = UniqueNames()
+            for artifact in artifacts:
+                # Runs on a thread; skips artifacts deleted meanwhile
+                key = self.content_keys.get(artifact.id)
+                body = self.blob_store.get_bytes(key) if key is not None else None
+                if body is None:
+                    continue
+                name = names.add(artifact_filename(artifact.title, artifact.language))
+                yield name, body, artifact.created_at
+
+        return entries()
+
+    def _export_shared(self, artifact_ids: List[str]) -> Optional[Iterator[ArchiveEntry]]:
+        if not artifact_ids:
+            return None
+
+        def entries() -> Iterator[ArchiveEntry]:
+            names = UniqueNames()
+            for artifact_id in artifact_ids:
+                stored = self._read_shared(artifact_id)
+                body = self.state.get(f"blob:{stored[1]}") if stored is not None else None
+                if body is None:
+                    continue
+                artifact = stored[0]
+                name = names.add(artifact_filename(artifact.title, artifact.language))
+                yield name, body, artifact.created_at
+
+        return entries()
+
+    async def list_session_artifacts(
+        self,
+        session_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        include_content: bool = True,
+    ) -> Tuple[List[Union[CodeArtifact, ArtifactMetadata]], Optional[str], int]:
+        """Page through a session's artifacts, oldest first.
+
+        Returns the page, the cursor for the next page (None on the last one)
+        and the session's total. Cursors stay valid across inserts and deletes.
+        """
+        after = 0
+        if cursor:
+            try:
+                after = int(cursor)
+            except ValueError:
+                raise ArtifactException(f"Invalid cursor: {cursor}")
+
+        if self.state is not None:
+            index_key = f"artifacts:session:{session_id}"
+            # One extra entry tells whether there is a next page
+            entries, total = await asyncio.to_thread(
+                lambda: (
+                    self.state.index_range(index_key, after, limit + 1),
+                    self.state.index_count(index_key),
+                )
+            )
+            artifact_ids = [artifact_id for _, artifact_id in entries[:limit]]
+            page = await self._load_artifacts(artifact_ids, include_content)
+            next_cursor = str(entries[limit - 1][0]) if len(entries) > limit else None
+            return page, next_cursor, total
+
+        index = self.by_session.get(session_id)
+        if index is None:
+            return [], None, 0
+
+        start = bisect_right(index.seqs, after)
+        end = start + limit
+        ids = index.ids[start:end]
+        next_cursor = str(index.seqs[end - 1]) if end < len(index.seqs) else None
+        total = len(index.ids)
+        if include_content:
+            page = await self._with_contents(self._cached(ids))
+        else:
+            page = [self.artifacts[artifact_id] for artifact_id in ids]
+        return page, next_cursor, total
+
+    def delete_artifact(self, artifact_id: str) -> bool:
+        """Delete an artifact"""
+        if self.get_artifact_metadata(artifact_id) is None:
+            return False
+        key = self.content_keys[artifact_id]
+        seq = self._seq[artifact_id]
+        artifact = self._forget(artifact_id)
+
+        if self.state is None:
+            self._unindex(artifact, seq)
+        else:
+            self._write_behind(self._delete_shared, artifact, key)
+        return True
+
+    @staticmethod
+    def _decrement(counter: Counter, key: str) -> None:
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    async def get_artifact_stats(self) -> Dict:
+        """Get statistics about artifacts"""
+        if self.state is not None:
+            return await asyncio.to_thread(self._shared_stats)
+        return {
+            "total_artifacts": len(self.artifacts),
+            "by_type": dict(self.type_counts),
+            "by_language": dict(self.language_counts),
+            "runnable_count": self.runnable_count,
+        }
+
+    def _shared_stats(self) -> Dict:
+        by_type = self.state.counters(TYPES_KEY)
+        return {
+            "total_artifacts": sum(by_type.values()),
+            "by_type": by_type,
+            "by_language": self.state.counters(LANGUAGES_KEY),
+            "runnable_count": self.state.counters(FLAGS_KEY).get("runnable", 0),
+        }
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get storage statistics"""
+        return {
+            "artifacts": len(self.artifacts),
+            "estimated_bytes": self.estimated_bytes,
+            "max_bytes": self.max_bytes or 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations.count if self.invalidations is not None else 0,
+            "failed_writes": self.failed_writes,
+            **self.blob_store.get_stats(),
+            "variant_cache": self.variants.get_stats(),
+        }
@@ -0,0 +1,358 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import xxhash
+import zstandard
+
+from app.utils.http_cache import encode_body
+
+# Rough per-blob cost of the entry object and dict slot around the bytes
+BLOB_OVERHEAD_BYTES = 100
+# Subdirectory of DiskBlobStore's root holding its files; only it is cleared
+BLOB_DIRECTORY = "blobs"
+
+
+class _Blob:
+    __slots__ = ("data", "compressed", "refs", "size")
+
+    def __init__(self, data: bytes, compressed: bool, size: int):
+        self.data = data
+        self.compressed = compressed
+        self.refs = 1
+        # Length of the uncompressed body
+        self.size = size
+
+
+class BlobStore:
+    """Content-addressed, reference-counted storage for artifact bodies.
+
+    Bodies are keyed by the xxh3-128 hash of their UTF-8 bytes, so identical
+    code re-emitted across turns or sessions is stored once; each artifact
+    holds a reference and the blob is dropped with the last one. Bodies
+    larger than compress_threshold bytes are zstd-compressed, optionally with
+    a dictionary trained on code (see train_dictionary), which helps most on
+    the small-to-medium snippets typical of chat answers.
+    """
+
+    # Bodies are in memory: reading one never blocks
+    blocking_reads = False
+
+    def __init__(
+        self,
+        compress_threshold: int = 512,
+        level: int = 3,
+        dictionary: Optional[bytes] = None,
+    ):
+        self.compress_threshold = compress_threshold
+        zstd_dict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self.compressor = zstandard.ZstdCompressor(level=level, dict_data=zstd_dict)
+        self.zstd_dict = zstd_dict
+        # Bodies may be read from worker threads (archive export); zstd
+        # decompressors must not be shared between threads
+        self._local = threading.local()
+
+        self.blobs: Dict[str, _Blob] = {}
+        self.stored_bytes = 0
+        self.raw_bytes = 0
+        self.dedup_hits = 0
+
+    @staticmethod
+    def train_dictionary(samples: list, size: int = 64 * 1024) -> bytes:
+        """Train a zstd dictionary from sample bodies (str or bytes)"""
+        encoded = [s.encode("utf-8") if isinstance(s, str) else s for s in samples]
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+
+    def put(self, content: str) -> str:
+        """Store content (or add a reference to an identical body); returns its key"""
+        raw = content.encode("utf-8")
+        key = xxhash.xxh3_128_hexdigest(raw)
+
+        blob = self.blobs.get(key)
+        if blob is not None:
+            blob.refs += 1
+            self.dedup_hits += 1
+            return key
+
+        compressed = len(raw) > self.compress_threshold
+        data = raw
+        if compressed:
+            # compress() returns a bytes object over-allocated to the
+            # worst-case bound; copy it so only the compressed size is kept
+            data = memoryview(self.compressor.compress(raw)).tobytes()
+            if len(data) >= len(raw):
+                # Not worth it (already dense or tiny); keep the raw bytes
+                data, compressed = raw, False
+
+        self.blobs[key] = _Blob(data, compressed, len(raw))
+        self.stored_bytes += len(data) + BLOB_OVERHEAD_BYTES
+        self.raw_bytes += len(raw)
+        return key
+
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor(dict_data=self.zstd_dict)
+            self._local.decompressor = decompressor
+        return decompressor
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the body stored under key"""
+        data = self.get_bytes(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get the UTF-8 encoded body stored under key"""
+        blob = self.blobs.get(key)
+        if blob is None:
+            return None
+        if blob.compressed:
+            return self._decompressor().decompress(blob.data, max_output_size=blob.size)
+        return blob.data
+
+    def path_of(self, key: str) -> Optional[str]:
+        """File holding the body, for stores that keep bodies on disk"""
+        return None
+
+    def variant_path(self, key: str, encoding: str) -> Optional[str]:
+        """File holding a compressed variant, for stores that keep bodies on disk"""
+        return None
+
+    def close(self) -> None:
+        """Finish pending writes, for stores that keep bodies on disk"""
+
+    def size_of(self, key: str) -> int:
+        """Uncompressed length of the body stored under key"""
+        blob = self.blobs.get(key)
+        return blob.size if blob is not None else 0
+
+    def release(self, key: str) -> None:
+        """Drop a reference, deleting the blob with the last one"""
+        blob = self.blobs.get(key)
+        if blob is None:
+            return
+        blob.refs -= 1
+        if blob.refs <= 0:
+            del self.blobs[key]
+            self.stored_bytes -= len(blob.data) + BLOB_OVERHEAD_BYTES
+            self.raw_bytes -= blob.size
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get blob count, sizes and dedup statistics"""
+        return {
+            "blobs": len(self.blobs),
+            "stored_bytes": self.stored_bytes,
+            "raw_bytes": self.raw_bytes,
+            "compression_ratio": (
+                self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0
+            ),
+            "dedup_hits": self.dedup_hits,
+        }
+
+
+class _DiskBlob:
+    __slots__ = ("refs", "size", "variants")
+
+    def __init__(self, size: int):
+        self.refs = 1
+        self.size = size
+        # Content coding -> its write, which returns the variant's size
+        self.variants: Dict[str, Future] = {}
+
+
+class DiskBlobStore:
+    """BlobStore with one file per body under a directory.
+
+    Only the key, reference count and size of each body are kept in memory.
+    Bodies are written uncompressed so downloads can be served straight from
+    the file (sendfile, Range requests). Files are named by key and written
+    atomically in a subdirectory of root that belongs to the store
+    (BLOB_DIRECTORY); leftovers from a previous run are removed from it on
+    start, since artifact metadata is not kept across restarts, and nothing
+    else under root is touched.
+
+    put() and release() are called on the event loop (artifacts are stored
+    while a response streams), so file writes and deletes go to a single
+    writer thread, in order. Until its file is written a body is served
+    from memory and path_of() returns None. Compressed variants for HTTP
+    responses are written the same way on first request (variant_path
+    returns None until then) and removed with the body. Reads open the
+    file (blocking_reads), so async callers make them on a thread.
+    """
+
+    blocking_reads = True
+
+    def __init__(self, root: str):
+        self.root = os.path.join(root, BLOB_DIRECTORY)
+        self._remove_stale()
+        os.makedirs(self.root, exist_ok=True)
+
+        self.blobs: Dict[str, _DiskBlob] = {}
+        self.stored_bytes = 0
+        self.raw_bytes = 0
+        self.dedup_hits = 0
+        self.failed_writes = 0
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blob-writer")
+        # Bodies whose file is not written yet: key -> (write, body)
+        self._pending: Dict[str, Tuple[Future, bytes]] = {}
+        # stored_bytes is also updated by the writer thread
+        self._lock = threading.Lock()
+
+    def _remove_stale(self) -> None:
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def path_of(self, key: str) -> Optional[str]:
+        """File holding the body stored under key, once it is written"""
+        if key not in self.blobs or key in self._pending:
+            return None
+        return self._file(key)
+
+    def put(self, content: str) -> str:
+        """Store content (or add a reference to an identical body); returns its key"""
+        raw = content.encode("utf-8")
+        key = xxhash.xxh3_128_hexdigest(raw)
+
+        blob = self.blobs.get(key)
+        if blob is not None:
+            blob.refs += 1
+            self.dedup_hits += 1
+            return key
+
+        self.blobs[key] = _DiskBlob(len(raw))
+        self.raw_bytes += len(raw)
+        with self._lock:
+            self.stored_bytes += len(raw)
+            write = self._writer.submit(self._write, self._file(key), raw)
+            self._pending[key] = (write, raw)
+        write.add_done_callback(lambda done: self._written(key, done))
+        return key
+
+    def _written(self, key: str, write: Future) -> None:
+        error = write.exception()
+        if error is not None:
+            # The body stays in memory and is still served from there
+            self.failed_writes += 1
+            print(f"Error writing artifact body {key}: {error}")
+            return
+        with self._lock:
+            if self._pending.get(key, (None,))[0] is write:
+                del self._pending[key]
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a temporary name first so a reader never sees a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def variant_path(self, key: str, encoding: str) -> Optional[str]:
+        """File holding the body compressed with encoding, once it is written.
+
+        The first call queues the write and returns None.
+        """
+        blob = self.blobs.get(key)
+        if blob is None:
+            return None
+        write = blob.variants.get(encoding)
+        if write is None:
+            blob.variants[encoding] = self._writer.submit(self._write_variant, key, encoding)
+            return None
+        if not write.done() or write.exception() is not None:
+            return None
+        return f"{self._file(key)}.{encoding}"
+
+    def _write_variant(self, key: str, encoding: str) -> int:
+        # Queued after the body's own write, so its file exists
+        path = self._file(key)
+        with open(path, "rb") as handle:
+            data = encode_body(handle.read(), encoding, stored=True)
+        self._write(f"{path}.{encoding}", data)
+        with self._lock:
+            self.stored_bytes += len(data)
+        return len(data)
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the body stored under key"""
+        data = self.get_bytes(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get the UTF-8 encoded body stored under key"""
+        if key not in self.blobs:
+            return None
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[1]
+        try:
+            with open(self._file(key), "rb") as handle:
+                return handle.read()
+        except FileNotFoundError:
+            # Released (from the event loop) while this read ran on a thread
+            return None
+
+    def size_of(self, key: str) -> int:
+        """Length of the body stored under key"""
+        blob = self.blobs.get(key)
+        return blob.size if blob is not None else 0
+
+    def release(self, key: str) -> None:
+        """Drop a reference, deleting the file with the last one"""
+        blob = self.blobs.get(key)
+        if blob is None:
+            return
+        blob.refs -= 1
+        if blob.refs <= 0:
+            del self.blobs[key]
+            self.raw_bytes -= blob.size
+            with self._lock:
+                self.stored_bytes -= blob.size
+                self._pending.pop(key, None)
+                # Runs after the body's and variants' writes
+                self._writer.submit(self._remove, key, blob)
+
+    def _remove(self, key: str, blob: _DiskBlob) -> None:
+        path = self._file(key)
+        files = [path]
+        for encoding, write in blob.variants.items():
+            if write.exception() is None:
+                files.append(f"{path}.{encoding}")
+                with self._lock:
+                    self.stored_bytes -= write.result()
+        for file_path in files:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def flush(self) -> None:
+        """Wait until queued writes and deletes are done"""
+        self._writer.submit(lambda: None).result()
+
+    def close(self) -> None:
+        """Finish queued writes and deletes and stop the writer"""
+        self._writer.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get blob count, sizes and dedup statistics"""
+        return {
+            "blobs": len(self.blobs),
+            "stored_bytes": self.stored_bytes,
+            "raw_bytes": self.raw_bytes,
+            "compression_ratio": 1.0,
+            "dedup_hits": self.dedup_hits,
+            "failed_body_writes": self.failed_writes,
+        }
@@ -0,0 +1,186 @@
+import asyncio
+from typing import Dict, List, Sequence
+
+from app.agents.prompts import (
+    SUMMARY_CONTEXT_REPLY,
+    get_summary_context_message,
+    get_summary_prompt,
+)
+from app.schemas import MessageRole
+from app.services.llm_provider import LLMProvider
+from app.services.memory_service import MemoryService
+from app.utils.history_buffer import MessageRecord
+from app.utils.tokens import estimate_tokens
+
+
+class ContextService:
+    """Assembles the history sent with each prompt under a token budget.
+
+    The newest turns that fit in max_tokens (after the prompt and the running
+    summary) are sent verbatim. Turns that have fallen out of that window are
+    folded into a rolling summary by a background task after the response
+    completes, so summarization never adds latency to a request. The summary
+    and the id of the last message it covers live in the session context.
+    """
+
+    def __init__(
+        self,
+        memory_service: MemoryService,
+        provider: LLMProvider,
+        max_tokens: int = 6000,
+        summary_enabled: bool = True,
+        summary_max_words: int = 200,
+        summary_message_chars: int = 2000,
+    ):
+        self.memory_service = memory_service
+        self.provider = provider
+        self.max_tokens = max_tokens
+        self.summary_enabled = summary_enabled
+        self.summary_max_words = summary_max_words
+        self.summary_message_chars = summary_message_chars
+
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.summaries_written = 0
+
+    @staticmethod
+    def _window_start(records: Sequence[MessageRecord], budget: int) -> int:
+        """Index of the oldest record in the newest run that fits the budget"""
+        start = len(records)
+        used = 0
+        while start > 0 and used + records[start - 1].tokens <= budget:
+            start -= 1
+            used += records[start].tokens
+
+        # Start the window on a user turn so it never opens mid-exchange
+        while start < len(records) and records[start].role != MessageRole.USER:
+            start += 1
+        return start
+
+    @staticmethod
+    def _summary_prefix(context: Dict) -> List[MessageRecord]:
+        """The summary exchange sent ahead of the history, if there is a summary"""
+        summary = context.get("summary")
+        if not summary:
+            return []
+        # Ids are stable per summary version so providers can cache them
+        version = context.get("summary_upto", "")
+        return [
+            MessageRecord.create(
+                MessageRole.USER,
+                get_summary_context_message(summary),
+                message_id=f"summary:{version}",
+            ),
+            MessageRecord.create(
+                MessageRole.ASSISTANT,
+                SUMMARY_CONTEXT_REPLY,
+                message_id=f"summary-reply:{version}",
+            ),
+        ]
+
+    def _history_budget(self, prefix: List[MessageRecord], prompt_tokens: int) -> int:
+        """Tokens left for verbatim history after the prompt and the summary"""
+        return max(0, self.max_tokens - prompt_tokens - sum(record.tokens for record in prefix))
+
+    def build_history(self, session_id: str, prompt: str) -> List[MessageRecord]:
+        """Select the history to send with prompt, oldest first.
+
+        Call before the prompt itself is recorded, so it is not sent twice.
+        """
+        records = self.memory_service.get_recent_records(session_id)
+        prefix = self._summary_prefix(self.memory_service.get_context(session_id))
+        budget = self._history_budget(prefix, estimate_tokens(prompt))
+        return prefix + records[self._window_start(records, budget) :]
+
+    def _pending_records(self, session_id: str, prompt_tokens: int) -> List[MessageRecord]:
+        """Records that have left the context window but are not yet summarized"""
+        records = self.memory_service.get_recent_records(session_id)
+        context = self.memory_service.get_context(session_id)
+
+        budget = self._history_budget(self._summary_prefix(context), prompt_tokens)
+        end = self._window_start(records, budget)
+
+        # If the last summarized message has already left the ring buffer,
+        # everything still held is newer than the summary
+        begin = 0
+        summary_upto = context.get("summary_upto")
+        if summary_upto:
+            for index in range(end - 1, -1, -1):
+                if records[index].id == summary_upto:
+                    begin = index + 1
+                    break
+        return records[begin:end]
+
+    def schedule_summary(self, session_id: str, prompt_tokens: int) -> None:
+        """Fold turns that left the window into the summary, in the background.
+
+        prompt_tokens is the size of the turn's prompt, taken as the size of
+        the next one when working out what the next window leaves out.
+        """
+        if not self.summary_enabled:
+            return
+        task = self._tasks.get(session_id)
+        if task is not None and not task.done():
+            # The next turn picks up whatever this run did not cover
+            return
+
+        pending = self._pending_records(session_id, prompt_tokens)
+        if not pending:
+            return
+
+        task = asyncio.create_task(self._summarize(session_id, pending))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda done: self._forget_task(session_id, done))
+
+    def _forget_task(self, session_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+
+    async def _summarize(self, session_id: str, pending: List[MessageRecord]) -> None:
+        try:
+            await self.memory_service.load(session_id)
+            context = self.memory_service.get_context(session_id)
+
+            transcript = "\n\n".join(
+                f"{record.role.value}: {record.content[: self.summary_message_chars]}"
+                for record in pending
+            )
+            prompt = get_summary_prompt(
+                context.get("summary", ""), transcript, self.summary_max_words
+            )
+
+            parts: List[str] = []
+            async for chunk in self.provider.generate_streaming_response(prompt):
+                parts.append(chunk)
+            summary = "".join(parts).strip()
+            if not summary:
+                return
+
+            # Clearing, deleting or reloading a session replaces its context
+            # dict; drop the result rather than resurrect stale turns
+            await self.memory_service.load(session_id)
+            if self.memory_service.get_context(session_id) is not context:
+                return
+
+            self.memory_service.update_context(
+                session_id, summary=summary, summary_upto=pending[-1].id
+            )
+            self.summaries_written += 1
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error summarizing session {session_id}: {e}")
+
+    async def close(self) -> None:
+        """Cancel summaries still in flight"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get summarization statistics"""
+        return {
+            "summaries_in_flight": len(self._tasks),
+            "summaries_written": self.summaries_written,
+        }
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import random
+import time
+from itertools import count
+from pathlib import Path
+from typing import AsyncGenerator, Dict, List, Optional, Sequence, Tuple
+
+from app.core.exceptions import GeminiAPIException
+from app.services.llm_provider import LLMProvider
+from app.utils.history_buffer import HistoryMessage
+
+DEFAULT_SCRIPT = """Here's a simple counter component in React:
+
+```jsx
+import React, { useState } from 'react';
+
+// Counter component with increment and decrement buttons
+const Counter = () => {
+  const [count, setCount] = useState(0);
+
+  return (
+    <div className="counter">
+      <button onClick={() => setCount(count - 1)}>-</button>
+      <span>{count}</span>
+      <button onClick={() => setCount(count + 1)}>+</button>
+    </div>
+  );
+};
+
+export default Counter;
+```
+
+The component keeps the current value in state and re-renders on every click.
+You can style the `.counter` class to match the rest of your app."""
+
+
+def split_into_chunks(text: str, chunk_size: int = 16) -> List[str]:
+    """Split text into fixed-size chunks, roughly the size Gemini streams"""
+    return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+class FakeProvider:
+    """Deterministic local provider that streams a scripted response.
+
+    Timing is shaped by a time-to-first-token, an inter-chunk delay and
+    uniform jitter; a fraction of calls can be made slow (slow_ttft_ms) to
+    model a latency tail. Failures can be injected before the first token or
+    after a given number of chunks. Randomness is seeded per call so runs
+    repeat.
+    """
+
+    def __init__(
+        self,
+        chunks: Optional[List[str]] = None,
+        ttft_ms: float = 300.0,
+        chunk_delay_ms: float = 30.0,
+        jitter_ms: float = 10.0,
+        failure_rate: float = 0.0,
+        fail_after_chunks: int = 0,
+        seed: int = 0,
+        slow_rate: float = 0.0,
+        slow_ttft_ms: float = 5000.0,
+    ):
+        self.chunks = chunks if chunks is not None else split_into_chunks(DEFAULT_SCRIPT)
+        self.ttft_ms = ttft_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.fail_after_chunks = fail_after_chunks
+        self.seed = seed
+        self.slow_rate = slow_rate
+        self.slow_ttft_ms = slow_ttft_ms
+        self._calls = count()
+
+    def _delay(self, rng: random.Random, base_ms: float) -> float:
+        jitter = rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base_ms + jitter) / 1000
+
+    async def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream the scripted chunks with the configured timing"""
+        rng = random.Random(f"{self.seed}:{next(self._calls)}:{prompt}")
+        should_fail = rng.random() < self.failure_rate
+        is_slow = rng.random() < self.slow_rate
+
+        await asyncio.sleep(self._delay(rng, self.slow_ttft_ms if is_slow else self.ttft_ms))
+
+        for index, chunk in enumerate(self.chunks):
+            if should_fail and index == self.fail_after_chunks:
+                raise GeminiAPIException("Injected failure from fake provider")
+            if index:
+                await asyncio.sleep(self._delay(rng, self.chunk_delay_ms))
+            yield chunk
+
+        if should_fail and self.fail_after_chunks >= len(self.chunks):
+            raise GeminiAPIException("Injected failure from fake provider")
+
+
+class ReplayProvider:
+    """Replays streams captured by RecordingProvider with their original timing.
+
+    Recordings are JSON lines of the form
+    {"prompt": "...", "events": [[seconds_since_request, "chunk"], ...]}.
+    A recording whose prompt matches is preferred; otherwise recordings are
+    used round-robin. speed > 1 replays faster than real time.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.speed = speed
+        self.recordings: List[Tuple[str, List[Tuple[float, str]]]] = []
+        self.by_prompt: Dict[str, int] = {}
+
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                events = [(float(offset), text) for offset, text in record["events"]]
+                self.by_prompt.setdefault(record.get("prompt", ""), len(self.recordings))
+                self.recordings.append((record.get("prompt", ""), events))
+
+        if not self.recordings:
+            raise ValueError(f"No recorded streams found in {path}")
+        self._next = count()
+
+    async def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Replay a recorded stream, sleeping to reproduce its timing"""
+        index = self.by_prompt.get(prompt)
+        if index is None:
+            index = next(self._next) % len(self.recordings)
+        _, events = self.recordings[index]
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, text in events:
+            delay = start + offset / self.speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text
+
+
+class RecordingProvider:
+    """Wraps a provider and appends each completed stream to a replay file"""
+
+    def __init__(self, provider: LLMProvider, path: str):
+        self.provider = provider
+        self.path = Path(path)
+
+    def _append(self, line: str) -> None:
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+
+    async def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the wrapped provider while capturing chunk timing"""
+        start = time.perf_counter()
+        events: List[Tuple[float, str]] = []
+
+        async for chunk in self.provider.generate_streaming_response(
+            prompt, conversation_history, session_id
+        ):
+            events.append((round(time.perf_counter() - start, 4), chunk))
+            yield chunk
+
+        line = json.dumps({"prompt": prompt, "events": events})
+        await asyncio.to_thread(self._append, line)
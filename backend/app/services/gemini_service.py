@@ -1,11 +1,29 @@
 import asyncio
-from typing import Any, AsyncGenerator, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, AsyncGenerator, List, Optional, Sequence
 
 import google.generativeai as genai
+from google.generativeai import protos
 from app.config.settings import get_settings
+from app.core import metrics
 from app.core.exceptions import GeminiAPIException
-from app.schemas import ChatMessage, MessageRole
+from app.schemas import MessageRole
 from app.agents.prompts import get_system_prompt
+from app.utils.history_buffer import HistoryMessage
+from app.utils.history_cache import PreparedHistoryCache
+
+# Marks the end of a stream on the hand-off queue
+_STREAM_END = object()
+
+
+class _StreamError:
+    """Wraps an exception raised by the producer thread"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
 
 
 class GeminiService:
@@ -28,34 +46,131 @@ class GeminiService:
             system_instruction=get_system_prompt(),
         )
 
-    def _prepare_history(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
-        """Convert ChatMessage objects to Gemini format"""
+        # Dedicated pool for the blocking SDK iterators, sized so a burst of
+        # streams cannot starve the default executor used by the rest of the app
+        self.stream_queue_size = self.settings.gemini_stream_queue_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.settings.gemini_stream_workers,
+            thread_name_prefix="gemini-stream",
+        )
+
+        # History converted to protos.Content once per message and reused by
+        # later requests in the same session; start_chat passes Content
+        # objects through without converting them again
+        self.history_cache = PreparedHistoryCache(
+            self._to_content,
+            max_sessions=self.settings.max_sessions,
+            max_messages=self.settings.max_conversation_history + 2,
+        )
+
+    @staticmethod
+    def _to_content(msg: HistoryMessage) -> Optional[protos.Content]:
+        """Convert a stored message to Gemini format; system messages are skipped"""
+        if msg.role == MessageRole.SYSTEM:
+            return None
+        role = "user" if msg.role == MessageRole.USER else "model"
+        return protos.Content(role=role, parts=[protos.Part(text=msg.content)])
+
+    def _prepare_history(
+        self, messages: Sequence[HistoryMessage], session_id: Optional[str] = None
+    ) -> List[protos.Content]:
+        """Convert stored messages to Gemini format"""
+        if session_id is not None:
+            return self.history_cache.prepare(session_id, messages)
+
         history = []
         for msg in messages:
-            if msg.role != MessageRole.SYSTEM:
-                role = "user" if msg.role == MessageRole.USER else "model"
-                history.append({"role": role, "parts": [msg.content]})
+            content = self._to_content(msg)
+            if content is not None:
+                history.append(content)
         return history
 
+    def _produce_stream(
+        self,
+        prompt: str,
+        history: List[protos.Content],
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        stop: threading.Event,
+    ) -> None:
+        """Run the blocking Gemini stream in a worker thread.
+
+        Each chunk is handed to the event loop through a bounded queue; when the
+        consumer falls behind the put blocks this thread, which in turn stops
+        pulling from the SDK iterator (backpressure).
+        """
+
+        def put(item: Any) -> bool:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        return False
+
+        try:
+            chat = self.model.start_chat(history=history)
+            response = chat.send_message(prompt, stream=True)
+
+            for chunk in response:
+                if stop.is_set():
+                    return
+                if chunk.text and not put(chunk.text):
+                    return
+
+            put(_STREAM_END)
+
+        except BaseException as e:
+            if not stop.is_set():
+                put(_StreamError(e))
+
     async def generate_streaming_response(
-        self, prompt: str, conversation_history: List[ChatMessage] = None
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
         """Generate a streaming response from Gemini"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.stream_queue_size)
+        stop = threading.Event()
+
         try:
             # Prepare conversation history
             history = []
             if conversation_history:
-                history = self._prepare_history(conversation_history)
+                history = self._prepare_history(conversation_history, session_id)
 
-            # Start chat session
-            chat = self.model.start_chat(history=history)
+            sent = time.perf_counter()
+            producer = loop.run_in_executor(
+                self.executor, self._produce_stream, prompt, history, loop, queue, stop
+            )
 
-            # Generate streaming response
-            response = await asyncio.to_thread(chat.send_message, prompt, stream=True)
+            item = await queue.get()
+            metrics.UPSTREAM_TTFT.observe(time.perf_counter() - sent)
+            while True:
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, _StreamError):
+                    raise item.error
+                yield item
+                item = await queue.get()
 
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            await producer
 
+        except GeminiAPIException as e:
+            metrics.record_error("gemini", e)
+            raise
         except Exception as e:
+            metrics.record_error("gemini", e)
             raise GeminiAPIException(f"Failed to generate streaming response: {str(e)}")
+
+        finally:
+            # Release a producer blocked on a full queue when the consumer
+            # stops early (client disconnect or error)
+            stop.set()
+            while not queue.empty():
+                queue.get_nowait()
@@ -0,0 +1,26 @@
+from typing import AsyncIterator, Optional, Protocol, Sequence, runtime_checkable
+
+from app.utils.history_buffer import HistoryMessage
+
+
+@runtime_checkable
+class LLMProvider(Protocol):
+    """Interface for streaming text generation backends.
+
+    GeminiService is the production implementation; the fake and replay
+    providers in app.services.fake_provider implement the same contract so the
+    agent and the streaming endpoint can run without network access.
+    """
+
+    def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Stream the response to prompt as text chunks.
+
+        session_id, when given, lets a provider reuse per-session state such
+        as already converted history.
+        """
+        ...
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core import metrics
+
+
+class SlowCallback(NamedTuple):
+    seconds: float
+    # Task name and where its coroutine suspended next, or the handle's repr
+    callback: str
+
+
+# Slow callbacks are found by wrapping asyncio.events.Handle._run, which
+# costs a few hundred nanoseconds per callback. Loops that do not run their
+# callbacks through it (uvloop, or an asyncio without that private method)
+# are put in asyncio debug mode instead: slow_callback_duration then makes
+# the loop log "Executing <handle> took <seconds> seconds", which a filter
+# on the asyncio logger turns into reports. Debug mode also records a
+# traceback for every callback scheduled, so it is much slower.
+
+# (loop, threshold seconds, report) triples; callbacks are only timed while
+# any exist
+_watchers: List[Tuple[asyncio.AbstractEventLoop, float, Callable[["SlowCallback"], None]]] = []
+# Watched loops: None when timed through Handle._run, otherwise their debug
+# flag and slow_callback_duration from before debug mode was switched on
+_watched: Dict[asyncio.AbstractEventLoop, Optional[Tuple[bool, float]]] = {}
+_run_handle = getattr(asyncio.events.Handle, "_run", None)
+_asyncio_logger = logging.getLogger("asyncio")
+
+
+def _describe(handle: asyncio.Handle) -> str:
+    task = getattr(handle._callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return repr(handle)[:200]
+    # Follow the awaits down to the innermost frame: where the step ended
+    where, awaitable = "", task.get_coro()
+    while awaitable is not None:
+        frame = (
+            getattr(awaitable, "cr_frame", None)
+            or getattr(awaitable, "ag_frame", None)
+            or getattr(awaitable, "gi_frame", None)
+        )
+        if frame is not None:
+            code = frame.f_code
+            where = f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})"
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "ag_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+        )
+    return f"{task.get_name()} suspended at {where}" if where else repr(task)[:200]
+
+
+def _timed_run(handle: asyncio.Handle) -> None:
+    start = time.perf_counter()
+    try:
+        _run_handle(handle)
+    finally:
+        elapsed = time.perf_counter() - start
+        for loop, threshold, report in _watchers:
+            if elapsed > threshold and loop is handle._loop:
+                report(SlowCallback(elapsed, _describe(handle)))
+
+
+class _SlowCallbackFilter(logging.Filter):
+    """Reports debug mode's slow callback warnings and drops them from the log"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not (
+            isinstance(record.msg, str)
+            and record.msg.startswith("Executing ")
+            and isinstance(record.args, tuple)
+            and len(record.args) == 2
+        ):
+            return True
+        description, seconds = record.args
+        # Logged on the loop's own thread, right after the callback
+        loop = asyncio.get_running_loop()
+        for watched, threshold, report in _watchers:
+            if seconds > threshold and watched is loop:
+                report(SlowCallback(seconds, str(description)[:200]))
+        return False
+
+
+_filter = _SlowCallbackFilter()
+
+
+def _noop() -> None:
+    pass
+
+
+def _runs_asyncio_handles(loop: asyncio.AbstractEventLoop) -> bool:
+    """Whether wrapping Handle._run times this loop's callbacks"""
+    if _run_handle is None:
+        return False
+    handle = loop.call_soon(_noop)
+    handle.cancel()
+    return isinstance(handle, asyncio.events.Handle)
+
+
+def _add_watcher(watcher: tuple) -> None:
+    loop = watcher[0]
+    if loop not in _watched:
+        if _runs_asyncio_handles(loop):
+            _watched[loop] = None
+            asyncio.events.Handle._run = _timed_run
+        else:
+            print(
+                f"{type(loop).__name__} does not run callbacks through asyncio's Handle;"
+                " timing them in asyncio debug mode, which slows the loop down"
+            )
+            _watched[loop] = (loop.get_debug(), loop.slow_callback_duration)
+            loop.set_debug(True)
+            _asyncio_logger.addFilter(_filter)
+    _watchers.append(watcher)
+    if _watched[loop] is not None:
+        loop.slow_callback_duration = min(w[1] for w in _watchers if w[0] is loop)
+
+
+def _remove_watcher(watcher: tuple) -> None:
+    loop = watcher[0]
+    _watchers.remove(watcher)
+    thresholds = [w[1] for w in _watchers if w[0] is loop]
+    if _watched[loop] is not None:
+        if thresholds:
+            loop.slow_callback_duration = min(thresholds)
+        else:
+            debug, duration = _watched[loop]
+            loop.set_debug(debug)
+            loop.slow_callback_duration = duration
+    if not thresholds:
+        del _watched[loop]
+    if _run_handle is not None and None not in _watched.values():
+        asyncio.events.Handle._run = _run_handle
+    if not any(_watched.values()):
+        _asyncio_logger.removeFilter(_filter)
+
+
+@contextmanager
+def slow_callbacks(threshold_ms: float) -> Iterator[List[SlowCallback]]:
+    """Collect callbacks on the running loop that run longer than threshold_ms.
+
+    Every callback is timed while the block runs, so this is for debugging
+    and benchmarks.
+    """
+    found: List[SlowCallback] = []
+    watcher = (asyncio.get_running_loop(), threshold_ms / 1000, found.append)
+    _add_watcher(watcher)
+    try:
+        yield found
+    finally:
+        _remove_watcher(watcher)
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and reports what blocks the loop.
+
+    A heartbeat task sleeps for interval and observes how late it wakes up
+    (EVENT_LOOP_LAG). A watchdog thread checks the heartbeat: once the loop
+    has been stuck for stall_threshold, it prints the loop thread's current
+    stack (the blocking code, caught while it still runs) and keeps the
+    last few in stalls. With slow_callback_threshold set (debug mode),
+    every callback is also timed and each slower one is printed; see
+    _add_watcher for how that works on loops other than asyncio's.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        stall_threshold: float = 0.25,
+        slow_callback_threshold: Optional[float] = None,
+        max_stalls: int = 20,
+    ):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.slow_callback_threshold = slow_callback_threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+
+        # perf_counter() when the heartbeat last went to sleep
+        self.beat = 0.0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.slow_callback_count = 0
+
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id = 0
+        self._watcher: Optional[tuple] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop"""
+        self._loop_thread_id = threading.get_ident()
+        self.beat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        if self.slow_callback_threshold is not None:
+            self._watcher = (
+                asyncio.get_running_loop(),
+                self.slow_callback_threshold,
+                self._report_slow_callback,
+            )
+            _add_watcher(self._watcher)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self.beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - self.beat - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            metrics.EVENT_LOOP_LAG.observe(self.lag)
+
+    def _watchdog(self) -> None:
+        reported = 0.0
+        poll = min(self.interval, self.stall_threshold) / 2
+        while not self._stopped.wait(poll):
+            beat = self.beat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.stall_threshold or beat == reported:
+                continue
+            # One report per stall
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.stall_count += 1
+            metrics.EVENT_LOOP_STALLS.inc()
+            self.stalls.append(
+                {"at": time.time(), "blocked_ms": round(stalled * 1000, 1), "stack": stack}
+            )
+            print(f"Event loop blocked for over {stalled * 1000:.0f} ms at:\n{stack}")
+
+    def _report_slow_callback(self, callback: SlowCallback) -> None:
+        self.slow_callback_count += 1
+        metrics.EVENT_LOOP_SLOW_CALLBACKS.inc()
+        print(f"Slow event loop callback ({callback.seconds * 1000:.1f} ms): {callback.callback}")
+
+    def stop(self) -> None:
+        if self._watcher is not None:
+            _remove_watcher(self._watcher)
+            self._watcher = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "lag_ms": round(self.lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stall_count,
+            "slow_callbacks": self.slow_callback_count,
+        }
@@ -1,83 +1,301 @@
+import asyncio
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Protocol, Union
 
 from app.core.exceptions import MemoryException, SessionNotFoundException
 from app.schemas import ChatMessage, ConversationMemory
+from app.services.memory_store import StoredSession, WriteBehindStore
+from app.utils.history_buffer import MessageRecord
+
+
+class MemoryListener(Protocol):
+    """Receives session changes, e.g. to keep derived caches in sync"""
+
+    def on_message_added(self, session_id: str, message: MessageRecord) -> None: ...
+
+    def on_session_removed(self, session_id: str) -> None: ...
 
 
 class MemoryService:
-    def __init__(self, max_conversations: int = 100):
-        self.conversations: Dict[str, ConversationMemory] = {}
+    """Conversation memory with LRU, idle-TTL and byte-budget eviction.
+
+    Sessions live in an OrderedDict kept in access order, so touching and
+    evicting are O(1). Without a durable store an evicted session is gone;
+    with one, only the cached copy is dropped and it reloads on next access.
+    When the store is shared with other processes (StateConversationStore),
+    sessions they change are dropped from the cache by the next load().
+
+    A cache miss reads the store, waiting for the session's queued writes
+    first. Async callers await load() beforehand, which does that on a
+    thread, so the synchronous accessors then find the session cached.
+    Invalidations are only applied in load(): one arriving between load()
+    and the accessors must not turn into a blocking read on the loop.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = 100,
+        store: Optional[WriteBehindStore] = None,
+        max_messages: int = 50,
+        idle_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.conversations: "OrderedDict[str, ConversationMemory]" = OrderedDict()
         self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        # Optional durable store; self.conversations then acts as a hot cache
+        self.store = store
+
+        self._last_access: Dict[str, float] = {}
+        self.total_bytes = 0
+        self.evictions = {"lru": 0, "idle": 0, "memory": 0}
+        self.invalidations = 0
+        self.listeners: List[MemoryListener] = []
+
+    def add_listener(self, listener: MemoryListener) -> None:
+        """Notify listener of added messages and cleared/removed sessions"""
+        self.listeners.append(listener)
+
+    def _touch(self, session_id: str) -> None:
+        self.conversations.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+
+    def _load_session(self, session_id: str) -> Optional[ConversationMemory]:
+        """Get a session from the cache, loading it from the store on a miss"""
+        memory = self.conversations.get(session_id)
+        if memory is not None:
+            self._touch(session_id)
+            return memory
+        if self.store is None:
+            return None
+
+        stored = self.store.load_session(session_id)
+        if stored is None:
+            return None
+        return self._cache_stored(stored)
+
+    async def load(self, session_id: str) -> None:
+        """Cache a stored session, reading the store off the event loop"""
+        if self.store is None:
+            return
+        self._drop_changed()
+        if session_id in self.conversations:
+            return
+        stored = await asyncio.to_thread(self.store.load_session, session_id)
+        # Another request may have cached or created it meanwhile
+        if stored is not None and session_id not in self.conversations:
+            self._cache_stored(stored)
+
+    def _cache_stored(self, stored: StoredSession) -> ConversationMemory:
+        memory = ConversationMemory(
+            session_id=stored.session_id,
+            messages=stored.messages,
+            context=stored.context,
+            created_at=stored.created_at,
+            updated_at=stored.updated_at,
+            max_size=self.max_messages,
+        )
+        self._cache_session(memory)
+        return memory
+
+    def _drop_changed(self) -> None:
+        """Drop cached sessions that other processes have changed"""
+        for session_id in self.store.changed_sessions():
+            if session_id in self.conversations:
+                self._remove(session_id)
+                self.invalidations += 1
+
+    def _cache_session(self, memory: ConversationMemory) -> None:
+        self.conversations[memory.session_id] = memory
+        self._touch(memory.session_id)
+        self.total_bytes += memory.size_bytes
+        self._enforce_limits(keep=memory.session_id)
+
+    def _persist_session(self, memory: ConversationMemory) -> None:
+        if self.store is not None:
+            self.store.save_session(
+                memory.session_id, memory.created_at, memory.updated_at, memory.context
+            )
 
     def create_session(self, session_id: Optional[str] = None) -> str:
         """Create a new conversation session"""
         if session_id is None:
             session_id = str(uuid.uuid4())
 
-        if session_id in self.conversations:
+        if self._load_session(session_id) is not None:
             return session_id
 
         now = datetime.now(timezone.utc)
-        self.conversations[session_id] = ConversationMemory(
-            session_id=session_id, messages=[], created_at=now, updated_at=now
+        memory = ConversationMemory(
+            session_id=session_id,
+            created_at=now,
+            updated_at=now,
+            max_size=self.max_messages,
         )
-
-        # Clean up old conversations if we exceed max
-        if len(self.conversations) > self.max_conversations:
-            self._cleanup_old_conversations()
+        self._cache_session(memory)
+        self._persist_session(memory)
 
         return session_id
 
     def get_session(self, session_id: str) -> ConversationMemory:
         """Get a conversation session"""
-        if session_id not in self.conversations:
+        memory = self._load_session(session_id)
+        if memory is None:
             raise SessionNotFoundException(session_id)
-        return self.conversations[session_id]
+        return memory
 
-    def add_message(self, session_id: str, message: ChatMessage) -> None:
+    def add_message(
+        self, session_id: str, message: Union[ChatMessage, MessageRecord]
+    ) -> None:
         """Add a message to the conversation"""
-        if session_id not in self.conversations:
+        if not isinstance(message, MessageRecord):
+            message = MessageRecord.from_message(message)
+
+        memory = self._load_session(session_id)
+        if memory is None:
             self.create_session(session_id)
+            memory = self.conversations[session_id]
 
         try:
-            self.conversations[session_id].add_message(message)
+            size_before = memory.size_bytes
+            memory.add_message(message)
+            self.total_bytes += memory.size_bytes - size_before
         except Exception as e:
             raise MemoryException(f"Failed to add message: {str(e)}")
 
+        for listener in self.listeners:
+            listener.on_message_added(session_id, message)
+
+        if self.store is not None:
+            self.store.append_message(session_id, message)
+            self._persist_session(memory)
+
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            self._enforce_limits(keep=session_id)
+
     def get_conversation_history(
         self, session_id: str, limit: Optional[int] = None
     ) -> List[ChatMessage]:
         """Get conversation history for a session"""
-        if session_id not in self.conversations:
+        memory = self._load_session(session_id)
+        if memory is None:
             return []
 
-        messages = self.conversations[session_id].messages
-        if limit:
-            return messages[-limit:]
-        return messages
+        return [record.to_message() for record in memory.get_recent_records(limit or None)]
+
+    def get_recent_records(
+        self, session_id: str, limit: Optional[int] = None
+    ) -> List[MessageRecord]:
+        """Get recent history as compact records, without building models"""
+        memory = self._load_session(session_id)
+        if memory is None:
+            return []
+        return memory.get_recent_records(limit)
+
+    def get_context(self, session_id: str) -> Dict[str, Any]:
+        """Get a session's context, or an empty dict for unknown sessions"""
+        memory = self._load_session(session_id)
+        if memory is None:
+            return {}
+        return memory.context
+
+    def update_context(self, session_id: str, **values: Any) -> None:
+        """Merge values into a session's context and persist it"""
+        memory = self._load_session(session_id)
+        if memory is None:
+            raise SessionNotFoundException(session_id)
+        memory.context.update(values)
+        self._persist_session(memory)
 
     def clear_session(self, session_id: str) -> None:
         """Clear a conversation session"""
-        if session_id in self.conversations:
-            self.conversations[session_id].clear()
+        memory = self._load_session(session_id)
+        if memory is not None:
+            self.total_bytes -= memory.size_bytes
+            memory.clear()
+            for listener in self.listeners:
+                listener.on_session_removed(session_id)
+            if self.store is not None:
+                self.store.clear_session(session_id)
+                self._persist_session(memory)
 
     def delete_session(self, session_id: str) -> None:
         """Delete a conversation session"""
         if session_id in self.conversations:
-            del self.conversations[session_id]
+            self._remove(session_id)
+        else:
+            for listener in self.listeners:
+                listener.on_session_removed(session_id)
+        if self.store is not None:
+            self.store.delete_session(session_id)
 
-    def _cleanup_old_conversations(self) -> None:
-        """Remove oldest conversations to stay within limits"""
-        if len(self.conversations) <= self.max_conversations:
-            return
+    def close(self) -> None:
+        """Flush pending writes to the durable store"""
+        if self.store is not None:
+            self.store.close()
 
-        # Sort by last updated time and keep the most recent ones
-        sorted_sessions = sorted(
-            self.conversations.items(), key=lambda x: x[1].updated_at, reverse=True
-        )
+    def _remove(self, session_id: str) -> None:
+        memory = self.conversations.pop(session_id)
+        self._last_access.pop(session_id, None)
+        self.total_bytes -= memory.size_bytes
+        for listener in self.listeners:
+            listener.on_session_removed(session_id)
+
+    def _evict_oldest(self, reason: str) -> None:
+        session_id = next(iter(self.conversations))
+        self._remove(session_id)
+        self.evictions[reason] += 1
+
+    def _enforce_limits(self, keep: Optional[str] = None) -> None:
+        """Evict least recently used sessions until within count and byte limits"""
+        while len(self.conversations) > self.max_conversations:
+            self._evict_oldest("lru")
+
+        if self.max_bytes is not None:
+            # Never evict the session being written to
+            while self.total_bytes > self.max_bytes and len(self.conversations) > 1:
+                if next(iter(self.conversations)) == keep:
+                    break
+                self._evict_oldest("memory")
+
+    def evict_idle_sessions(self) -> int:
+        """Evict sessions idle for longer than idle_ttl; returns the count"""
+        if self.idle_ttl is None:
+            return 0
+
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        # Access order means idle sessions are all at the front
+        while self.conversations:
+            session_id = next(iter(self.conversations))
+            if self._last_access.get(session_id, 0.0) > cutoff:
+                break
+            self._evict_oldest("idle")
+            evicted += 1
+        return evicted
+
+    async def run_idle_sweeper(self, interval: float) -> None:
+        """Periodically evict idle sessions until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.evict_idle_sessions()
+            except Exception as e:
+                print(f"Error evicting idle sessions: {e}")
 
-        # Keep only the most recent conversations
-        sessions_to_keep = dict(sorted_sessions[: self.max_conversations])
-        self.conversations = sessions_to_keep
+    def get_stats(self) -> Dict[str, int]:
+        """Get session cache and eviction statistics"""
+        return {
+            "sessions": len(self.conversations),
+            "max_sessions": self.max_conversations,
+            "estimated_bytes": self.total_bytes,
+            "evictions_lru": self.evictions["lru"],
+            "evictions_idle": self.evictions["idle"],
+            "evictions_memory": self.evictions["memory"],
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,458 @@
+import queue
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from sqlalchemy import (
+    JSON,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.schemas.chat import MessageRole
+from app.services.state_backend import Invalidations, StateBackend
+from app.utils.history_buffer import ROLE_CODES, MessageRecord
+
+metadata = MetaData()
+
+sessions_table = Table(
+    "sessions",
+    metadata,
+    Column("session_id", String(100), primary_key=True),
+    Column("created_at", String(40), nullable=False),
+    Column("updated_at", String(40), nullable=False),
+    Column("context", JSON, nullable=False, default=dict),
+)
+
+messages_table = Table(
+    "messages",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("session_id", String(100), nullable=False, index=True),
+    Column("message_id", String(100), nullable=False),
+    Column("role", String(20), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("timestamp", String(40), nullable=False),
+    Column("metadata", JSON, nullable=True),
+)
+
+# Sentinel used to ask the writer thread to stop
+_STOP = object()
+
+
+class StoredSession:
+    """Session state loaded from the store"""
+
+    def __init__(
+        self,
+        session_id: str,
+        created_at: datetime,
+        updated_at: datetime,
+        context: Dict[str, Any],
+        messages: List[MessageRecord],
+    ):
+        self.session_id = session_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.context = context
+        self.messages = messages
+
+
+class WriteBehindStore(ABC):
+    """Conversation storage with write-behind batching.
+
+    Writes are queued and committed by a background thread in batches of up
+    to batch_size operations (or whatever arrived within flush_interval), so
+    callers on the event loop never wait for I/O. Reads are synchronous and
+    only happen when a session is first touched after a restart or cache
+    eviction; pending writes for that session are flushed first. Subclasses
+    implement _write_batch and load_session.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 50,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        thread_name: str = "memory-store-writer",
+    ):
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._pending: Counter = Counter()
+        self._pending_lock = threading.Lock()
+        self._idle = threading.Condition(self._pending_lock)
+        self.batches_written = 0
+        self.operations_written = 0
+
+        self._writer = threading.Thread(target=self._run_writer, name=thread_name, daemon=True)
+        self._writer.start()
+
+    # Write side ---------------------------------------------------------
+
+    def _enqueue(self, session_id: str, operation: Tuple) -> None:
+        with self._pending_lock:
+            self._pending[session_id] += 1
+        self._queue.put(operation)
+
+    def save_session(
+        self,
+        session_id: str,
+        created_at: datetime,
+        updated_at: datetime,
+        context: Dict[str, Any],
+    ) -> None:
+        """Queue an insert-or-update of the session row"""
+        self._enqueue(
+            session_id,
+            ("session", session_id, created_at.isoformat(), updated_at.isoformat(), dict(context)),
+        )
+
+    def append_message(self, session_id: str, message: MessageRecord) -> None:
+        """Queue a message insert"""
+        self._enqueue(session_id, ("message", session_id, message))
+
+    def clear_session(self, session_id: str) -> None:
+        """Queue removal of a session's messages"""
+        self._enqueue(session_id, ("clear", session_id))
+
+    def delete_session(self, session_id: str) -> None:
+        """Queue removal of a session and its messages"""
+        self._enqueue(session_id, ("delete", session_id))
+
+    def _run_writer(self) -> None:
+        while True:
+            operation = self._queue.get()
+            if operation is _STOP:
+                return
+
+            batch = [operation]
+            stop = False
+            try:
+                while len(batch) < self.batch_size:
+                    operation = self._queue.get(timeout=self.flush_interval)
+                    if operation is _STOP:
+                        stop = True
+                        break
+                    batch.append(operation)
+            except queue.Empty:
+                pass
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Error writing memory batch: {e}")
+            finally:
+                with self._idle:
+                    for operation in batch:
+                        self._pending[operation[1]] -= 1
+                        if self._pending[operation[1]] <= 0:
+                            del self._pending[operation[1]]
+                    self._idle.notify_all()
+
+            if stop:
+                return
+
+    @abstractmethod
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        """Commit one batch of queued operations (on the writer thread)"""
+
+    def flush(self, session_id: Optional[str] = None, timeout: float = 5.0) -> bool:
+        """Wait until queued writes (for one session, or all) are committed"""
+        with self._idle:
+            if session_id is None:
+                return self._idle.wait_for(lambda: not self._pending, timeout)
+            return self._idle.wait_for(lambda: session_id not in self._pending, timeout)
+
+    def close(self) -> None:
+        """Flush outstanding writes and stop the writer thread"""
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+
+    # Read side ----------------------------------------------------------
+
+    @abstractmethod
+    def load_session(self, session_id: str) -> Optional[StoredSession]:
+        """Load a session and its most recent messages, if stored"""
+
+    def changed_sessions(self) -> Iterable[str]:
+        """Sessions changed by other processes since the last call"""
+        return ()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get write-behind queue statistics"""
+        return {
+            "queued_operations": self._queue.qsize(),
+            "batches_written": self.batches_written,
+            "operations_written": self.operations_written,
+        }
+
+
+class SQLiteConversationStore(WriteBehindStore):
+    """Durable conversation storage on SQLite with write-behind batching.
+
+    The database belongs to one process: other processes' writes are not
+    seen by a session already cached in memory.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_messages: int = 50,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+    ):
+        self.engine = create_engine(url, connect_args={"check_same_thread": False})
+        event.listen(self.engine, "connect", self._configure_connection)
+        metadata.create_all(self.engine)
+        super().__init__(max_messages, batch_size, flush_interval)
+
+    @staticmethod
+    def _configure_connection(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        session_rows: Dict[str, Dict[str, Any]] = {}
+        message_rows: List[Dict[str, Any]] = []
+        trimmed = set()
+
+        def write_pending(conn) -> None:
+            # Only the latest upsert per session matters within a batch
+            if session_rows:
+                statement = sqlite_insert(sessions_table)
+                conn.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["session_id"],
+                        set_={
+                            "updated_at": statement.excluded.updated_at,
+                            "context": statement.excluded.context,
+                        },
+                    ),
+                    list(session_rows.values()),
+                )
+                session_rows.clear()
+            if message_rows:
+                conn.execute(messages_table.insert(), message_rows)
+                message_rows.clear()
+
+        with self.engine.begin() as conn:
+            for operation in batch:
+                kind, session_id = operation[0], operation[1]
+
+                if kind == "session":
+                    _, _, created_at, updated_at, context = operation
+                    session_rows[session_id] = {
+                        "session_id": session_id,
+                        "created_at": created_at,
+                        "updated_at": updated_at,
+                        "context": context,
+                    }
+                elif kind == "message":
+                    message: MessageRecord = operation[2]
+                    message_rows.append(
+                        {
+                            "session_id": session_id,
+                            "message_id": message.id,
+                            "role": message.role.value,
+                            "content": message.content,
+                            "timestamp": message.timestamp.isoformat(),
+                            "metadata": message.metadata,
+                        }
+                    )
+                    trimmed.add(session_id)
+                else:
+                    # Preserve ordering around clears and deletes
+                    write_pending(conn)
+                    conn.execute(
+                        delete(messages_table).where(messages_table.c.session_id == session_id)
+                    )
+                    if kind == "delete":
+                        conn.execute(
+                            delete(sessions_table).where(
+                                sessions_table.c.session_id == session_id
+                            )
+                        )
+
+            write_pending(conn)
+
+            # Keep only the newest max_messages rows per touched session
+            if trimmed:
+                ranked = (
+                    select(
+                        messages_table.c.id,
+                        func.row_number()
+                        .over(
+                            partition_by=messages_table.c.session_id,
+                            order_by=messages_table.c.id.desc(),
+                        )
+                        .label("position"),
+                    )
+                    .where(messages_table.c.session_id.in_(trimmed))
+                    .subquery()
+                )
+                conn.execute(
+                    delete(messages_table).where(
+                        messages_table.c.id.in_(
+                            select(ranked.c.id).where(ranked.c.position > self.max_messages)
+                        )
+                    )
+                )
+
+        self.batches_written += 1
+        self.operations_written += len(batch)
+
+    def close(self) -> None:
+        super().close()
+        self.engine.dispose()
+
+    def load_session(self, session_id: str) -> Optional[StoredSession]:
+        """Load a session and its most recent messages, if stored"""
+        self.flush(session_id)
+
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(sessions_table).where(sessions_table.c.session_id == session_id)
+            ).first()
+            if row is None:
+                return None
+
+            rows = conn.execute(
+                select(messages_table)
+                .where(messages_table.c.session_id == session_id)
+                .order_by(messages_table.c.id.desc())
+                .limit(self.max_messages)
+            ).all()
+
+        messages = [
+            MessageRecord(
+                message.message_id,
+                ROLE_CODES[MessageRole(message.role)],
+                message.content,
+                datetime.fromisoformat(message.timestamp).timestamp(),
+                message.metadata,
+            )
+            for message in reversed(rows)
+        ]
+
+        return StoredSession(
+            session_id=session_id,
+            created_at=datetime.fromisoformat(row.created_at),
+            updated_at=datetime.fromisoformat(row.updated_at),
+            context=row.context or {},
+            messages=messages,
+        )
+
+
+class StateConversationStore(WriteBehindStore):
+    """Conversation storage in a StateBackend shared by several processes.
+
+    A session is a document holding its timestamps and context plus a list
+    of messages capped at max_messages. Once a batch is written, the
+    sessions it touched are announced on the "sessions" channel so other
+    processes drop their cached copies; until then (at most flush_interval
+    plus delivery) they may serve a slightly stale session.
+    """
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        max_messages: int = 50,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+    ):
+        self.backend = backend
+        self.invalidations = Invalidations(backend, "sessions")
+        super().__init__(max_messages, batch_size, flush_interval, "state-store-writer")
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _messages_key(session_id: str) -> str:
+        return f"session:{session_id}:messages"
+
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        touched: Dict[str, None] = {}
+        with self.backend.batch() as state:
+            for operation in batch:
+                kind, session_id = operation[0], operation[1]
+
+                if kind == "session":
+                    _, _, created_at, updated_at, context = operation
+                    state.set(
+                        self._session_key(session_id),
+                        orjson.dumps(
+                            {"created_at": created_at, "updated_at": updated_at, "context": context}
+                        ),
+                    )
+                elif kind == "message":
+                    message: MessageRecord = operation[2]
+                    state.list_append(
+                        self._messages_key(session_id),
+                        orjson.dumps(
+                            [
+                                message.id,
+                                message.role_code,
+                                message.content,
+                                message.created,
+                                message.metadata,
+                            ]
+                        ),
+                        self.max_messages,
+                    )
+                elif kind == "clear":
+                    state.delete(self._messages_key(session_id))
+                else:
+                    state.delete(self._session_key(session_id), self._messages_key(session_id))
+
+                touched[session_id] = None
+
+            # Queued behind the writes, so readers reload the new state
+            for session_id in touched:
+                self.invalidations.publish(session_id, state)
+
+        self.batches_written += 1
+        self.operations_written += len(batch)
+
+    def load_session(self, session_id: str) -> Optional[StoredSession]:
+        self.flush(session_id)
+
+        document = self.backend.get(self._session_key(session_id))
+        if document is None:
+            return None
+        document = orjson.loads(document)
+        messages = [
+            MessageRecord(*orjson.loads(item))
+            for item in self.backend.list_tail(self._messages_key(session_id), self.max_messages)
+        ]
+
+        return StoredSession(
+            session_id=session_id,
+            created_at=datetime.fromisoformat(document["created_at"]),
+            updated_at=datetime.fromisoformat(document["updated_at"]),
+            context=document["context"] or {},
+            messages=messages,
+        )
+
+    def changed_sessions(self) -> Iterable[str]:
+        return self.invalidations.drain()
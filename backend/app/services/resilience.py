@@ -0,0 +1,249 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from app.core.exceptions import GeminiAPIException, UpstreamUnavailableException
+from app.services.llm_provider import LLMProvider
+from app.utils.history_buffer import HistoryMessage
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    Opens after failure_threshold consecutive failures. While open, calls are
+    rejected until reset_timeout has passed; then a single probe call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self) -> None:
+        """Raise UpstreamUnavailableException if the call must not go through"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise UpstreamUnavailableException()
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise UpstreamUnavailableException()
+            self.probe_in_flight = True
+
+    def abandon(self) -> None:
+        """Forget a call that ended without an outcome"""
+        self.probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class ResilientProvider:
+    """Wraps a provider with a TTFT deadline, retries, hedging and a breaker.
+
+    Only the part of a call before the first token is retried or hedged:
+    once text has been streamed to the client it cannot be taken back, so
+    later failures are raised as they are.
+
+    - The first chunk must arrive within ttft_timeout seconds.
+    - Failures before the first token are retried up to retries times with
+      jittered exponential backoff (tenacity).
+    - With hedging enabled, a second request is started when the first has
+      not produced a token by the hedge_percentile of recent TTFTs; the first
+      to answer wins and the other is cancelled.
+    - The circuit breaker rejects calls immediately while the upstream is
+      failing.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        ttft_timeout: float = 20.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        backoff_max: float = 2.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.provider = provider
+        self.ttft_timeout = ttft_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+
+        self.ttft_samples: Deque[float] = deque(maxlen=200)
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, if enabled"""
+        if self.hedge_percentile is None or len(self.ttft_samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.ttft_samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return ordered[index]
+
+    async def _open(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]],
+        session_id: Optional[str],
+    ) -> Tuple[AsyncGenerator[str, None], Optional[str]]:
+        """Start the upstream (and maybe a hedge) and wait for the first chunk"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.ttft_timeout
+        hedge_at = self._hedge_delay()
+        attempts: Dict[asyncio.Future, Tuple[AsyncGenerator[str, None], int]] = {}
+        error: Optional[BaseException] = None
+
+        def launch(index: int) -> None:
+            stream = self.provider.generate_streaming_response(
+                prompt, conversation_history, session_id
+            )
+            attempts[asyncio.ensure_future(stream.__anext__())] = (stream, index)
+
+        launch(0)
+        launched = 1
+        try:
+            while attempts:
+                wake = deadline
+                if hedge_at is not None and launched == 1:
+                    wake = min(wake, started + hedge_at)
+
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=max(0.0, wake - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if loop.time() >= deadline:
+                        self.timeouts += 1
+                        raise GeminiAPIException(
+                            f"No response from the model within {self.ttft_timeout:g}s"
+                        )
+                    launch(launched)
+                    launched += 1
+                    self.hedged += 1
+                    continue
+
+                for task in done:
+                    stream, index = attempts.pop(task)
+                    try:
+                        first: Optional[str] = task.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        error = e
+                        await stream.aclose()
+                        continue
+
+                    self.ttft_samples.append(loop.time() - started)
+                    if index:
+                        self.hedge_wins += 1
+                    return stream, first
+
+            assert error is not None
+            raise error
+
+        finally:
+            # Cancel the losing (or timed out) requests
+            pending: List[asyncio.Future] = list(attempts)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for stream, _ in attempts.values():
+                await stream.aclose()
+
+    async def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the provider with tail-latency and failure protection"""
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.retries + 1),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.backoff_max),
+            # An open circuit means stop trying, not try again
+            retry=retry_if_exception(
+                lambda e: not isinstance(e, UpstreamUnavailableException)
+            ),
+            reraise=True,
+        )
+
+        async for attempt in retrying:
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    self.retried += 1
+                self.breaker.before_call()
+                try:
+                    stream, first = await self._open(prompt, conversation_history, session_id)
+                except asyncio.CancelledError:
+                    # The client left; this says nothing about upstream health
+                    self.breaker.abandon()
+                    raise
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                self.breaker.record_success()
+
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in stream:
+                yield chunk
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            await stream.aclose()
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get retry, hedging, timeout and circuit breaker statistics"""
+        return {
+            "retries": self.retried,
+            "hedges": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "ttft_timeouts": self.timeouts,
+            "hedge_delay_ms": (
+                round(delay * 1000, 1) if (delay := self._hedge_delay()) is not None else None
+            ),
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "circuit_rejected": self.breaker.rejected,
+        }
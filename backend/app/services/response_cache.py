@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import xxhash
+
+from app.services.llm_provider import LLMProvider
+from app.utils.history_buffer import HistoryMessage
+
+
+class CachedResponse(NamedTuple):
+    chunks: Tuple[str, ...]
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """Exact-match cache of completed responses with LRU, TTL and byte budget.
+
+    Entries are kept in an OrderedDict in access order; expired entries are
+    dropped when looked up, and the least recently used ones when the entry
+    count or the byte budget is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 3600.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        fingerprint: str, prompt: str, history: Optional[Sequence[HistoryMessage]]
+    ) -> str:
+        """Hash the model fingerprint, normalized history and prompt"""
+        digest = xxhash.xxh3_128(fingerprint.encode())
+        for message in history or ():
+            digest.update(b"\x00")
+            digest.update(message.role.value.encode())
+            digest.update(b"\x01")
+            digest.update(message.content.strip().encode())
+        digest.update(b"\x02")
+        digest.update(prompt.strip().encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, ...]]:
+        """Return the cached chunks for key, counting the hit or miss"""
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.chunks
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        """Store a completed response"""
+        size = sum(len(chunk.encode()) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+
+        self.entries[key] = CachedResponse(
+            tuple(chunks), size, time.monotonic() + self.ttl
+        )
+        self.total_bytes += size
+        self.stores += 1
+
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self.entries.pop(key).size
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get cache occupancy and hit statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+class CachingProvider:
+    """Serves repeated requests from a ResponseCache instead of the provider.
+
+    A hit replays the stored chunks, optionally paced by chunk_delay, so the
+    rest of the pipeline (artifact scanning, coalescing, SSE) runs unchanged.
+    Only streams that complete are stored; failed or abandoned ones are not.
+    fingerprint identifies everything else that shapes the output (model,
+    generation settings, system prompt).
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        cache: ResponseCache,
+        fingerprint: str,
+        chunk_delay: float = 0.0,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.chunk_delay = chunk_delay
+
+    async def generate_streaming_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[Sequence[HistoryMessage]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream a cached response, or stream from the provider and cache it"""
+        key = self.cache.make_key(self.fingerprint, prompt, conversation_history)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            for index, chunk in enumerate(cached):
+                if index and self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                yield chunk
+            return
+
+        chunks: List[str] = []
+        async for chunk in self.provider.generate_streaming_response(
+            prompt, conversation_history, session_id
+        ):
+            chunks.append(chunk)
+            yield chunk
+
+        if chunks:
+            self.cache.put(key, chunks)
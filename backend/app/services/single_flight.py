@@ -0,0 +1,141 @@
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+from app.core.exceptions import GeminiAPIException
+from app.services.response_cache import ResponseCache
+from app.utils.history_buffer import HistoryMessage
+
+# Marks the end of a flight on a subscriber queue
+_FLIGHT_END = object()
+
+
+class _Subscriber:
+    __slots__ = ("queue", "sent", "lagging")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Chunks delivered to the queue so far
+        self.sent = 0
+        # Set when the queue overflowed (or on joining late); the subscriber
+        # then catches up from the flight's chunk list
+        self.lagging = False
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.subscribers: List[_Subscriber] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamSingleFlight:
+    """Runs one upstream generation per key and fans it out to every caller.
+
+    Each subscriber gets a bounded queue. A subscriber whose queue is full is
+    not waited for; it is marked lagging and catches up from the flight's
+    list of produced chunks, which is also how late joiners receive what
+    they missed. The upstream runs in its own task, so a subscriber leaving
+    does not cancel it; it is cancelled only when no subscribers are left.
+    """
+
+    def __init__(self, fingerprint: str, queue_size: int = 64):
+        self.fingerprint = fingerprint
+        self.queue_size = queue_size
+        self.flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def key(self, prompt: str, history: Optional[Sequence[HistoryMessage]]) -> str:
+        """Key identical requests the same way as the response cache"""
+        return ResponseCache.make_key(self.fingerprint, prompt, history)
+
+    async def _run(
+        self, key: str, flight: _Flight, upstream: AsyncGenerator[str, None]
+    ) -> None:
+        try:
+            async for chunk in upstream:
+                flight.chunks.append(chunk)
+                for subscriber in flight.subscribers:
+                    self._offer(subscriber, chunk)
+        except asyncio.CancelledError:
+            flight.error = GeminiAPIException("Generation was cancelled")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            for subscriber in flight.subscribers:
+                self._offer(subscriber, _FLIGHT_END)
+            await upstream.aclose()
+
+    @staticmethod
+    def _offer(subscriber: _Subscriber, item: object) -> None:
+        if subscriber.lagging:
+            return
+        try:
+            subscriber.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            subscriber.lagging = True
+            return
+        if item is not _FLIGHT_END:
+            subscriber.sent += 1
+
+    async def stream(
+        self, key: str, start: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """Stream the flight for key, starting it with start() if none is running"""
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, start()))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        subscriber = _Subscriber(self.queue_size)
+        # Start by catching up on whatever was produced before joining
+        subscriber.lagging = True
+        flight.subscribers.append(subscriber)
+
+        try:
+            while True:
+                if subscriber.lagging and subscriber.queue.empty():
+                    missed = flight.chunks[subscriber.sent :]
+                    subscriber.sent += len(missed)
+                    subscriber.lagging = False
+                    # A snapshot taken after the flight ended is complete;
+                    # otherwise newer chunks arrive on the queue meanwhile
+                    finished = flight.done
+                    for chunk in missed:
+                        yield chunk
+                    if finished:
+                        break
+                    continue
+
+                item = await subscriber.queue.get()
+                if item is _FLIGHT_END:
+                    break
+                yield item
+
+            if flight.error is not None:
+                raise flight.error
+
+        finally:
+            flight.subscribers.remove(subscriber)
+            if not flight.subscribers and not flight.done and flight.task is not None:
+                # Detach first so a request arriving now starts a fresh flight
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+                flight.task.cancel()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get single-flight statistics"""
+        return {
+            "in_flight": len(self.flights),
+            "flights_started": self.started,
+            "subscribers_joined": self.joined,
+        }
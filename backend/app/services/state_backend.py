@@ -0,0 +1,339 @@
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
+
+
+class StateBackend(Protocol):
+    """Shared key-value state for services that run in several processes.
+
+    Values are bytes. Besides plain keys there are capped lists, integer
+    indexes (members ordered by score, like a Redis sorted set), counter
+    hashes and pub/sub channels. InProcessStateBackend keeps everything in
+    this process; RedisStateBackend shares it between workers and hosts.
+
+    batch() groups writes into one round trip where the backend supports it.
+    Calls on the batch only write: their return values are not meaningful
+    until the block exits.
+    """
+
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    def set(self, key: str, value: bytes) -> None: ...
+
+    def delete(self, *keys: str) -> None: ...
+
+    def incr(self, key: str, amount: int = 1) -> int: ...
+
+    def list_append(self, key: str, value: bytes, max_len: Optional[int] = None) -> None:
+        """Append to a list, keeping only its last max_len items"""
+        ...
+
+    def list_tail(self, key: str, count: Optional[int] = None) -> List[bytes]:
+        """The last count items of a list (all without count), oldest first"""
+        ...
+
+    def index_add(self, key: str, score: int, member: str) -> None: ...
+
+    def index_remove(self, key: str, member: str) -> None: ...
+
+    def index_range(
+        self, key: str, after: int = 0, limit: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        """(score, member) pairs with score > after, lowest score first"""
+        ...
+
+    def index_count(self, key: str) -> int: ...
+
+    def counter_add(self, key: str, field: str, amount: int = 1) -> None: ...
+
+    def counters(self, key: str) -> Dict[str, int]:
+        """Fields of a counter hash with a positive count"""
+        ...
+
+    def publish(self, channel: str, message: str) -> None: ...
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        """Call callback with each message published on channel.
+
+        The callback may run on another thread.
+        """
+        ...
+
+    def batch(self) -> ContextManager["StateBackend"]: ...
+
+    def close(self) -> None: ...
+
+    def get_stats(self) -> Dict[str, int]: ...
+
+
+class InProcessStateBackend:
+    """StateBackend kept in this process's memory.
+
+    Shares state between service instances in one process, which makes the
+    shared-state code paths usable in a single worker and in tests. Messages
+    are delivered to subscribers synchronously on publish.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, bytes] = {}
+        self.lists: Dict[str, List[bytes]] = {}
+        # key -> (sorted (score, member) pairs, member -> score)
+        self.indexes: Dict[str, Tuple[List[Tuple[int, str]], Dict[str, int]]] = {}
+        self.counter_hashes: Dict[str, Counter] = {}
+        self.subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self.published = 0
+        # Artifact exports read bodies from a thread pool
+        self._lock = threading.RLock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.values.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.values[key] = value
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self.values.pop(key, None)
+                self.lists.pop(key, None)
+                self.indexes.pop(key, None)
+                self.counter_hashes.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self.values.get(key, b"0")) + amount
+            self.values[key] = str(value).encode()
+            return value
+
+    def list_append(self, key: str, value: bytes, max_len: Optional[int] = None) -> None:
+        with self._lock:
+            items = self.lists.setdefault(key, [])
+            items.append(value)
+            if max_len is not None and len(items) > max_len:
+                del items[:-max_len]
+
+    def list_tail(self, key: str, count: Optional[int] = None) -> List[bytes]:
+        with self._lock:
+            items = self.lists.get(key, [])
+            return items[-count:] if count else list(items)
+
+    def index_add(self, key: str, score: int, member: str) -> None:
+        with self._lock:
+            entries, scores = self.indexes.setdefault(key, ([], {}))
+            if member in scores:
+                self._index_discard(entries, scores, member)
+            insort(entries, (score, member))
+            scores[member] = score
+
+    @staticmethod
+    def _index_discard(
+        entries: List[Tuple[int, str]], scores: Dict[str, int], member: str
+    ) -> None:
+        entry = (scores.pop(member), member)
+        del entries[bisect_left(entries, entry)]
+
+    def index_remove(self, key: str, member: str) -> None:
+        with self._lock:
+            index = self.indexes.get(key)
+            if index is None or member not in index[1]:
+                return
+            self._index_discard(*index, member)
+            if not index[1]:
+                del self.indexes[key]
+
+    def index_range(
+        self, key: str, after: int = 0, limit: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        with self._lock:
+            index = self.indexes.get(key)
+            if index is None:
+                return []
+            entries = index[0]
+            # "\uffff" sorts after any member with the same score
+            start = bisect_right(entries, (after, "\uffff"))
+            end = len(entries) if limit is None else start + limit
+            return entries[start:end]
+
+    def index_count(self, key: str) -> int:
+        index = self.indexes.get(key)
+        return len(index[0]) if index is not None else 0
+
+    def counter_add(self, key: str, field: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counter_hashes.setdefault(key, Counter())[field] += amount
+
+    def counters(self, key: str) -> Dict[str, int]:
+        with self._lock:
+            counts = self.counter_hashes.get(key, {})
+            return {field: count for field, count in counts.items() if count > 0}
+
+    def publish(self, channel: str, message: str) -> None:
+        self.published += 1
+        for callback in list(self.subscribers.get(channel, ())):
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        self.subscribers.setdefault(channel, []).append(callback)
+
+    @contextmanager
+    def batch(self) -> Iterator["InProcessStateBackend"]:
+        with self._lock:
+            yield self
+
+    def close(self) -> None:
+        self.subscribers.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self.values) + len(self.lists) + len(self.indexes),
+            "subscriptions": sum(len(callbacks) for callbacks in self.subscribers.values()),
+            "published": self.published,
+        }
+
+
+class RedisStateBackend:
+    """StateBackend on Redis, shared by every worker and host using it.
+
+    Keys are namespaced with prefix. Pass client to use an existing
+    redis.Redis-compatible client (e.g. fakeredis.FakeRedis in tests);
+    otherwise one is created from url. Each subscription listens on its own
+    pub/sub connection and thread.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "chatai:",
+        client: Optional[Any] = None,
+    ):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._threads: List[Any] = []
+        self.published = 0
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self._key(key), value)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self._key(key) for key in keys))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.client.incrby(self._key(key), amount)
+
+    def list_append(self, key: str, value: bytes, max_len: Optional[int] = None) -> None:
+        self.client.rpush(self._key(key), value)
+        if max_len is not None:
+            self.client.ltrim(self._key(key), -max_len, -1)
+
+    def list_tail(self, key: str, count: Optional[int] = None) -> List[bytes]:
+        return self.client.lrange(self._key(key), -count if count else 0, -1)
+
+    def index_add(self, key: str, score: int, member: str) -> None:
+        self.client.zadd(self._key(key), {member: score})
+
+    def index_remove(self, key: str, member: str) -> None:
+        self.client.zrem(self._key(key), member)
+
+    def index_range(
+        self, key: str, after: int = 0, limit: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        page = {} if limit is None else {"start": 0, "num": limit}
+        entries = self.client.zrangebyscore(
+            self._key(key), f"({after}", "+inf", withscores=True, **page
+        )
+        return [(int(score), member.decode()) for member, score in entries]
+
+    def index_count(self, key: str) -> int:
+        return self.client.zcard(self._key(key))
+
+    def counter_add(self, key: str, field: str, amount: int = 1) -> None:
+        self.client.hincrby(self._key(key), field, amount)
+
+    def counters(self, key: str) -> Dict[str, int]:
+        counts = self.client.hgetall(self._key(key))
+        return {
+            field.decode(): int(count) for field, count in counts.items() if int(count) > 0
+        }
+
+    def publish(self, channel: str, message: str) -> None:
+        self.published += 1
+        self.client.publish(self._key(channel), message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._key(channel): lambda message: callback(message["data"].decode())})
+        self._threads.append(pubsub.run_in_thread(sleep_time=1.0, daemon=True))
+
+    @contextmanager
+    def batch(self) -> Iterator["RedisStateBackend"]:
+        pipeline = self.client.pipeline(transaction=False)
+        batch = RedisStateBackend(prefix=self.prefix, client=pipeline)
+        yield batch
+        pipeline.execute()
+        self.published += batch.published
+
+    def close(self) -> None:
+        for thread in self._threads:
+            thread.stop()
+        self._threads.clear()
+        self.client.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"subscriptions": len(self._threads), "published": self.published}
+
+
+class Invalidations:
+    """Invalidation messages exchanged by instances of a service over a channel.
+
+    Each instance publishes the keys it changes and collects the keys other
+    instances changed, to be dropped from its local cache when it next
+    drains them. Messages from the instance itself are ignored.
+    """
+
+    def __init__(self, backend: StateBackend, channel: str):
+        self.backend = backend
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        # Appended to from the subscriber thread, drained on the event loop
+        self.received: deque = deque()
+        self.count = 0
+        backend.subscribe(channel, self._receive)
+
+    def _receive(self, message: str) -> None:
+        origin, _, key = message.partition(" ")
+        if origin != self.origin:
+            self.received.append(key)
+
+    def publish(self, key: str, backend: Optional[StateBackend] = None) -> None:
+        """Tell other instances that key changed (optionally within a batch)"""
+        (backend or self.backend).publish(self.channel, f"{self.origin} {key}")
+
+    def drain(self) -> Iterator[str]:
+        """Keys changed elsewhere since the last drain"""
+        while self.received:
+            self.count += 1
+            yield self.received.popleft()
@@ -0,0 +1,84 @@
+import calendar
+import gzip
+import io
+import tarfile
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+# (member name, body, modification time)
+ArchiveEntry = Tuple[str, bytes, datetime]
+
+ARCHIVE_FORMATS = {
+    "zip": "application/zip",
+    "tar.gz": "application/gzip",
+}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable buffer drained after every entry.
+
+    Being unseekable makes zipfile write data descriptors instead of going
+    back to patch local headers, so the archive can be streamed as it is
+    produced.
+    """
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    """Stream a deflated zip archive, one entry at a time"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data, modified in entries:
+            info = zipfile.ZipInfo(name, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Central directory
+    yield sink.drain()
+
+
+def iter_tar_gz(entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    """Stream a gzip-compressed tar archive, one entry at a time"""
+    sink = _Sink()
+    # tarfile's own "w|gz" always uses level 9; level 6 is several times
+    # faster for a few percent in size
+    with gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6, mtime=0) as compressed:
+        with tarfile.open(fileobj=compressed, mode="w|") as archive:
+            for name, data, modified in entries:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                # created_at is naive UTC
+                info.mtime = calendar.timegm(modified.timetuple())
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+    yield sink.drain()
+
+
+def iter_archive(archive_format: str, entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    """Stream entries as an archive in one of ARCHIVE_FORMATS"""
+    if archive_format == "zip":
+        return iter_zip(entries)
+    if archive_format == "tar.gz":
+        return iter_tar_gz(entries)
+    raise ValueError(f"Unsupported archive format: {archive_format}")
@@ -0,0 +1,263 @@
+import re
+from typing import AbstractSet, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from app.schemas import ArtifactType
+
+
+class ContentRule(NamedTuple):
+    """Pick a result when any marker occurs in the content (and test passes)"""
+
+    result: str
+    markers: Tuple[str, ...] = ()
+    # Match markers against the lowercased content (they are lowercase too)
+    lowercase: bool = False
+    # Additionally require one of these (lowercased content)
+    also: Tuple[str, ...] = ()
+    # Called with the (lowercased, if lowercase) content
+    test: Optional[Callable[[str], bool]] = None
+
+
+def _looks_like_json(text: str) -> bool:
+    """An object: braces as first and last characters, with a quote inside"""
+    return text[:1] == "{" and text[-1:] == "}" and '"' in text
+
+
+# Declared language -> artifact type
+LANGUAGE_TYPES: Dict[str, ArtifactType] = {
+    "html": ArtifactType.HTML,
+    "htm": ArtifactType.HTML,
+    "css": ArtifactType.CSS,
+    "javascript": ArtifactType.JAVASCRIPT,
+    "js": ArtifactType.JAVASCRIPT,
+    "python": ArtifactType.PYTHON,
+    "py": ArtifactType.PYTHON,
+    "jsx": ArtifactType.REACT,
+    "tsx": ArtifactType.REACT,
+    "markdown": ArtifactType.MARKDOWN,
+    "md": ArtifactType.MARKDOWN,
+    "json": ArtifactType.JSON,
+}
+
+# Type from content clues when the language does not decide it; first match wins
+TYPE_RULES: Tuple[ContentRule, ...] = (
+    ContentRule(ArtifactType.HTML.value, ("<html", "<!doctype html"), lowercase=True),
+    ContentRule(ArtifactType.REACT.value, ("import React", "from React")),
+    ContentRule(ArtifactType.PYTHON.value, ("def ", "import ")),
+    ContentRule(ArtifactType.JAVASCRIPT.value, ("function ", "const ", "let ")),
+)
+
+_JS_MARKERS = ("function ", "const ", "let ", "var ", "=>", "import react")
+
+# Language guess for untagged ("text") blocks; first match wins
+LANGUAGE_RULES: Tuple[ContentRule, ...] = (
+    ContentRule("python", ("def ", "import ", "from ", "class ", "if __name__"), True),
+    ContentRule("jsx", _JS_MARKERS, True, also=("react", "jsx", "</")),
+    ContentRule("javascript", _JS_MARKERS, True),
+    ContentRule("html", ("<html", "<!doctype", "<div", "<p>", "<body"), True),
+    ContentRule("css", lowercase=True, test=re.compile(r"[.#]\w+\s*\{[^}]*\}").search),
+    ContentRule("json", lowercase=True, test=_looks_like_json),
+    ContentRule("bash", ("#!/bin/", "echo ", "cd ", "ls ", "grep "), True),
+)
+
+DESCRIPTIONS: Dict[ArtifactType, str] = {
+    ArtifactType.HTML: "HTML document",
+    ArtifactType.REACT: "React component",
+    ArtifactType.PYTHON: "Python code",
+    ArtifactType.JAVASCRIPT: "JavaScript code",
+}
+
+RUNNABLE_TYPES = frozenset(
+    (ArtifactType.HTML, ArtifactType.JAVASCRIPT, ArtifactType.REACT, ArtifactType.CSS)
+)
+# Any other type is runnable when the content has both
+RUNNABLE_MARKERS = ("<html", "</html>")
+
+
+def _alternation(words: List[str]) -> str:
+    """A regex matching any of words, factored into a trie.
+
+    Python's re tries alternatives one after another; branches that start
+    with distinct literal characters are rejected after one comparison, so
+    the trie costs about one check per position instead of one per word.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy: the longest marker at a position wins, and implies the rest
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _marker_scan(
+    *marker_sets: Tuple[str, ...]
+) -> Tuple["re.Pattern[str]", Dict[str, FrozenSet[str]]]:
+    """One regex finding the (lowercased) markers, and what each one implies.
+
+    A match hides the markers inside it (at the same or a later position),
+    so implied maps each marker to every marker it contains.
+    """
+    markers = sorted({m.lower() for group in marker_sets for m in group})
+    pattern = re.compile(_alternation(markers))
+    return pattern, {m: frozenset(other for other in markers if other in m) for m in markers}
+
+
+_MARKERS, _IMPLIED = _marker_scan(
+    *(rule.markers + rule.also for rule in TYPE_RULES + LANGUAGE_RULES), RUNNABLE_MARKERS
+)
+
+
+def _find_markers(lower: str) -> FrozenSet[str]:
+    """The markers occurring in lowercased content, in one scan"""
+    found: FrozenSet[str] = frozenset()
+    for marker in set(_MARKERS.findall(lower)):
+        found |= _IMPLIED[marker]
+    return found
+
+
+# Only the first lines are searched for a title
+TITLE_LINES = 5
+_COMMENT_PREFIXES = ("#", "//", "/*")
+_COMMENT_MARKS = re.compile(r"^[#/\*\s]+")
+_DEFINITION = re.compile(r"(function|def|class)\s+(\w+)")
+_COMPONENT = re.compile(r"const\s+(\w+)\s*=.*=>")
+
+
+class Classification(NamedTuple):
+    type: ArtifactType
+    language: str
+    title: str
+    description: str
+    is_runnable: bool
+    line_count: int
+    non_empty_lines: int
+    character_count: int
+
+
+class ArtifactClassifier:
+    """Classifies a code block in one pass over declarative rule tables.
+
+    The content is lowercased once. Untagged blocks are scanned once for
+    every marker of every rule (one regex), so rules become set lookups;
+    case-sensitive markers are confirmed against the original text only
+    when their lowercase form was found. Tagged blocks in other languages
+    only need the few TYPE_RULES markers, which substring checks that stop
+    at the first hit decide faster than a full scan. Titles come from the
+    first TITLE_LINES lines (patterns only run on lines holding their
+    keywords), and line metrics are counted from the same split.
+    """
+
+    @staticmethod
+    def _first_match(
+        rules: Tuple[ContentRule, ...],
+        content: str,
+        lower: str,
+        found: Optional[AbstractSet[str]] = None,
+    ) -> Optional[str]:
+        """First rule that matches; with found (the scanned markers), no substring search"""
+        for rule in rules:
+            if found is None:
+                text = lower if rule.lowercase else content
+                if rule.markers and not any(marker in text for marker in rule.markers):
+                    continue
+                if rule.also and not any(marker in lower for marker in rule.also):
+                    continue
+            else:
+                if rule.markers and (
+                    found.isdisjoint(rule.markers)
+                    if rule.lowercase
+                    else not any(m.lower() in found and m in content for m in rule.markers)
+                ):
+                    continue
+                if rule.also and found.isdisjoint(rule.also):
+                    continue
+            if rule.test is not None and not rule.test(lower if rule.lowercase else content):
+                continue
+            return rule.result
+        return None
+
+    def _guess_language(self, content: str, lower: str, found: FrozenSet[str]) -> str:
+        stripped, lower_stripped = content.strip(), lower.strip()
+        if len(lower_stripped) != len(lower):
+            # Markers ending in whitespace may only have occurred in what was stripped
+            found = frozenset(
+                marker
+                for marker in found
+                if marker == marker.strip() or marker in lower_stripped
+            )
+        return self._first_match(LANGUAGE_RULES, stripped, lower_stripped, found) or "text"
+
+    def guess_language(self, content: str) -> str:
+        """Guess the language of untagged code, or "text" """
+        lower = content.lower()
+        return self._guess_language(content, lower, _find_markers(lower))
+
+    @staticmethod
+    def _title(lines: List[str], language: str) -> str:
+        for line in lines[:TITLE_LINES]:
+            line = line.strip()
+            # Comments that read like titles
+            if line.startswith(_COMMENT_PREFIXES):
+                clean_line = _COMMENT_MARKS.sub("", line).strip()
+                if clean_line and len(clean_line) < 50:
+                    return clean_line
+
+            if "def" in line or "class" in line or "function" in line:
+                definition = _DEFINITION.search(line)
+                if definition:
+                    return f"{definition.group(2)} ({language})"
+
+            if "=>" in line:
+                component = _COMPONENT.search(line)
+                if component:
+                    return f"{component.group(1)} Component"
+
+        return f"{language.title()} Code"
+
+    def classify(self, content: str, language: str = "text") -> Classification:
+        """Type, language, title, description, runnable flag and line metrics"""
+        language = (language or "text").lower()
+        lower = content.lower()
+        found: Optional[FrozenSet[str]] = None
+
+        if language == "text":
+            found = _find_markers(lower)
+            language = self._guess_language(content, lower, found)
+
+        artifact_type = LANGUAGE_TYPES.get(language)
+        if artifact_type is None:
+            if "react" in language:
+                artifact_type = ArtifactType.REACT
+            else:
+                match = self._first_match(TYPE_RULES, content, lower, found)
+                artifact_type = ArtifactType(match) if match else ArtifactType.CODE
+
+        lines = content.split("\n")
+        line_count = len(lines)
+        non_empty_lines = line_count - list(map(str.strip, lines)).count("")
+        label = DESCRIPTIONS.get(artifact_type, "Code artifact")
+
+        return Classification(
+            type=artifact_type,
+            language=language,
+            title=self._title(lines, language),
+            description=f"{label} with {non_empty_lines} lines",
+            is_runnable=artifact_type in RUNNABLE_TYPES
+            or (
+                found.issuperset(RUNNABLE_MARKERS)
+                if found is not None
+                else all(marker in lower for marker in RUNNABLE_MARKERS)
+            ),
+            line_count=line_count,
+            non_empty_lines=non_empty_lines,
+            character_count=len(content),
+        )
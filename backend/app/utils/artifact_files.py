@@ -0,0 +1,77 @@
+import re
+from typing import Set, Tuple
+
+# File extension by artifact language
+EXTENSION_MAP = {
+    "python": "py",
+    "javascript": "js",
+    "html": "html",
+    "css": "css",
+    "jsx": "jsx",
+    "typescript": "ts",
+    "json": "json",
+    "markdown": "md",
+    "bash": "sh",
+    "sql": "sql",
+}
+
+# Content type by file extension
+CONTENT_TYPE_MAP = {
+    "py": "text/x-python",
+    "js": "application/javascript",
+    "html": "text/html",
+    "css": "text/css",
+    "jsx": "text/jsx",
+    "ts": "application/typescript",
+    "json": "application/json",
+    "md": "text/markdown",
+    "sh": "text/x-shellscript",
+    "sql": "application/sql",
+}
+
+_UNSAFE_CHARS = re.compile(r"[^\w.-]+")
+
+
+def artifact_extension(language: str) -> str:
+    """File extension for an artifact language"""
+    return EXTENSION_MAP.get(language.lower(), "txt")
+
+
+def artifact_filename(title: str, language: str) -> str:
+    """Download file name for an artifact"""
+    return f"{title.replace(' ', '_').lower()}.{artifact_extension(language)}"
+
+
+def content_type_for(filename: str) -> str:
+    """Content type for a file name produced by artifact_filename"""
+    return CONTENT_TYPE_MAP.get(filename.rsplit(".", 1)[-1], "text/plain")
+
+
+class UniqueNames:
+    """Hands out archive member names that are path-safe and unique.
+
+    Titles come from model output, so separators and other unsafe characters
+    are replaced; repeats get a numeric suffix (app.py, app_2.py, ...),
+    compared case-insensitively so archives extract cleanly everywhere.
+    """
+
+    def __init__(self):
+        self.taken: Set[str] = set()
+
+    @staticmethod
+    def _split(filename: str) -> Tuple[str, str]:
+        stem, dot, extension = filename.rpartition(".")
+        return (stem, f".{extension}") if dot else (filename, "")
+
+    def add(self, filename: str) -> str:
+        """Reserve and return a unique, safe name derived from filename"""
+        stem, extension = self._split(_UNSAFE_CHARS.sub("_", filename))
+        stem = stem.strip("._") or "artifact"
+
+        name = f"{stem}{extension}"
+        counter = 1
+        while name.lower() in self.taken:
+            counter += 1
+            name = f"{stem}_{counter}{extension}"
+        self.taken.add(name.lower())
+        return name
@@ -1,17 +1,16 @@
 import re
 from typing import List, Dict, Optional
 
+from app.utils.artifact_classifier import ArtifactClassifier
+from app.utils.fence_scanner import FenceScanner
+
 
 class CodeParser:
     """Utility class for parsing code blocks from text"""
     
     def __init__(self):
-        # Regex patterns for different code block formats
-        self.fenced_code_pattern = re.compile(
-            r'```(\w+)?\n(.*?)```', 
-            re.DOTALL | re.MULTILINE
-        )
-        
+        # Regex patterns for different code block formats (fenced blocks are
+        # found by FenceScanner)
         self.inline_code_pattern = re.compile(
             r'`([^`]+)`'
         )
@@ -27,29 +26,36 @@ class CodeParser:
             'yml': 'yaml',
             'htm': 'html'
         }
+
+        self.classifier = ArtifactClassifier()
     
     def extract_code_blocks(self, text: str) -> List[Dict[str, str]]:
         """Extract all code blocks from text"""
         code_blocks = []
-        
-        # Find fenced code blocks (```language ... ```)
-        for match in self.fenced_code_pattern.finditer(text):
-            language = match.group(1) or 'text'
-            code = match.group(2).strip()
-            
-            # Normalize language
-            language = self.normalize_language(language)
-            
+
+        # Find fenced code blocks (```language ... ``` or ~~~language ... ~~~)
+        scanner = self.create_fence_scanner()
+        events = scanner.feed(text) + scanner.finish()
+
+        for event in events:
+            if event.kind != 'completed':
+                continue
+
+            code = event.text.strip()
             if code:  # Only add non-empty code blocks
                 code_blocks.append({
-                    'language': language,
+                    'language': event.language,
                     'code': code,
                     'type': 'fenced',
-                    'start_pos': match.start(),
-                    'end_pos': match.end()
+                    'start_pos': event.start_pos,
+                    'end_pos': event.end_pos
                 })
-        
+
         return code_blocks
+
+    def create_fence_scanner(self) -> FenceScanner:
+        """Create an incremental fence scanner using this parser's aliases"""
+        return FenceScanner(normalize_language=self.normalize_language)
     
     def extract_inline_code(self, text: str) -> List[Dict[str, str]]:
         """Extract inline code snippets"""
@@ -74,35 +80,7 @@ class CodeParser:
     
     def detect_language_from_content(self, code: str) -> str:
         """Attempt to detect programming language from code content"""
-        code = code.strip().lower()
-        
-        # Python indicators
-        if any(keyword in code for keyword in ['def ', 'import ', 'from ', 'class ', 'if __name__']):
-            return 'python'
-        
-        # JavaScript/React indicators
-        if any(keyword in code for keyword in ['function ', 'const ', 'let ', 'var ', '=>', 'import react']):
-            if 'react' in code or 'jsx' in code or '</' in code:
-                return 'jsx'
-            return 'javascript'
-        
-        # HTML indicators
-        if any(keyword in code for keyword in ['<html', '<!doctype', '<div', '<p>', '<body']):
-            return 'html'
-        
-        # CSS indicators
-        if re.search(r'[.#]\w+\s*{.*}', code, re.DOTALL):
-            return 'css'
-        
-        # JSON indicators
-        if code.startswith('{') and code.endswith('}') and '"' in code:
-            return 'json'
-        
-        # Shell/Bash indicators
-        if any(keyword in code for keyword in ['#!/bin/', 'echo ', 'cd ', 'ls ', 'grep ']):
-            return 'bash'
-        
-        return 'text'
+        return self.classifier.guess_language(code)
     
     def is_complete_code(self, code: str, language: str) -> bool:
         """Check if code appears to be complete/runnable"""
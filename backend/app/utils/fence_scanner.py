@@ -0,0 +1,199 @@
+from typing import Callable, List, NamedTuple, Optional
+
+# Line probe phases: leading indentation, fence run, text after the run, and
+# "decided" once the line can no longer be a fence
+_INDENT, _RUN, _AFTER, _DECIDED = range(4)
+
+
+class FenceEvent(NamedTuple):
+    kind: str  # "started", "delta" or "completed"
+    index: int
+    language: str
+    text: str = ""
+    start_pos: int = 0
+    end_pos: int = 0
+
+
+class FenceScanner:
+    """Incremental scanner for fenced code blocks in streamed markdown.
+
+    Feed text in arbitrary chunks; each call returns the events it caused.
+    Fences follow CommonMark: up to three spaces of indentation, a run of at
+    least three backticks or tildes, and an info string whose first word is
+    the language. A block closes on a line holding only a run of the same
+    character at least as long as the opener, or at finish().
+
+    Every character is examined at most once, so the cost is linear in the
+    input even for unterminated fences or very long backtick runs.
+    """
+
+    def __init__(self, normalize_language: Optional[Callable[[str], str]] = None):
+        self.normalize_language = normalize_language or (lambda lang: lang.lower())
+
+        self._inside = False
+        self._fence_char = ""
+        self._fence_len = 0
+        self._index = -1
+        self._language = ""
+        self._block_start = 0
+
+        self._code: List[str] = []
+        self._delta: List[str] = []
+        self._events: List[FenceEvent] = []
+
+        self._offset = 0
+        self._line_start = 0
+        self._reset_line()
+
+    def _reset_line(self) -> None:
+        self._phase = _INDENT
+        self._indent = 0
+        self._run_char = ""
+        self._run_len = 0
+        self._held: List[str] = []
+
+    def feed(self, text: str) -> List[FenceEvent]:
+        """Consume the next chunk of text and return the resulting events"""
+        start = 0
+        while True:
+            newline = text.find("\n", start)
+            if newline == -1:
+                if start < len(text):
+                    self._feed_part(text[start:])
+                break
+            if newline > start:
+                self._feed_part(text[start:newline])
+            self._offset += newline - start + 1
+            self._end_line()
+            start = newline + 1
+
+        self._offset += len(text) - start
+        return self._drain()
+
+    def finish(self) -> List[FenceEvent]:
+        """Flush a trailing partial line and close any unterminated block"""
+        if self._held or self._phase != _INDENT or self._offset > self._line_start:
+            self._end_line()
+        if self._inside:
+            self._close_block()
+        return self._drain()
+
+    def _drain(self) -> List[FenceEvent]:
+        self._flush_delta()
+        events, self._events = self._events, []
+        return events
+
+    def _feed_part(self, part: str) -> None:
+        """Consume part of a line that contains no newline"""
+        if self._phase == _DECIDED:
+            if self._inside:
+                self._emit(part)
+            return
+
+        self._held.append(part)
+        if not self._advance(part):
+            held = "".join(self._held)
+            self._held = []
+            if self._inside:
+                self._emit(held)
+
+    def _advance(self, part: str) -> bool:
+        """Advance the fence probe over part; False once the line is not a fence"""
+        for position, char in enumerate(part):
+            if self._phase == _INDENT:
+                if char == " ":
+                    self._indent += 1
+                    if self._indent > 3:
+                        break
+                    continue
+                if char not in "`~" or (self._inside and char != self._fence_char):
+                    break
+                self._run_char = char
+                self._phase = _RUN
+
+            if self._phase == _RUN:
+                if char == self._run_char:
+                    self._run_len += 1
+                    continue
+                minimum = self._fence_len if self._inside else 3
+                if self._run_len < minimum:
+                    break
+                self._phase = _AFTER
+
+            # Text after the run: a closing fence allows only whitespace, an
+            # opening backtick fence allows anything but backticks
+            rest = part[position:]
+            if self._inside:
+                if rest.strip(" \t\r"):
+                    break
+            elif self._run_char == "`" and "`" in rest:
+                break
+            return True
+        else:
+            return True
+
+        self._phase = _DECIDED
+        return False
+
+    def _end_line(self) -> None:
+        line_is_fence = self._phase in (_RUN, _AFTER)
+
+        if self._inside:
+            if (
+                line_is_fence
+                and self._run_char == self._fence_char
+                and self._run_len >= self._fence_len
+            ):
+                self._close_block()
+            else:
+                self._emit("".join(self._held))
+                self._emit("\n")
+        elif line_is_fence and self._run_len >= 3:
+            info = "".join(self._held)[self._indent + self._run_len :].strip()
+            self._open_block(info)
+
+        self._reset_line()
+        self._line_start = self._offset
+
+    def _open_block(self, info: str) -> None:
+        language = info.split(None, 1)[0] if info else "text"
+        self._inside = True
+        self._fence_char = self._run_char
+        self._fence_len = self._run_len
+        self._index += 1
+        self._language = self.normalize_language(language)
+        self._block_start = self._line_start
+        self._code = []
+        self._events.append(
+            FenceEvent("started", self._index, self._language, start_pos=self._block_start)
+        )
+
+    def _close_block(self) -> None:
+        self._flush_delta()
+        code = "".join(self._code)
+        if code.endswith("\n"):
+            code = code[:-1]
+        self._events.append(
+            FenceEvent(
+                "completed",
+                self._index,
+                self._language,
+                code,
+                start_pos=self._block_start,
+                end_pos=self._offset,
+            )
+        )
+        self._inside = False
+        self._code = []
+
+    def _emit(self, text: str) -> None:
+        if text:
+            self._code.append(text)
+            self._delta.append(text)
+
+    def _flush_delta(self) -> None:
+        if self._delta:
+            self._events.append(
+                FenceEvent("delta", self._index, self._language, "".join(self._delta))
+            )
+            self._delta = []
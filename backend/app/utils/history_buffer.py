@@ -0,0 +1,131 @@
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app.schemas.chat import ChatMessage, MessageRole
+from app.utils.tokens import estimate_tokens
+
+# Roles are stored as small ints; the tuple index is the code
+ROLES = (MessageRole.USER, MessageRole.ASSISTANT, MessageRole.SYSTEM)
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+
+class MessageRecord:
+    """Compact stored form of a chat message.
+
+    Exposes id, role and content like ChatMessage so it can be passed to code
+    that only reads those, and converts to ChatMessage at API boundaries. The
+    estimated token count is computed once, when the record is written.
+    """
+
+    __slots__ = ("id", "role_code", "content", "created", "metadata", "tokens")
+
+    def __init__(
+        self,
+        id: str,
+        role_code: int,
+        content: str,
+        created: float,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.role_code = role_code
+        self.content = content
+        self.created = created
+        self.metadata = metadata
+        self.tokens = estimate_tokens(content)
+
+    @property
+    def role(self) -> MessageRole:
+        return ROLES[self.role_code]
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created, timezone.utc)
+
+    @classmethod
+    def create(
+        cls,
+        role: MessageRole,
+        content: str,
+        message_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> "MessageRecord":
+        """Create a record timestamped now"""
+        return cls(
+            message_id or str(uuid.uuid4()), ROLE_CODES[role], content, time.time(), metadata
+        )
+
+    @classmethod
+    def from_message(cls, message: ChatMessage) -> "MessageRecord":
+        return cls(
+            message.id,
+            ROLE_CODES[message.role],
+            message.content,
+            message.timestamp.timestamp(),
+            message.metadata,
+        )
+
+    def to_message(self) -> ChatMessage:
+        return ChatMessage(
+            id=self.id,
+            role=self.role,
+            content=self.content,
+            timestamp=self.timestamp,
+            metadata=self.metadata,
+        )
+
+
+# Anything history consumers accept: reads only id, role and content
+HistoryMessage = Union[ChatMessage, MessageRecord]
+
+
+class HistoryRing:
+    """Fixed-capacity ring buffer of message records.
+
+    The backing list grows up to capacity; after that, appending overwrites
+    the oldest record in O(1) instead of copying the list.
+    """
+
+    __slots__ = ("capacity", "_items", "_start")
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._items: List[MessageRecord] = []
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, record: MessageRecord) -> Optional[MessageRecord]:
+        """Append a record, returning the one it displaced (if any)"""
+        if len(self._items) < self.capacity:
+            self._items.append(record)
+            return None
+
+        dropped = self._items[self._start]
+        self._items[self._start] = record
+        self._start = (self._start + 1) % self.capacity
+        return dropped
+
+    def recent(self, count: Optional[int] = None) -> List[MessageRecord]:
+        """Get up to count of the newest records, oldest first"""
+        size = len(self._items)
+        if count is None or count > size:
+            count = size
+        if count <= 0:
+            return []
+
+        begin = (self._start + size - count) % size
+        end = begin + count
+        if end <= size:
+            return self._items[begin:end]
+        return self._items[begin:] + self._items[: end - size]
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self.recent())
+
+    def clear(self) -> None:
+        self._items = []
+        self._start = 0
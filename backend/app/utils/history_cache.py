@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.utils.history_buffer import HistoryMessage
+
+
+class PreparedHistoryCache:
+    """Session-keyed cache of messages already converted to a provider format.
+
+    Each session maps message ids to their converted form, so a request only
+    converts messages it has not seen before; as MemoryService records turns
+    the cache is extended one message at a time. Sessions are kept in LRU
+    order and dropped when MemoryService clears, deletes or evicts them.
+    convert may return None for messages the provider does not send.
+    """
+
+    def __init__(
+        self,
+        convert: Callable[[HistoryMessage], Any],
+        max_sessions: int = 1000,
+        max_messages: int = 64,
+    ):
+        self.convert = convert
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.sessions: "OrderedDict[str, OrderedDict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _session(self, session_id: str) -> "OrderedDict[str, Any]":
+        entries = self.sessions.get(session_id)
+        if entries is None:
+            entries = self.sessions[session_id] = OrderedDict()
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        return entries
+
+    def _store(self, entries: "OrderedDict[str, Any]", message: HistoryMessage) -> Any:
+        prepared = entries[message.id] = self.convert(message)
+        while len(entries) > self.max_messages:
+            entries.popitem(last=False)
+        return prepared
+
+    def prepare(self, session_id: str, messages: Sequence[HistoryMessage]) -> List[Any]:
+        """Convert messages for a request, reusing cached conversions"""
+        entries = self._session(session_id)
+        prepared = []
+        for message in messages:
+            item = entries.get(message.id)
+            if item is None and message.id not in entries:
+                self.misses += 1
+                item = self._store(entries, message)
+            else:
+                self.hits += 1
+            if item is not None:
+                prepared.append(item)
+        return prepared
+
+    # MemoryService listener interface
+
+    def on_message_added(self, session_id: str, message: HistoryMessage) -> None:
+        """Convert a newly recorded message for sessions already cached"""
+        entries = self.sessions.get(session_id)
+        if entries is not None:
+            self._store(entries, message)
+
+    def on_session_removed(self, session_id: str) -> None:
+        """Forget a cleared, deleted or evicted session"""
+        self.sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache occupancy and hit statistics"""
+        return {
+            "sessions": len(self.sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,111 @@
+import gzip
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import zstandard
+
+# Content codings we can produce, in order of preference
+ENCODINGS = ("zstd", "gzip")
+
+# (zstd, gzip) levels: cheap for responses encoded on request, denser for
+# variants written to disk once and served from there
+_RESPONSE_LEVELS = (zstandard.ZstdCompressor(level=3), 4)
+_STORED_LEVELS = (zstandard.ZstdCompressor(level=10), 6)
+
+
+def encode_body(data: bytes, encoding: str, stored: bool = False) -> bytes:
+    """Compress data with a content coding from ENCODINGS.
+
+    stored selects the denser levels used for variants kept on disk.
+    """
+    zstd, gzip_level = _STORED_LEVELS if stored else _RESPONSE_LEVELS
+    if encoding == "zstd":
+        # Copy to drop compress()'s worst-case over-allocation
+        return memoryview(zstd.compress(data)).tobytes()
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and so its ETag) stable
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred coding the client accepts, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == target
+        for candidate in if_none_match.split(",")
+    )
+
+
+class EncodedVariantCache:
+    """Byte-bounded LRU of encoded representations.
+
+    Keys must identify the exact bytes being encoded (e.g. a content hash
+    plus the coding), so entries never need invalidating and simply age out.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Hashable) -> Optional[bytes]:
+        """Get the cached bytes for key, or None (a miss)"""
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def store(self, key: Hashable, data: bytes) -> bytes:
+        """Cache data under key, unless it is larger than the whole cache"""
+        if len(data) <= self.max_bytes:
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get entry count, size and hit statistics"""
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
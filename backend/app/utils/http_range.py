@@ -0,0 +1,36 @@
+from typing import Optional, Tuple
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=" Range header into an inclusive (start, end).
+
+    Returns None when there is no header or it should be ignored (malformed,
+    another unit or several ranges), in which case the full body is sent.
+    Raises ValueError when the range cannot be satisfied (416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, dash, last = (part.strip() for part in spec.strip().partition("-"))
+    if not dash or not (first or last):
+        return None
+    if first and not first.isdigit() or last and not last.isdigit():
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end of the body")
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
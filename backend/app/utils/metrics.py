@@ -0,0 +1,256 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, Sequence, Tuple
+
+# Stats sources return flat or one-level nested dicts of numbers
+StatsSource = Callable[[], Mapping[str, object]]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str) -> "_Metric":
+        """The child metric for one combination of label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._child()
+        return child
+
+    @abstractmethod
+    def _child(self) -> "_Metric":
+        """A new, unlabelled metric of the same kind"""
+
+    @abstractmethod
+    def _samples(self, labelvalues: Tuple[str, ...]) -> Iterable[str]:
+        """Exposition lines for this metric with the given label values"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.labelnames:
+            for values, child in sorted(self._children.items()):
+                lines.extend(child._samples(values))
+        else:
+            lines.extend(self._samples(()))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _child(self) -> "Counter":
+        child = Counter(self.name, self.documentation)
+        child.labelnames = self.labelnames
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _samples(self, labelvalues: Tuple[str, ...]) -> Iterable[str]:
+        labels = _labels(self.labelnames, labelvalues)
+        yield f"{self.name}_total{labels} {_format_value(self.value)}"
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _child(self) -> "Gauge":
+        child = Gauge(self.name, self.documentation)
+        child.labelnames = self.labelnames
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def _samples(self, labelvalues: Tuple[str, ...]) -> Iterable[str]:
+        labels = _labels(self.labelnames, labelvalues)
+        yield f"{self.name}{labels} {_format_value(self.value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets.
+
+    observe() is a bisect and two additions. Callers with a stream of
+    values can instead look up bucket() once and count the values that stay
+    inside it themselves, adding them with observe_run(). Cumulative bucket
+    counts are only built when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = sorted(buckets)
+        # The last slot counts observations above every bound (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def _child(self) -> "Histogram":
+        child = Histogram(self.name, self.documentation, self.bounds)
+        child.labelnames = self.labelnames
+        return child
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def bucket(self, value: float) -> Tuple[int, float, float]:
+        """The bucket value falls in, as (index, lower, upper): lower < value <= upper"""
+        index = bisect_left(self.bounds, value)
+        lower = self.bounds[index - 1] if index else float("-inf")
+        upper = self.bounds[index] if index < len(self.bounds) else float("inf")
+        return index, lower, upper
+
+    def observe_run(self, index: int, count: int, total: float) -> None:
+        """Observe count values known to fall in bucket index and add up to total"""
+        self.counts[index] += count
+        self.sum += total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def _samples(self, labelvalues: Tuple[str, ...]) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}"
+        labels = _labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum{labels} {_format_value(self.sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Metrics plus get_stats() sources, rendered in the Prometheus text format.
+
+    Metrics are updated from the event loop without locking. Stats sources
+    are called at scrape time and every numeric field becomes a gauge named
+    {namespace}_{source}_{field} (nested dicts add their key to the name), so
+    the services need no instrumentation of their own for sizes and counts.
+    Fields listed as counters only ever grow and are exported like Counter,
+    as {name}_total, so that rate() works on them.
+    Each process has its own registry: with several workers, a scrape
+    reports the worker that served it.
+    """
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self.metrics: List[_Metric] = []
+        self.stats_sources: Dict[str, StatsSource] = {}
+        self.stats_counters: Dict[str, FrozenSet[str]] = {}
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self._name(name), documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(self._name(name), documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ) -> Histogram:
+        metric = Histogram(self._name(name), documentation, buckets, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def register_stats(
+        self, source: str, get_stats: StatsSource, counters: Iterable[str] = ()
+    ) -> None:
+        """Export a get_stats() method on every scrape.
+
+        counters names the cumulative fields (nested ones as parent_field);
+        the rest are gauges.
+        """
+        self.stats_sources[source] = get_stats
+        self.stats_counters[source] = frozenset(counters)
+
+    def _stats_lines(
+        self, source: str, stats: Mapping[str, object], counters: FrozenSet[str], prefix: str = ""
+    ) -> Iterable[str]:
+        for field, value in stats.items():
+            field = f"{prefix}{field}"
+            name = self._name(f"{source}_{field}")
+            if isinstance(value, Mapping):
+                yield from self._stats_lines(source, value, counters, f"{field}_")
+            elif isinstance(value, (int, float)):
+                if field in counters:
+                    yield f"# TYPE {name} counter"
+                    yield f"{name}_total {_format_value(value)}"
+                else:
+                    yield f"# TYPE {name} gauge"
+                    yield f"{name} {_format_value(value)}"
+
+    def render(self) -> str:
+        """All metrics and stats in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for source, get_stats in self.stats_sources.items():
+            try:
+                stats = get_stats()
+            except Exception as e:
+                print(f"Error collecting {source} stats: {e}")
+                continue
+            lines.extend(self._stats_lines(source, stats, self.stats_counters[source]))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,53 @@
+import cProfile
+import os
+import time
+import uuid
+from typing import Optional
+
+
+class RequestProfiler:
+    """cProfile for a single request, saved as a .prof file.
+
+    cProfile hooks the whole thread, so everything the event loop runs while
+    a request is profiled is included (profile on a quiet worker), and work
+    done on other threads (the Gemini stream iterators) is not. Only one
+    request per process is profiled at a time; start() returns False while
+    another profile is running.
+
+    Read the file with pstats or a viewer such as snakeviz:
+
+        python -m pstats profiles/<name>.prof
+    """
+
+    _running = False
+
+    def __init__(self, directory: str, label: str = "request"):
+        self.directory = directory
+        label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:40]
+        # Known up front so the response can name it before it is written
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.prof"
+        self.profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> bool:
+        if RequestProfiler._running:
+            return False
+        RequestProfiler._running = True
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return True
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and write the profile; returns its file name"""
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        RequestProfiler._running = False
+        profile, self.profile = self.profile, None
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, self.name))
+        except OSError as e:
+            print(f"Error writing profile {self.name}: {e}")
+            return None
+        return self.name
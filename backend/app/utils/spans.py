@@ -0,0 +1,49 @@
+import time
+from typing import Dict, Optional
+
+
+class SpanRecorder:
+    """Wall time spent in each phase of one request.
+
+    Phases are timed as laps: lap(name) charges the time since the previous
+    lap (or mark) to name and returns the clock reading, so consecutive
+    phases cost one clock read each and no moment is counted twice. Hot
+    loops can instead accumulate into locals and add() the totals once.
+    Repeated phases add up. The summary lists phases in the order they were
+    first recorded, followed by the total since the recorder was created.
+    """
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    def mark(self) -> float:
+        """Start the next lap without charging the time since the last one"""
+        self.last = time.perf_counter()
+        return self.last
+
+    def lap(self, name: str) -> float:
+        """Charge the time since the last lap to name"""
+        now = time.perf_counter()
+        self.add(name, now - self.last)
+        self.last = now
+        return now
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per phase, plus total"""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.durations.items()}
+        timings["total"] = round(self.total() * 1000, 2)
+        return timings
+
+    def server_timing(self, extra: Optional[Dict[str, float]] = None) -> str:
+        """Summary in Server-Timing header syntax, e.g. "history;dur=1.2, total;dur=9.8" """
+        timings = self.as_dict()
+        if extra:
+            timings.update(extra)
+        return ", ".join(f"{name};dur={ms:g}" for name, ms in timings.items())
@@ -0,0 +1,62 @@
+from typing import Any, Dict, Optional
+
+import orjson
+
+from app.schemas import StreamChunk
+
+DONE_FRAME = b"data: [DONE]\n\n"
+
+_FRAME_PREFIX = b'data: {"chunk":'
+_FRAME_END = b"\n\n"
+_EMPTY_CHUNK = b'{"chunk":""'
+
+
+class SSEEncoder:
+    """Encode stream chunks as SSE frames for chat_stream.
+
+    Plain text chunks take a fast path: the JSON envelope after the "chunk"
+    field is rendered once per message through StreamChunk itself and cached,
+    and only the orjson-escaped text is spliced in front of it. The bytes are
+    identical to StreamChunk(...).model_dump_json(exclude_none=True). Every
+    other chunk (artifact events, completion, errors) goes through the model.
+    """
+
+    def __init__(self):
+        self._message_id: Optional[str] = None
+        self._suffix = b""
+
+    def _text_suffix(self, message_id: str, session_id: str) -> bytes:
+        if message_id != self._message_id:
+            template = StreamChunk(
+                chunk="",
+                message_id=message_id,
+                session_id=session_id,
+                is_complete=False,
+                has_artifacts=False,
+                artifacts=[],
+            ).model_dump_json(exclude_none=True).encode()
+            self._suffix = template[len(_EMPTY_CHUNK) :] + _FRAME_END
+            self._message_id = message_id
+        return self._suffix
+
+    def encode(self, chunk_data: Dict[str, Any]) -> bytes:
+        """Encode one chunk dict as a complete "data: ..." frame"""
+        try:
+            if (
+                len(chunk_data) == 6
+                and type(chunk_data["chunk"]) is str
+                and chunk_data["is_complete"] is False
+                and chunk_data["has_artifacts"] is False
+                and not chunk_data["artifacts"]
+            ):
+                suffix = self._text_suffix(chunk_data["message_id"], chunk_data["session_id"])
+                return _FRAME_PREFIX + orjson.dumps(chunk_data["chunk"]) + suffix
+        except (KeyError, TypeError, orjson.JSONEncodeError):
+            pass
+
+        return self.encode_model(StreamChunk(**chunk_data))
+
+    @staticmethod
+    def encode_model(chunk: StreamChunk) -> bytes:
+        """Encode an already built StreamChunk"""
+        return b"data: " + chunk.model_dump_json(exclude_none=True).encode() + _FRAME_END
@@ -0,0 +1,147 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, List, Optional
+
+# Frames the producer may queue ahead of the consumer before it waits
+_MAX_READY_FRAMES = 8
+
+
+class _Pending:
+    """Buffered text for one mergeable frame: plain text, or one artifact's deltas"""
+
+    def __init__(self, template: Dict[str, Any], text: str, artifact_id: Optional[str]):
+        self.template = template
+        self.artifact_id = artifact_id
+        self.parts: List[str] = [text]
+
+    def build(self) -> Dict[str, Any]:
+        text = "".join(self.parts)
+        if self.artifact_id is not None:
+            artifact = dict(self.template["artifact"], delta=text)
+            return dict(self.template, artifact=artifact)
+        return dict(self.template, chunk=text)
+
+
+class StreamCoalescer:
+    """Merge consecutive small stream chunks into fewer, larger frames.
+
+    Plain text chunks and artifact deltas are buffered in arrival order and
+    flushed once max_bytes of UTF-8 text has accumulated or the oldest
+    buffered chunk is max_latency seconds old. Only adjacent chunks of the
+    same kind (text, or deltas of one artifact) are merged, so interleaved
+    text and deltas keep their order. Any other chunk (artifact
+    start/complete, the final chunk, errors) flushes the buffer and is
+    passed through unchanged. The first text chunk is also passed through
+    as is, so coalescing never delays the first token.
+
+    One producer task drains the upstream per stream; the latency window is a
+    loop timer rather than a task per chunk, which keeps the stage cheaper
+    than the frames it saves.
+    """
+
+    def __init__(self, stream: AsyncIterator[Dict[str, Any]], max_bytes: int, max_latency: float):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.loop = asyncio.get_running_loop()
+
+        self.pending: List[_Pending] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.first_text_sent = False
+
+        self.ready: Deque[Dict[str, Any]] = deque()
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.consumer_waiter: Optional[asyncio.Future] = None
+        self.producer_waiter: Optional[asyncio.Future] = None
+
+    def _wake(self, waiter: Optional[asyncio.Future]) -> None:
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.ready.extend(pending.build() for pending in self.pending)
+        self.pending.clear()
+        self.size = 0
+        self._wake(self.consumer_waiter)
+
+    def _add(self, chunk: Dict[str, Any]) -> None:
+        if not chunk.get("is_complete") and not chunk.get("event") and not chunk.get("error"):
+            if not self.first_text_sent:
+                self.first_text_sent = True
+                self._flush()
+                self.ready.append(chunk)
+                return
+            piece, artifact_id = chunk["chunk"], None
+        elif chunk.get("event") == "artifact_delta":
+            piece, artifact_id = chunk["artifact"]["delta"], chunk["artifact"]["id"]
+        else:
+            self._flush()
+            self.ready.append(chunk)
+            return
+
+        if self.pending and self.pending[-1].artifact_id == artifact_id:
+            self.pending[-1].parts.append(piece)
+        else:
+            self.pending.append(_Pending(chunk, piece, artifact_id))
+
+        self.size += len(piece.encode("utf-8"))
+        if self.size >= self.max_bytes:
+            self._flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(self.max_latency, self._flush)
+
+    async def _produce(self) -> None:
+        try:
+            async for chunk in self.stream:
+                self._add(chunk)
+                while len(self.ready) >= _MAX_READY_FRAMES:
+                    self.producer_waiter = self.loop.create_future()
+                    await self.producer_waiter
+            self._flush()
+        except Exception as e:
+            self._flush()
+            self.error = e
+        finally:
+            self.finished = True
+            self._wake(self.consumer_waiter)
+
+    async def __aiter__(self) -> AsyncGenerator[Dict[str, Any], None]:
+        producer = asyncio.ensure_future(self._produce())
+        try:
+            while True:
+                if self.ready:
+                    frame = self.ready.popleft()
+                    self._wake(self.producer_waiter)
+                    yield frame
+                elif self.finished:
+                    break
+                else:
+                    self.consumer_waiter = self.loop.create_future()
+                    await self.consumer_waiter
+
+            if self.error is not None:
+                raise self.error
+
+        finally:
+            if self.timer is not None:
+                self.timer.cancel()
+            if not producer.done():
+                producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+            if hasattr(self.stream, "aclose"):
+                await self.stream.aclose()
+
+
+def coalesce_stream(
+    stream: AsyncIterator[Dict[str, Any]], max_bytes: int, max_latency: float
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Wrap a chunk stream with a StreamCoalescer"""
+    return StreamCoalescer(stream, max_bytes, max_latency).__aiter__()
@@ -0,0 +1,10 @@
+# Gemini averages roughly four characters per token for English and code;
+# counting through the API would cost a network round trip per message
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in text"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
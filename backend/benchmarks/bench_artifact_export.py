@@ -0,0 +1,112 @@
+"""
+Export a 500-artifact session as zip and tar.gz.
+
+Fills ArtifactService with snippets cut from this repository's sources (a
+few titles repeat, exercising name de-duplication) and exports the session
+the way GET /artifacts/sessions/{id}/export does. For each format it
+reports time to first byte, total time, archive size and peak traced
+memory, next to building the same archive in a BytesIO first. The streamed
+archives are read back to check every artifact is present.
+
+    python -m benchmarks.bench_artifact_export --artifacts 500
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import tarfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.services.artifact_service import ArtifactService  # noqa: E402
+from app.utils.archive_stream import iter_archive  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+LANGUAGES = {".py": "python", ".ts": "typescript", ".tsx": "tsx"}
+
+
+def fill(service: ArtifactService, count: int, rng: random.Random) -> None:
+    files = [
+        path
+        for pattern in ("backend/app/**/*.py", "frontend/src/**/*.ts", "frontend/src/**/*.tsx")
+        for path in sorted(ROOT.glob(pattern))
+    ]
+    sources = [(path, path.read_text(encoding="utf-8").splitlines()) for path in files]
+    sources = [(path, lines) for path, lines in sources if len(lines) >= 20]
+
+    for index in range(count):
+        path, lines = rng.choice(sources)
+        length = rng.randint(20, min(200, len(lines)))
+        start = rng.randint(0, len(lines) - length)
+        code = f"# {path.stem}\n" + "\n".join(lines[start : start + length])
+        service.add_artifact_from_code_block(
+            {"language": LANGUAGES[path.suffix], "code": code}, "session", f"message-{index}"
+        )
+
+
+def run(label: str, produce) -> bytes:
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    parts = []
+    for chunk in produce():
+        if first is None:
+            first = time.perf_counter() - start
+        # Count the bytes but drop them, as a socket would
+        parts.append(len(chunk))
+        last = chunk
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:>18}: first byte {first * 1000:7.1f} ms  total {total * 1000:7.1f} ms"
+        f"  {sum(parts) / 1024:8.1f} KiB  peak {peak / 1024:8.1f} KiB"
+    )
+    return last
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--artifacts", type=int, default=500)
+    args = parser.parse_args()
+
+    service = ArtifactService()
+    fill(service, args.artifacts, random.Random(3))
+    raw = sum(
+        service.blob_store.size_of(service.content_keys[a]) for a in service.by_session["session"].ids
+    )
+    print(f"{args.artifacts} artifacts, {raw / 1024:.1f} KiB of code")
+
+    def entries():
+        return asyncio.run(service.export_session("session"))
+
+    for archive_format in ("zip", "tar.gz"):
+        def streamed():
+            return iter_archive(archive_format, entries())
+
+        def buffered():
+            buffer = io.BytesIO()
+            for chunk in iter_archive(archive_format, entries()):
+                buffer.write(chunk)
+            yield buffer.getvalue()
+
+        run(f"{archive_format} buffered", buffered)
+        run(f"{archive_format} streamed", streamed)
+
+        archive = b"".join(iter_archive(archive_format, entries()))
+        if archive_format == "zip":
+            names = zipfile.ZipFile(io.BytesIO(archive)).namelist()
+        else:
+            names = tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz").getnames()
+        assert len(names) == len(set(names)) == args.artifacts, len(set(names))
+        print(f"{'':>18}  {len(names)} unique entries, e.g. {sorted(names)[:3]}")
+
+
+if __name__ == "__main__":
+    main()
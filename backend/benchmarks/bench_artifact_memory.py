@@ -0,0 +1,134 @@
+"""
+Memory per 100k artifacts: full CodeArtifact models vs the blob store.
+
+Snippets are cut from the repository's own backend and frontend sources
+(20-120 lines each), and a share of artifacts repeat an earlier snippet, as
+models do when they re-emit code across turns. Compares:
+
+- the previous storage (a dict of CodeArtifact models with content)
+- ArtifactService with the content-addressed, zstd-compressed BlobStore
+- the same with a zstd dictionary trained on a sample of the snippets
+
+    python -m benchmarks.bench_artifact_memory --artifacts 100000 --duplicates 0.3
+"""
+
+import argparse
+import gc
+import os
+import random
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import ArtifactType, CodeArtifact  # noqa: E402
+from app.services.artifact_service import ArtifactService  # noqa: E402
+from app.services.blob_store import BlobStore  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def load_snippets(rng: random.Random, count: int) -> list:
+    files = [
+        path
+        for pattern in ("backend/app/**/*.py", "frontend/src/**/*.ts", "frontend/src/**/*.tsx")
+        for path in ROOT.glob(pattern)
+    ]
+    sources = [path.read_text(encoding="utf-8").splitlines() for path in sorted(files)]
+    sources = [lines for lines in sources if len(lines) >= 20]
+
+    snippets = []
+    while len(snippets) < count:
+        lines = rng.choice(sources)
+        length = rng.randint(20, min(120, len(lines)))
+        start = rng.randint(0, len(lines) - length)
+        # Vary an identifier so distinct snippets are not byte-identical
+        snippet = "\n".join(lines[start : start + length])
+        snippets.append(f"// snippet {len(snippets)}\n{snippet}")
+    return snippets
+
+
+def build_blocks(args, rng: random.Random) -> list:
+    unique = load_snippets(rng, int(args.artifacts * (1 - args.duplicates)) + 1)
+    blocks = []
+    for index in range(args.artifacts):
+        if blocks and rng.random() < args.duplicates:
+            blocks.append(rng.choice(blocks))
+        else:
+            blocks.append(unique[index % len(unique)])
+    return blocks
+
+
+def measure(label: str, build) -> None:
+    gc.collect()
+    tracemalloc.start()
+    keep = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>22}: {current / 2**20:8.1f} MiB")
+    return keep
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--artifacts", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    blocks = build_blocks(args, rng)
+    raw = sum(len(block.encode()) for block in blocks)
+    print(f"{args.artifacts} artifacts, {raw / 2**20:.1f} MiB of code, {args.duplicates:.0%} repeats")
+
+    def models():
+        store = {}
+        for index, code in enumerate(blocks):
+            artifact = CodeArtifact(
+                id=str(uuid.uuid4()),
+                title="Snippet",
+                description=f"Code artifact with {code.count(chr(10)) + 1} lines",
+                type=ArtifactType.CODE,
+                language="typescript",
+                # A fresh string per artifact, as parsed from each response
+                content=(code + " ")[:-1],
+                session_id=f"session-{index % args.sessions}",
+                message_id=str(uuid.uuid4()),
+                created_at=datetime.utcnow(),
+                is_runnable=False,
+                metadata={"lines_of_code": code.count("\n") + 1, "character_count": len(code)},
+            )
+            store[artifact.id] = artifact
+        return store
+
+    def service(blob_store: BlobStore):
+        def build():
+            artifacts = ArtifactService(blob_store=blob_store)
+            for index, code in enumerate(blocks):
+                artifacts.add_artifact_from_code_block(
+                    {"language": "typescript", "code": code},
+                    f"session-{index % args.sessions}",
+                    str(uuid.uuid4()),
+                )
+            return artifacts
+
+        return build
+
+    measure("CodeArtifact models", models)
+    plain = measure("blob store", service(BlobStore()))
+    dictionary = BlobStore.train_dictionary(rng.sample(blocks, 2000))
+    trained = measure("blob store + dict", service(BlobStore(dictionary=dictionary)))
+
+    for label, artifacts in (("blob store", plain), ("blob store + dict", trained)):
+        stats = artifacts.blob_store.get_stats()
+        print(
+            f"{label:>22}: {stats['blobs']} blobs, {stats['dedup_hits']} dedup hits,"
+            f" {stats['raw_bytes'] / max(1, stats['stored_bytes']):.1f}x smaller bodies"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Per-artifact classification cost: the previous helper chain vs ArtifactClassifier.
+
+Code blocks come from model responses in ReplayProvider format (JSON lines
+of {"prompt", "events"}); by default the bundled corpus of chat answers,
+or any file written by RecordingProvider via --corpus. Each block is
+classified with the previous chain (_determine_artifact_type,
+_generate_title, _generate_description, _is_runnable and the metadata line
+count, reproduced below) and with ArtifactClassifier, and the results are
+compared field by field. Untagged blocks, which the old chain typed without
+a language, are listed with the classifier's language guess.
+
+    python -m benchmarks.bench_classifier --repeat 200
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import ArtifactType  # noqa: E402
+from app.utils.artifact_classifier import ArtifactClassifier  # noqa: E402
+from app.utils.code_parser import CodeParser  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "data" / "model_responses.jsonl"
+
+
+# The classification chain ArtifactService used before, for comparison
+def legacy_type(language, content):
+    language = language.lower()
+    if language in ["html", "htm"]:
+        return ArtifactType.HTML
+    elif language in ["css"]:
+        return ArtifactType.CSS
+    elif language in ["javascript", "js"]:
+        return ArtifactType.JAVASCRIPT
+    elif language in ["python", "py"]:
+        return ArtifactType.PYTHON
+    elif language in ["jsx", "tsx"] or "react" in language.lower():
+        return ArtifactType.REACT
+    elif language in ["markdown", "md"]:
+        return ArtifactType.MARKDOWN
+    elif language in ["json"]:
+        return ArtifactType.JSON
+    else:
+        if "<html" in content.lower() or "<!doctype html" in content.lower():
+            return ArtifactType.HTML
+        elif "import React" in content or "from React" in content:
+            return ArtifactType.REACT
+        elif "def " in content or "import " in content:
+            return ArtifactType.PYTHON
+        elif "function " in content or "const " in content or "let " in content:
+            return ArtifactType.JAVASCRIPT
+        else:
+            return ArtifactType.CODE
+
+
+def legacy_title(language, content):
+    lines = content.split("\n")[:5]
+    for line in lines:
+        line = line.strip()
+        if line.startswith("#") or line.startswith("//") or line.startswith("/*"):
+            clean_line = re.sub(r"^[#/\*\s]+", "", line).strip()
+            if clean_line and len(clean_line) < 50:
+                return clean_line
+        func_match = re.search(r"(function|def|class)\s+(\w+)", line)
+        if func_match:
+            return f"{func_match.group(2)} ({language})"
+        react_match = re.search(r"const\s+(\w+)\s*=.*=>", line)
+        if react_match:
+            return f"{react_match.group(1)} Component"
+    return f"{language.title()} Code"
+
+
+def legacy_description(content, artifact_type):
+    lines = content.split("\n")
+    line_count = len([line for line in lines if line.strip()])
+    labels = {
+        ArtifactType.HTML: "HTML document",
+        ArtifactType.REACT: "React component",
+        ArtifactType.PYTHON: "Python code",
+        ArtifactType.JAVASCRIPT: "JavaScript code",
+    }
+    return f"{labels.get(artifact_type, 'Code artifact')} with {line_count} lines"
+
+
+def legacy_runnable(artifact_type, content):
+    runnable_types = [
+        ArtifactType.HTML,
+        ArtifactType.JAVASCRIPT,
+        ArtifactType.REACT,
+        ArtifactType.CSS,
+    ]
+    if artifact_type in runnable_types:
+        return True
+    if "<html" in content.lower() and "</html>" in content.lower():
+        return True
+    return False
+
+
+def legacy_classify(language, content):
+    artifact_type = legacy_type(language, content)
+    return (
+        artifact_type,
+        legacy_title(language, content),
+        legacy_description(content, artifact_type),
+        legacy_runnable(artifact_type, content),
+        len(content.split("\n")),
+    )
+
+
+def load_blocks(path: Path) -> list:
+    parser = CodeParser()
+    blocks = []
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                text = "".join(chunk for _, chunk in json.loads(line)["events"])
+                blocks.extend(
+                    (block["language"], block["code"].strip())
+                    for block in parser.extract_code_blocks(text)
+                )
+    return blocks
+
+
+def timed(label: str, blocks: list, repeat: int, classify) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for language, code in blocks:
+            classify(language, code)
+    per_block = (time.perf_counter() - start) / (repeat * len(blocks))
+    print(f"{label:>20}: {per_block * 1e6:7.2f} us per artifact")
+    return per_block
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    blocks = load_blocks(args.corpus)
+    sizes = sorted(len(code) for _, code in blocks)
+    print(
+        f"{len(blocks)} code blocks from {args.corpus.name},"
+        f" median {sizes[len(sizes) // 2]} chars, max {sizes[-1]}"
+    )
+
+    classifier = ArtifactClassifier()
+    before = timed("previous chain", blocks, args.repeat, legacy_classify)
+    after = timed("ArtifactClassifier", blocks, args.repeat, lambda l, c: classifier.classify(c, l))
+    print(f"{'':>20}  {before / after:.1f}x faster")
+
+    mismatches = 0
+    for language, code in blocks:
+        result = classifier.classify(code, language)
+        if language == "text":
+            print(f"{'untagged':>20}: guessed {result.language!r}, type {result.type.value}")
+            continue
+        expected = legacy_classify(language, code)
+        actual = (
+            result.type,
+            result.title,
+            result.description,
+            result.is_runnable,
+            result.line_count,
+        )
+        if actual != expected:
+            mismatches += 1
+            print(f"{'mismatch':>20}: {language}: {expected} != {actual}")
+    print(f"{'tagged blocks':>20}: {mismatches} differ from the previous chain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+SSE frame coalescing benchmark for POST /chat/stream.
+
+Streams a response made of tiny chunks (as Gemini often produces) through the
+full endpoint, with coalescing disabled and enabled, and reports frames per
+second, frames per stream and CPU time per stream.
+
+    python -m benchmarks.bench_coalescing --streams 100 --chunk-size 4
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+
+from app.agents.coding_agent import CodingAgent  # noqa: E402
+from app.config.settings import get_settings  # noqa: E402
+from app.core.deps import (  # noqa: E402
+    get_artifact_service,
+    get_coding_agent,
+    get_context_service,
+    get_memory_service,
+)
+from app.services.fake_provider import DEFAULT_SCRIPT, FakeProvider, split_into_chunks  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def run_streams(streams: int) -> tuple:
+    frames = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(index: int) -> int:
+            count = 0
+            payload = {"message": "make a counter", "session_id": f"bench-{index}"}
+            async with client.stream("POST", "/chat/stream", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        count += 1
+            return count
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        counts = await asyncio.gather(*(one(i) for i in range(streams)))
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        frames = sum(counts)
+
+    return frames, wall, cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--chunk-delay-ms", type=float, default=1.0)
+    parser.add_argument("--max-bytes", type=int, default=1024)
+    parser.add_argument("--max-latency-ms", type=float, default=25.0)
+    args = parser.parse_args()
+
+    provider = FakeProvider(
+        chunks=split_into_chunks(DEFAULT_SCRIPT, args.chunk_size),
+        ttft_ms=0,
+        chunk_delay_ms=args.chunk_delay_ms,
+        jitter_ms=0,
+    )
+    app.dependency_overrides[get_coding_agent] = lambda: CodingAgent(
+        gemini_service=provider,
+        memory_service=get_memory_service(),
+        artifact_service=get_artifact_service(),
+        context_service=get_context_service(),
+    )
+
+    settings = get_settings()
+    settings.stream_coalesce_max_bytes = args.max_bytes
+    settings.stream_coalesce_max_latency_ms = args.max_latency_ms
+
+    print(f"{args.streams} streams, {len(provider.chunks)} chunks of {args.chunk_size} chars each")
+    print(f"{'mode':<12}{'frames/s':>12}{'frames/stream':>15}{'CPU ms/stream':>15}{'wall s':>9}")
+    for enabled in (False, True):
+        settings.stream_coalesce_enabled = enabled
+        frames, wall, cpu = asyncio.run(run_streams(args.streams))
+        mode = "coalesced" if enabled else "per-chunk"
+        print(
+            f"{mode:<12}{frames / wall:>12.0f}{frames / args.streams:>15.1f}"
+            f"{cpu / args.streams * 1000:>15.2f}{wall:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Memory footprint of conversation history: 10k sessions x 50 messages.
+
+Compares the previous representation (a list of Pydantic ChatMessage models
+per session) with ConversationMemory's ring buffer of MessageRecords, and the
+per-message cost of adding to a full history.
+
+    python -m benchmarks.bench_history_memory --sessions 10000 --messages 50
+"""
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import ChatMessage, ConversationMemory, MessageRole  # noqa: E402
+from app.utils.history_buffer import MessageRecord  # noqa: E402
+
+ROLES = (MessageRole.USER, MessageRole.ASSISTANT)
+
+
+def build_lists(sessions: int, messages: int, contents: list) -> list:
+    histories = []
+    for session in range(sessions):
+        history = []
+        for turn in range(messages):
+            history.append(
+                ChatMessage(
+                    id=f"{session:08d}-{turn:04d}-0000-0000-000000000000",
+                    role=ROLES[turn % 2],
+                    content=contents[turn % len(contents)],
+                    timestamp=datetime.now(timezone.utc),
+                )
+            )
+        histories.append(history)
+    return histories
+
+
+def build_rings(sessions: int, messages: int, contents: list) -> list:
+    now = datetime.now(timezone.utc)
+    histories = []
+    for session in range(sessions):
+        memory = ConversationMemory(
+            session_id=f"session-{session}", created_at=now, updated_at=now, max_size=messages
+        )
+        for turn in range(messages):
+            memory.add_message(
+                MessageRecord.create(
+                    ROLES[turn % 2],
+                    contents[turn % len(contents)],
+                    message_id=f"{session:08d}-{turn:04d}-0000-0000-000000000000",
+                )
+            )
+        histories.append(memory)
+    return histories
+
+
+def measure(build, *args) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current, elapsed
+
+
+def steady_state_append(messages: int, appends: int) -> tuple:
+    """Per-append cost once the history is full (old list copy vs ring)"""
+    history = [
+        ChatMessage(id=str(i), role=ROLES[i % 2], content="x", timestamp=datetime.now(timezone.utc))
+        for i in range(messages)
+    ]
+    start = time.perf_counter()
+    for i in range(appends):
+        history.append(
+            ChatMessage(id=str(i), role=ROLES[i % 2], content="x", timestamp=datetime.now(timezone.utc))
+        )
+        if len(history) > messages:
+            history = history[-messages:]
+    old = (time.perf_counter() - start) / appends
+
+    now = datetime.now(timezone.utc)
+    memory = ConversationMemory(session_id="s", created_at=now, updated_at=now, max_size=messages)
+    for i in range(messages):
+        memory.add_message(MessageRecord.create(ROLES[i % 2], "x", message_id=str(i)))
+    start = time.perf_counter()
+    for i in range(appends):
+        memory.add_message(MessageRecord.create(ROLES[i % 2], "x", message_id=str(i)))
+    new = (time.perf_counter() - start) / appends
+    return old, new
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+
+    # Content strings are shared between both runs so only the per-message
+    # overhead is compared
+    contents = [f"message body {i} " * 20 for i in range(16)]
+    total = args.sessions * args.messages
+
+    old_bytes, old_time = measure(build_lists, args.sessions, args.messages, contents)
+    new_bytes, new_time = measure(build_rings, args.sessions, args.messages, contents)
+
+    print(f"{args.sessions} sessions x {args.messages} messages ({total:,} messages)")
+    print(f"{'ChatMessage lists':<22}{old_bytes / 2**20:>9.1f} MiB{old_bytes / total:>8.0f} B/msg{old_time:>8.2f} s")
+    print(f"{'MessageRecord rings':<22}{new_bytes / 2**20:>9.1f} MiB{new_bytes / total:>8.0f} B/msg{new_time:>8.2f} s")
+    print(f"{'reduction':<22}{old_bytes / new_bytes:>9.1f}x")
+
+    old, new = steady_state_append(args.messages, 20_000)
+    print(f"append to full history: list copy {old * 1e6:.2f} us, ring {new * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
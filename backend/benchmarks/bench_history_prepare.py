@@ -0,0 +1,96 @@
+"""
+Per-request history preparation cost at 50-message histories.
+
+Each simulated request adds a user and an assistant turn to a session and
+then prepares its last 50 messages and starts a Gemini chat with them,
+the work GeminiService does before send_message. It compares:
+
+- the previous path: build role/parts dicts, and start_chat converts every
+  dict to protos.Content
+- converting every message to protos.Content on each request
+- PreparedHistoryCache: only the new turns are converted
+
+No network calls are made.
+
+    python -m benchmarks.bench_history_prepare --sessions 200 --requests 2000
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import MessageRole  # noqa: E402
+from app.services.gemini_service import GeminiService  # noqa: E402
+from app.utils.history_buffer import MessageRecord  # noqa: E402
+from app.utils.history_cache import PreparedHistoryCache  # noqa: E402
+
+CONTENTS = [
+    "Write a React component that renders a sortable table of users.",
+    "Here's a sortable table component:\n\n```jsx\n" + "const x = 1;\n" * 60 + "```",
+]
+
+
+def legacy_prepare(messages):
+    history = []
+    for msg in messages:
+        if msg.role != MessageRole.SYSTEM:
+            role = "user" if msg.role == MessageRole.USER else "model"
+            history.append({"role": role, "parts": [msg.content]})
+    return history
+
+
+def run(service: GeminiService, mode: str, sessions: int, requests: int, window: int) -> float:
+    histories = {index: [] for index in range(sessions)}
+    cache = PreparedHistoryCache(service._to_content, max_sessions=sessions)
+
+    def add(session: int, role: MessageRole, content: str) -> None:
+        record = MessageRecord.create(role, content)
+        histories[session].append(record)
+        cache.on_message_added(str(session), record)
+
+    # Warm every session to a full window
+    for session in range(sessions):
+        for turn in range(window):
+            add(session, (MessageRole.USER, MessageRole.ASSISTANT)[turn % 2], CONTENTS[turn % 2])
+        cache.prepare(str(session), histories[session][-window:])
+
+    elapsed = 0.0
+    for request in range(requests):
+        session = request % sessions
+        add(session, MessageRole.USER, CONTENTS[0])
+        add(session, MessageRole.ASSISTANT, CONTENTS[1])
+        messages = histories[session][-window:]
+
+        start = time.perf_counter()
+        if mode == "legacy":
+            history = legacy_prepare(messages)
+        elif mode == "uncached":
+            history = service._prepare_history(messages)
+        else:
+            history = cache.prepare(str(session), messages)
+        service.model.start_chat(history=history)
+        elapsed += time.perf_counter() - start
+
+    return elapsed / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+
+    service = GeminiService(api_key="benchmark")
+    results = {}
+    for mode in ("legacy", "uncached", "cached"):
+        results[mode] = run(service, mode, args.sessions, args.requests, args.messages)
+        print(f"{mode:>9}: {results[mode] * 1e6:8.1f} us per request")
+
+    print(f"  speedup: {results['legacy'] / results['cached']:.1f}x vs legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Event-loop blocking check under simulated streaming load.
+
+Runs concurrent chat streams through CodingAgent.stream_response, the
+stream coalescer and SSEEncoder, with GeminiService's model replaced by a
+stub whose iterator blocks like the real (synchronous) Gemini stream.
+While they run, every event-loop callback is timed and a LoopLagMonitor
+measures lag and captures the stack of any stall. Exits non-zero if a
+callback took longer than --max-ms, so blocking calls that creep onto the
+loop (a synchronous iterator, a traceback written per request) are caught.
+
+--block-ms adds a blocking sleep on the loop to one stream, to show what a
+failure and a captured stall look like.
+
+    python -m benchmarks.bench_loop_lag --streams 64 --max-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.agents.coding_agent import CodingAgent  # noqa: E402
+from app.services.artifact_service import ArtifactService  # noqa: E402
+from app.services.context_service import ContextService  # noqa: E402
+from app.services.gemini_service import GeminiService  # noqa: E402
+from app.services.loop_monitor import LoopLagMonitor, slow_callbacks  # noqa: E402
+from app.services.memory_service import MemoryService  # noqa: E402
+from app.utils.sse import SSEEncoder  # noqa: E402
+from app.utils.stream_coalescer import coalesce_stream  # noqa: E402
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _BlockingChat:
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def send_message(self, prompt, stream=False):
+        yield _Chunk("Here you go:\n```python\n")
+        for i in range(self.chunks):
+            time.sleep(self.delay)  # blocking network wait
+            yield _Chunk(f"value_{i} = {i}\n")
+        yield _Chunk("```\n")
+
+
+class _BlockingModel:
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def start_chat(self, history=None):
+        return _BlockingChat(self.chunks, self.delay)
+
+
+async def stream_once(agent: CodingAgent, session: str, block: float) -> int:
+    frames = 0
+    encoder = SSEEncoder()
+    stream = coalesce_stream(
+        agent.stream_response("write some code", session), max_bytes=1024, max_latency=0.025
+    )
+    async for chunk in stream:
+        encoder.encode(chunk)
+        frames += 1
+        if block and frames == 2:
+            time.sleep(block)  # a blocking call on the loop
+    return frames
+
+
+async def run(args) -> int:
+    service = GeminiService(api_key="benchmark")
+    service.model = _BlockingModel(args.chunks, args.chunk_delay_ms / 1000)
+    memory = MemoryService()
+    agent = CodingAgent(
+        gemini_service=service,
+        memory_service=memory,
+        artifact_service=ArtifactService(),
+        context_service=ContextService(memory, service, summary_enabled=False),
+    )
+
+    monitor = LoopLagMonitor(interval=0.01, stall_threshold=args.max_ms / 1000)
+    monitor.start()
+    lags = []
+
+    async def sample_lag():
+        while True:
+            await asyncio.sleep(0.01)
+            lags.append(monitor.lag)
+
+    sampler = asyncio.create_task(sample_lag())
+    start = time.perf_counter()
+    with slow_callbacks(args.max_ms) as found:
+        await asyncio.gather(
+            *(
+                stream_once(agent, f"s{index}", args.block_ms / 1000 if index == 0 else 0)
+                for index in range(args.streams)
+            )
+        )
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    monitor.stop()
+
+    print(f"{args.streams} streams of {args.chunks} chunks in {elapsed * 1000:.0f} ms")
+    print(
+        f"loop lag: median {statistics.median(lags) * 1000:.2f} ms,"
+        f" max {monitor.max_lag * 1000:.2f} ms"
+    )
+    print(f"stalls over {args.max_ms} ms with a captured stack: {monitor.stall_count}")
+    for stall in monitor.stalls:
+        # The innermost frame: the blocking line
+        print("\n".join(stall["stack"].rstrip().splitlines()[-2:]))
+    print(f"callbacks over {args.max_ms} ms: {len(found)}")
+    for callback in sorted(found, reverse=True)[:5]:
+        print(f"  {callback.seconds * 1000:.1f} ms: {callback.callback}")
+    return len(found)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=50)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0)
+    parser.add_argument("--max-ms", type=float, default=20.0)
+    parser.add_argument("--block-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    if asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
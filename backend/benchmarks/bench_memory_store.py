@@ -0,0 +1,82 @@
+"""
+add_message throughput and latency: in-memory MemoryService vs the SQLite
+write-behind store.
+
+Latency is what the caller (the request path) sees; disk commits happen on the
+writer thread. The "drain" line reports how long the writer needed to commit
+everything after the last call returned.
+
+    python -m benchmarks.bench_memory_store --sessions 200 --messages 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import ChatMessage, MessageRole  # noqa: E402
+from app.services.memory_service import MemoryService  # noqa: E402
+from app.services.memory_store import SQLiteConversationStore  # noqa: E402
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(service: MemoryService, sessions: int, messages: int) -> list:
+    latencies = []
+    content = "x" * 400
+    for turn in range(messages):
+        role = MessageRole.USER if turn % 2 == 0 else MessageRole.ASSISTANT
+        for session in range(sessions):
+            message = ChatMessage(
+                id=f"{session}-{turn}",
+                role=role,
+                content=content,
+                timestamp=datetime.now(timezone.utc),
+            )
+            start = time.perf_counter()
+            service.add_message(f"session-{session}", message)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list, elapsed: float) -> None:
+    print(
+        f"{name:<10}{len(latencies) / elapsed:>12,.0f} msg/s"
+        f"   p50 {percentile(latencies, 50) * 1e6:7.1f} us"
+        f"   p99 {percentile(latencies, 99) * 1e6:7.1f} us"
+        f"   max {max(latencies) * 1e6:9.1f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+
+    service = MemoryService(max_conversations=args.sessions)
+    start = time.perf_counter()
+    latencies = run(service, args.sessions, args.messages)
+    report("memory", latencies, time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteConversationStore(f"sqlite:///{directory}/bench.db")
+        service = MemoryService(max_conversations=args.sessions, store=store)
+        start = time.perf_counter()
+        latencies = run(service, args.sessions, args.messages)
+        report("sqlite", latencies, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.flush(timeout=60)
+        print(f"drain     {time.perf_counter() - start:.2f} s, {store.get_stats()}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Cost of the Prometheus instrumentation on the SSE hot path.
+
+Streams responses from a zero-delay FakeProvider through
+CodingAgent.stream_response and SSEEncoder (the per-chunk work of
+/chat/stream, minus the socket), so the measured time is all CPU. Each
+round runs a block of --streams streams per variant, in alternating order:
+instrumented as in production (every chunk gap is counted) and with the
+stream metrics' methods replaced by no-ops.
+
+The overhead is the median of the per-round paired differences, plus the
+per-chunk gap counting in the agent's loop (a subtraction, a comparison
+and an addition), which the no-op variant still runs and which is
+therefore timed alone and added. Exits non-zero if that is 1% or more.
+
+    python -m benchmarks.bench_metrics_overhead --chunks 1000 --rounds 40
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import os
+import statistics
+import sys
+import time
+import timeit
+from typing import Dict, List
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.agents.coding_agent import CodingAgent  # noqa: E402
+from app.core import metrics  # noqa: E402
+from app.services.artifact_service import ArtifactService  # noqa: E402
+from app.services.context_service import ContextService  # noqa: E402
+from app.services.fake_provider import FakeProvider  # noqa: E402
+from app.services.memory_service import MemoryService  # noqa: E402
+from app.utils.sse import SSEEncoder  # noqa: E402
+
+# Metrics touched by stream_response
+STREAM_METRICS = (
+    metrics.STREAM_TTFT,
+    metrics.STREAM_CHUNK_GAP,
+    metrics.STREAM_DURATION,
+    metrics.STREAM_TOKENS_PER_SECOND,
+    metrics.STREAM_TOKENS,
+    metrics.STREAMS_IN_FLIGHT,
+)
+
+
+METHODS = ("observe", "observe_run", "inc", "dec")
+
+
+class _Disabled:
+    """Swaps the stream metrics' methods for no-ops while active"""
+
+    def __enter__(self):
+        for metric in STREAM_METRICS:
+            for method in METHODS:
+                if hasattr(metric, method):
+                    setattr(metric, method, lambda *args: None)
+
+    def __exit__(self, *exc_info):
+        for metric in STREAM_METRICS:
+            for method in METHODS:
+                metric.__dict__.pop(method, None)
+
+
+def build_agent(chunks: int) -> CodingAgent:
+    words = [f"word{index} " for index in range(chunks)]
+    provider = FakeProvider(words, ttft_ms=0, chunk_delay_ms=0, jitter_ms=0)
+    memory = MemoryService()
+    return CodingAgent(
+        gemini_service=provider,
+        memory_service=memory,
+        artifact_service=ArtifactService(),
+        context_service=ContextService(memory, provider, summary_enabled=False),
+    )
+
+
+async def stream_once(agent: CodingAgent, session: str) -> int:
+    encoder = SSEEncoder()
+    frames = 0
+    async for chunk in agent.stream_response("benchmark", session):
+        encoder.encode(chunk)
+        frames += 1
+    return frames
+
+
+async def per_chunk(agent: CodingAgent, chunks: int, streams: int, session: str) -> float:
+    """Mean seconds per chunk over a block of streams"""
+    gc.collect()
+    start = time.perf_counter()
+    for index in range(streams):
+        await stream_once(agent, f"{session}-{index}")
+    return (time.perf_counter() - start) / (chunks * streams)
+
+
+def gap_counting_cost() -> float:
+    """Seconds per chunk for counting its gap in the current bucket"""
+    statement = "gap = now - last\nif lower < gap <= upper:\n    run += 1\nlast = now"
+    # Locals, as in the agent's loop
+    setup = "now, last, lower, upper, run = 1.0, 0.9999, float('-inf'), 0.001, 0"
+    number = 500000
+    baseline = min(timeit.repeat("pass", setup, number=number, repeat=5))
+    runs = timeit.repeat(statement, setup, number=number, repeat=5)
+    return max(min(runs) - baseline, 0.0) / number
+
+
+async def run(chunks: int, streams: int, rounds: int) -> float:
+    agent = build_agent(chunks)
+    variants = {"off": _Disabled, "on": contextlib.nullcontext}
+    # Warm up every variant
+    for variant in variants.values():
+        with variant():
+            await stream_once(agent, "warm-up")
+
+    results: Dict[str, List[float]] = {name: [] for name in variants}
+    names = list(variants)
+    for index in range(rounds):
+        # Fresh sessions keep history (and its cost) the same every round
+        for name in names[index % 2 :] + names[: index % 2]:
+            with variants[name]():
+                results[name].append(
+                    await per_chunk(agent, chunks, streams, f"{name}-{index}")
+                )
+
+    # Paired by round, so drift in machine speed cancels out
+    measured = statistics.median(
+        (on - off) / off for on, off in zip(results["on"], results["off"])
+    )
+    baseline = statistics.median(results["off"])
+    counting = gap_counting_cost() / baseline
+    overhead = measured + counting
+
+    print(f"{chunks} chunks per stream, {rounds} rounds of {streams} streams per variant")
+    print(f"{'no-op metrics':>26}: {baseline * 1e6:7.2f} us per chunk (median)")
+    print(f"{'instrumented, paired diff':>26}: {measured * 100:+7.2f} %")
+    print(f"{'gap counting in the loop':>26}: {counting * 100:+7.2f} %")
+    print(f"{'overhead':>26}: {overhead * 100:+7.2f} %")
+    return overhead
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=40)
+    args = parser.parse_args()
+    overhead = asyncio.run(run(args.chunks, args.streams, args.rounds))
+    if overhead >= 0.01:
+        print("instrumentation overhead is 1% or more")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
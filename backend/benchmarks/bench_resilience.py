@@ -0,0 +1,115 @@
+"""
+Tail latency and error rate with and without ResilientProvider.
+
+Drives FakeProvider with a latency tail (a fraction of calls is slow) and
+injected failures before the first token, then reports TTFT percentiles and
+errors for the bare provider, with retries only, and with retries plus
+hedging. A final run against an always-failing provider shows the circuit
+breaker failing fast.
+
+    python -m benchmarks.bench_resilience --requests 400 --slow-rate 0.05 --failure-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.services.fake_provider import FakeProvider  # noqa: E402
+from app.services.resilience import CircuitBreaker, ResilientProvider  # noqa: E402
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(provider, requests: int, concurrency: int) -> tuple:
+    ttfts, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            first = True
+            try:
+                async for _ in provider.generate_streaming_response(f"prompt {index}"):
+                    if first:
+                        ttfts.append(time.perf_counter() - start)
+                        first = False
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return ttfts, errors
+
+
+def report(name: str, ttfts: list, errors: int, requests: int) -> None:
+    if not ttfts:
+        print(f"{name:>18}: all {requests} requests failed")
+        return
+    print(
+        f"{name:>18}: p50 {statistics.median(ttfts) * 1000:7.1f} ms"
+        f"  p95 {percentile(ttfts, 95) * 1000:7.1f} ms"
+        f"  p99 {percentile(ttfts, 99) * 1000:7.1f} ms"
+        f"  errors {errors}/{requests}"
+    )
+
+
+async def main_async(args) -> None:
+    def fake(**overrides) -> FakeProvider:
+        options = dict(
+            ttft_ms=args.ttft_ms,
+            chunk_delay_ms=0,
+            jitter_ms=args.ttft_ms * 0.2,
+            failure_rate=args.failure_rate,
+            slow_rate=args.slow_rate,
+            slow_ttft_ms=args.slow_ttft_ms,
+            seed=1,
+        )
+        options.update(overrides)
+        return FakeProvider(**options)
+
+    report("bare", *await drive(fake(), args.requests, args.concurrency), args.requests)
+
+    retrying = ResilientProvider(fake(), ttft_timeout=args.slow_ttft_ms / 1000 * 2, retries=2)
+    report("retries", *await drive(retrying, args.requests, args.concurrency), args.requests)
+
+    hedging = ResilientProvider(
+        fake(), ttft_timeout=args.slow_ttft_ms / 1000 * 2, retries=2, hedge_percentile=90
+    )
+    report("retries + hedging", *await drive(hedging, args.requests, args.concurrency), args.requests)
+    print(f"{'':>18}  {hedging.get_stats()}")
+
+    # Circuit breaker: the upstream is down, calls should stop reaching it
+    down = fake(failure_rate=1.0, slow_rate=0.0)
+    breaker = ResilientProvider(
+        down, retries=0, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60)
+    )
+    start = time.perf_counter()
+    _, errors = await drive(breaker, 100, 1)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{'circuit breaker':>18}: {errors}/100 failed in {elapsed:.2f}s,"
+        f" {breaker.breaker.rejected} rejected without calling upstream"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ttft-ms", type=float, default=100.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ttft-ms", type=float, default=2000.0)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
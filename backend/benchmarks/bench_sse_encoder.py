@@ -0,0 +1,78 @@
+"""
+Microbenchmark for SSE frame encoding on the chat streaming hot path.
+
+Compares building a StreamChunk per token and dumping it with Pydantic
+against SSEEncoder's pre-encoded envelope, on a single core.
+
+    python -m benchmarks.bench_sse_encoder --chunks 200000
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import StreamChunk  # noqa: E402
+from app.services.fake_provider import DEFAULT_SCRIPT, split_into_chunks  # noqa: E402
+from app.utils.sse import SSEEncoder  # noqa: E402
+
+
+def make_chunks(count: int, chunk_size: int) -> list:
+    pieces = split_into_chunks(DEFAULT_SCRIPT, chunk_size)
+    return [
+        {
+            "chunk": pieces[i % len(pieces)],
+            "message_id": "5f0c7c1e-6a86-4d0e-a1f3-2c3b1f1b9f4d",
+            "session_id": "session_1730000000000_abcdef",
+            "is_complete": False,
+            "has_artifacts": False,
+            "artifacts": [],
+        }
+        for i in range(count)
+    ]
+
+
+def pydantic_frames(chunks: list) -> int:
+    total = 0
+    for chunk_data in chunks:
+        chunk = StreamChunk(**chunk_data)
+        total += len(f"data: {chunk.model_dump_json(exclude_none=True)}\n\n")
+    return total
+
+
+def encoder_frames(chunks: list) -> int:
+    encoder = SSEEncoder()
+    total = 0
+    for chunk_data in chunks:
+        total += len(encoder.encode(chunk_data))
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.chunk_size)
+    encoder = SSEEncoder()
+    assert all(
+        encoder.encode(c) == f"data: {StreamChunk(**c).model_dump_json(exclude_none=True)}\n\n".encode()
+        for c in chunks[:1000]
+    )
+
+    results = {}
+    for name, func in (("StreamChunk + model_dump_json", pydantic_frames), ("SSEEncoder", encoder_frames)):
+        start = time.process_time()
+        func(chunks)
+        elapsed = time.process_time() - start
+        results[name] = args.chunks / elapsed
+        print(f"{name:<32}{results[name]:>12,.0f} chunks/s/core")
+
+    values = list(results.values())
+    print(f"{'speedup':<32}{values[1] / values[0]:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
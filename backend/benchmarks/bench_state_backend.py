@@ -0,0 +1,137 @@
+"""
+Reads through a shared StateBackend: local hot cache vs the backend.
+
+Two ArtifactService and MemoryService instances share one backend, standing
+in for two workers. The first creates artifacts and session messages; the
+second reads them once (loading from the backend) and again (served from
+its cache). Then the first deletes or appends to some of them and the
+second is checked to see the change after invalidation.
+
+By default the backend is Redis at --redis-url; --fake uses fakeredis (an
+in-process Redis server, so round trips cost no network time) and
+--in-process the InProcessStateBackend. fakeredis is pinned in
+requirements-dev.txt.
+
+    python -m benchmarks.bench_state_backend --artifacts 500 --fake
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.schemas import MessageRole  # noqa: E402
+from app.services.artifact_service import ArtifactService  # noqa: E402
+from app.services.memory_service import MemoryService  # noqa: E402
+from app.services.memory_store import StateConversationStore  # noqa: E402
+from app.services.state_backend import InProcessStateBackend, RedisStateBackend  # noqa: E402
+from app.utils.history_buffer import MessageRecord  # noqa: E402
+
+
+def backends(args):
+    """Two backend handles onto the same state, as two processes would have"""
+    if args.in_process:
+        backend = InProcessStateBackend()
+        return backend, backend
+    if args.fake:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        return tuple(
+            RedisStateBackend(prefix="bench:", client=fakeredis.FakeRedis(server=server))
+            for _ in range(2)
+        )
+    return tuple(RedisStateBackend(args.redis_url, prefix="bench:") for _ in range(2))
+
+
+def timed(label: str, keys: list, read) -> None:
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        read(key)
+        samples.append(time.perf_counter() - start)
+    print(
+        f"{label:>26}: mean {statistics.mean(samples) * 1e6:8.1f} us"
+        f"  p99 {sorted(samples)[int(len(samples) * 0.99)] * 1e6:8.1f} us"
+    )
+
+
+def wait_for(condition, timeout: float = 5.0) -> float:
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise AssertionError("change not seen")
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def last_message(memory: MemoryService, session_id: str) -> str:
+    # Invalidations are applied by load(), which requests call first
+    asyncio.run(memory.load(session_id))
+    return memory.get_recent_records(session_id)[-1].content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--artifacts", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--in-process", action="store_true")
+    args = parser.parse_args()
+
+    first, second = backends(args)
+    writer = ArtifactService(state=first)
+    reader = ArtifactService(state=second)
+
+    ids = []
+    start = time.perf_counter()
+    for index in range(args.artifacts):
+        code = f"```python\ndef handler_{index}(request):\n    return {index} * request\n```"
+        ids.extend(a.id for a in writer.extract_artifacts_from_response(code, "s", f"m{index}"))
+    # Backend writes are queued to the writer thread
+    writer.flush()
+    per_write = (time.perf_counter() - start) / len(ids)
+    print(f"{len(ids)} artifacts written, {per_write * 1e6:.1f} us each")
+
+    timed("artifact, from backend", ids, reader.get_artifact)
+    timed("artifact, cached", ids, reader.get_artifact)
+
+    writer.delete_artifact(ids[0])
+    seen = wait_for(lambda: reader.get_artifact(ids[0]) is None)
+    print(f"{'deletion seen after':>26}: {seen * 1000:.1f} ms")
+
+    memory_writer = MemoryService(args.sessions, StateConversationStore(first))
+    memory_reader = MemoryService(args.sessions, StateConversationStore(second))
+    sessions = [memory_writer.create_session() for _ in range(args.sessions)]
+    for session_id in sessions:
+        for turn in range(10):
+            memory_writer.add_message(
+                session_id, MessageRecord.create(MessageRole.USER, f"message {turn}")
+            )
+    memory_writer.store.flush()
+    # Let the invalidations for these writes arrive, or they would evict
+    # sessions the reader loads meanwhile
+    time.sleep(0.2)
+
+    timed("session, from backend", sessions, memory_reader.get_recent_records)
+    timed("session, cached", sessions, memory_reader.get_recent_records)
+
+    memory_writer.add_message(sessions[0], MessageRecord.create(MessageRole.USER, "new"))
+    seen = wait_for(lambda: last_message(memory_reader, sessions[0]) == "new")
+    print(f"{'new message seen after':>26}: {seen * 1000:.1f} ms (flush interval 50 ms)")
+
+    memory_writer.close()
+    memory_reader.close()
+    writer.close()
+    reader.close()
+    first.close()
+    if second is not first:
+        second.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Concurrency benchmark for GeminiService.generate_streaming_response.
+
+Replaces the Gemini model with a stub whose iterator blocks like a slow
+network stream, then runs N streams in parallel. With the stream drained on
+the dedicated thread pool the wall time stays close to a single stream and
+the event loop keeps answering (see max loop lag). Exits non-zero if the
+parallel/single wall time ratio reaches --max-ratio, i.e. the streams are
+being serialised somewhere.
+
+    python -m benchmarks.bench_stream_concurrency --streams 16 --max-ratio 1.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.services.gemini_service import GeminiService  # noqa: E402
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _BlockingChat:
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def send_message(self, prompt, stream=False):
+        for i in range(self.chunks):
+            time.sleep(self.delay)  # blocking network wait
+            yield _Chunk(f"token{i} ")
+
+
+class _BlockingModel:
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    def start_chat(self, history=None):
+        return _BlockingChat(self.chunks, self.delay)
+
+
+async def _consume(service: GeminiService) -> int:
+    count = 0
+    async for _ in service.generate_streaming_response("hello"):
+        count += 1
+    return count
+
+
+async def _measure_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(streams: int, chunks: int, delay: float) -> float:
+    service = GeminiService(api_key="benchmark")
+    service.model = _BlockingModel(chunks, delay)
+
+    start = time.perf_counter()
+    await _consume(service)
+    single = time.perf_counter() - start
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_lag(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_consume(service) for _ in range(streams)))
+    parallel = time.perf_counter() - start
+    stop.set()
+    worst_lag = await lag_task
+
+    assert all(count == chunks for count in results)
+    print(f"single stream:        {single * 1000:8.1f} ms")
+    print(f"{streams:3d} parallel streams: {parallel * 1000:8.1f} ms")
+    print(f"ratio:                {parallel / single:8.2f}x (ideal 1.0x)")
+    print(f"max event-loop lag:   {worst_lag * 1000:8.1f} ms")
+    service.executor.shutdown(wait=False)
+    return parallel / single
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--max-ratio", type=float, default=1.5)
+    args = parser.parse_args()
+    ratio = asyncio.run(run(args.streams, args.chunks, args.delay))
+    if ratio >= args.max_ratio:
+        print(f"parallel streams took {ratio:.2f}x a single one (limit {args.max_ratio}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
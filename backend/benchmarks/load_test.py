@@ -0,0 +1,229 @@
+"""
+End-to-end load test for POST /chat/stream.
+
+Drives many concurrent SSE sessions and reports time-to-first-token
+percentiles, throughput and event-loop lag. Each session sends its own
+prompt (--message plus the session index) so the response cache and
+single-flight do not turn the run into replays; --repeat-message sends the
+same prompt from every session to measure them. By default the app is started
+in-process with the fake LLM provider, so the numbers are repeatable and need
+no network; pass --url to target an already running server instead (loop lag
+is only measured in-process).
+
+    python -m benchmarks.load_test --sessions 300 --concurrency 200
+    python -m benchmarks.load_test --replay-file streams.jsonl --replay-speed 1
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import httpx
+
+
+@dataclass
+class SessionResult:
+    ok: bool
+    ttft: Optional[float] = None
+    duration: float = 0.0
+    chunks: int = 0
+    bytes: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class LagProbe:
+    interval: float = 0.01
+    samples: List[float] = field(default_factory=list)
+    running: bool = True
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.running:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_session(client: httpx.AsyncClient, url: str, message: str) -> SessionResult:
+    payload = {"message": message, "session_id": str(uuid.uuid4()), "stream": True}
+    result = SessionResult(ok=False)
+    start = time.perf_counter()
+
+    try:
+        async with client.stream("POST", url, json=payload) as response:
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    result.ok = result.error is None
+                    break
+
+                chunk = json.loads(data)
+                if chunk.get("error"):
+                    result.error = chunk["chunk"]
+                text = chunk.get("chunk", "")
+                if text and result.ttft is None:
+                    result.ttft = time.perf_counter() - start
+                result.chunks += 1
+                result.bytes += len(text)
+
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+
+    result.duration = time.perf_counter() - start
+    return result
+
+
+async def drive(
+    url: str, sessions: int, concurrency: int, message: str, repeat: bool
+) -> List[SessionResult]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+        async def bounded(index: int) -> SessionResult:
+            prompt = message if repeat else f"{message} (session {index})"
+            async with semaphore:
+                return await run_session(client, url, prompt)
+
+        return await asyncio.gather(*(bounded(index) for index in range(sessions)))
+
+
+def start_server(port: int):
+    """Start the app with uvicorn on a background thread and return (server, loop)"""
+    import uvicorn
+
+    from main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.05)
+    return server, loop, thread
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def report(results: List[SessionResult], elapsed: float, lag: Optional[LagProbe]) -> None:
+    ok = [r for r in results if r.ok]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    durations = [r.duration for r in ok]
+    chunks = sum(r.chunks for r in ok)
+    payload = sum(r.bytes for r in ok)
+
+    print(f"sessions:      {len(results)} ({len(ok)} ok, {len(results) - len(ok)} failed)")
+    print(f"wall time:     {elapsed:.2f} s")
+    if ttfts:
+        print(
+            "TTFT ms:       p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+                *(percentile(ttfts, p) * 1000 for p in (50, 95, 99, 100))
+            )
+        )
+    if durations:
+        print(
+            "stream ms:     p50 {:.1f}  p95 {:.1f}  p99 {:.1f}".format(
+                *(percentile(durations, p) * 1000 for p in (50, 95, 99))
+            )
+        )
+    print(f"throughput:    {len(ok) / elapsed:.1f} sessions/s, {chunks / elapsed:.0f} frames/s, {payload / elapsed / 1024:.1f} KiB/s")
+    if lag and lag.samples:
+        print(
+            "loop lag ms:   mean {:.2f}  p99 {:.2f}  max {:.2f}".format(
+                statistics.fmean(lag.samples) * 1000,
+                percentile(lag.samples, 99) * 1000,
+                max(lag.samples) * 1000,
+            )
+        )
+    errors = {r.error for r in results if r.error}
+    if errors:
+        print(f"errors:        {sorted(errors)[:5]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: start in-process)")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--message", default="Create a React counter component")
+    parser.add_argument(
+        "--repeat-message",
+        action="store_true",
+        help="Send the same prompt from every session (exercises the response cache and single-flight)",
+    )
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--replay-file", help="Replay recorded streams instead of the scripted fake")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = lag = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+        os.environ["LLM_PROVIDER"] = "replay" if args.replay_file else "fake"
+        os.environ["FAKE_TTFT_MS"] = str(args.ttft_ms)
+        os.environ["FAKE_CHUNK_DELAY_MS"] = str(args.chunk_delay_ms)
+        os.environ["FAKE_JITTER_MS"] = str(args.jitter_ms)
+        os.environ["FAKE_FAILURE_RATE"] = str(args.failure_rate)
+        if args.replay_file:
+            os.environ["REPLAY_FILE"] = args.replay_file
+            os.environ["REPLAY_SPEED"] = str(args.replay_speed)
+
+        port = free_port()
+        server, server_loop, server_thread = start_server(port)
+        lag = LagProbe()
+        asyncio.run_coroutine_threadsafe(lag.run(), server_loop)
+        base_url = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    results = asyncio.run(
+        drive(f"{base_url}/chat/stream", args.sessions, args.concurrency, args.message, args.repeat_message)
+    )
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        lag.running = False
+        server.should_exit = True
+        server_thread.join(timeout=5)
+
+    report(results, elapsed, lag)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,17 @@ settings = get_settings()
 app = create_app()
 
 if __name__ == "__main__":
+    if settings.workers > 1 and settings.state_backend != "redis":
+        raise ValueError("workers > 1 needs state_backend 'redis' to share state")
+    if settings.workers > 1 and settings.artifact_storage == "disk":
+        # Each worker's DiskBlobStore clears and releases files in the
+        # directory as if it owned it alone
+        raise ValueError("workers > 1 needs artifact_storage 'memory'")
     uvicorn.run(
         "main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
         log_level="info" if not settings.debug else "debug",
-        workers=1
+        workers=settings.workers
     )